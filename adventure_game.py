@@ -1,31 +1,720 @@
+import collections
+import functools
+import itertools
 import time
-import random
 import sys
-from typing import Dict, List, Optional, Callable
+from types import MappingProxyType
+from typing import Dict, List, Optional, Callable, Iterable, NamedTuple, Sequence, TextIO
+
+class FrameCache:
+    """Bounded LRU cache of pre-rendered static narration
+    
+    Runs of clear, type and echo steps read no state (they are merged into
+    one narration step at compile time), so a renderer that can lay them
+    out ahead of time renders each run once with ``render_frame`` and then
+    writes the stored frame on every later visit. Keys are the renderer's
+    ``frame_key`` (backend and width), the run of steps and the text table.
+    An entry keeps its steps and table alive, so their IDs in the key
+    cannot be reused while it is cached.
+    """
+
+    def __init__(self, capacity: int = 512):
+        self.capacity = capacity
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, renderer: "Renderer", lines: tuple, texts: Sequence[str]):
+        """The renderer's frame for a run of narration steps, rendered on a miss"""
+        key = (renderer.frame_key, id(lines), id(texts))
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry[0]
+        self.misses += 1
+        frame = renderer.render_frame(lines, texts)
+        self.entries[key] = (frame, lines, texts)
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        return frame
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def clear(self):
+        """Drop every frame (counters are kept)"""
+        self.entries.clear()
+
+    def stats(self) -> Dict:
+        """Size, hit and eviction counters"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+# Shared by every renderer in the process, so each session host renders a
+# scene's static text once per backend and width
+FRAME_CACHE = FrameCache()
+
+class Renderer:
+    """Base output backend used by the engine and game state"""
+    # True for backends that drop everything, so callers can skip formatting
+    discards_output = False
+    # Hashable description of how ``render_frame`` lays out text (backend and
+    # width), or None when narration has to be written line by line
+    frame_key = None
+    frames = FRAME_CACHE
+
+    def write_line(self, text: str = ""):
+        """Write a complete line of text"""
+        raise NotImplementedError
+
+    def type_text(self, text: str, delay: float = 0.03):
+        """Write a line of narration; backends decide how to pace it"""
+        self.write_line(text)
+
+    def clear(self):
+        """Clear the visible screen"""
+        self.write_line("\n" * 50)
+
+    def render_frame(self, lines: tuple, texts: Sequence[str]):
+        """Lay out a run of compiled clear/type/echo steps for ``write_frame``"""
+        raise NotImplementedError
+
+    def write_frame(self, frame):
+        """Write a frame made by ``render_frame``"""
+        raise NotImplementedError
+
+    def flush(self):
+        """Push any pending output to the player (called once per turn)"""
+
+    def close(self):
+        """Release the output device when the game loop ends"""
+
+def typing_chunks(text: str, delay: float, frame_interval: float = 0.05):
+    """Split text into typing-effect chunks
+    
+    Yields ``(chunk, due)`` pairs where ``due`` is the offset in seconds from
+    the start of the line at which the chunk should have finished typing.
+    """
+    chunk = max(1, int(round(frame_interval / delay)))
+    for end in range(chunk, len(text) + chunk, chunk):
+        yield text[end - chunk:end], min(end, len(text)) * delay
+
+class TerminalRenderer(Renderer):
+    """Interactive terminal backend with a chunked typing effect
+
+    Instead of one write and one sleep per character, narration is written
+    in chunks of roughly ``frame_interval`` seconds and each chunk waits for
+    its own deadline, so pacing stays accurate without per-character syscalls.
+    """
+
+    def __init__(self, stream: Optional[TextIO] = None, frame_interval: float = 0.05,
+                 sleep: Callable[[float], None] = time.sleep,
+                 clock: Callable[[], float] = time.monotonic):
+        self._stream = stream
+        self.frame_interval = frame_interval
+        self._sleep = sleep
+        self._clock = clock
+
+    @property
+    def stream(self) -> TextIO:
+        """Output stream (resolved lazily so redirected stdout is honoured)"""
+        return self._stream if self._stream is not None else sys.stdout
+
+    def write_line(self, text: str = ""):
+        """Write a complete line of text"""
+        self.stream.write(text + "\n")
+
+    def type_text(self, text: str, delay: float = 0.03):
+        """Write text in deadline-scheduled chunks to simulate typing"""
+        if delay <= 0 or len(text) <= 1:
+            self.write_line(text)
+            return
+        stream = self.stream
+        start = self._clock()
+        for piece, due in typing_chunks(text, delay, self.frame_interval):
+            stream.write(piece)
+            stream.flush()
+            remaining = start + due - self._clock()
+            if remaining > 0:
+                self._sleep(remaining)
+        stream.write("\n")
+
+    def flush(self):
+        """Flush the underlying stream"""
+        self.stream.flush()
+
+class BufferedRenderer(Renderer):
+    """Collects a whole turn of output and emits it in a single write"""
+    frame_key = "buffered"
+
+    def __init__(self, stream: Optional[TextIO] = None):
+        self._stream = stream
+        self.parts = []
+
+    @property
+    def stream(self) -> TextIO:
+        """Output stream (resolved lazily so redirected stdout is honoured)"""
+        return self._stream if self._stream is not None else sys.stdout
+
+    def write_line(self, text: str = ""):
+        """Buffer a complete line of text"""
+        self.parts.append(text + "\n")
+
+    def render_frame(self, lines: tuple, texts: Sequence[str]) -> str:
+        """The run's output as one string"""
+        return "".join("\n" * 51 if line[0] is OP_CLEAR else texts[line[1]] + "\n" for line in lines)
+
+    def write_frame(self, frame: str):
+        """Buffer a pre-rendered run of narration"""
+        self.parts.append(frame)
+
+    def getvalue(self) -> str:
+        """Return the output buffered so far without flushing it"""
+        return "".join(self.parts)
+
+    def flush(self):
+        """Emit everything buffered this turn as one write"""
+        if self.parts:
+            stream = self.stream
+            stream.write("".join(self.parts))
+            stream.flush()
+            self.parts = []
+
+class ScreenRenderer(Renderer):
+    """Alternate-screen, double-buffered terminal backend
+    
+    Output for a turn is drawn into a back buffer of screen rows. On flush it
+    is compared with the frame already on screen and only rows that changed
+    are rewritten (cursor-addressed), all in a single write. ``clear`` starts
+    a new frame instead of scrolling 50 blank lines; narration written earlier
+    in the same turn (e.g. the elder's answer before the scene loops back to
+    itself) is carried to the bottom of the new frame so it is not lost.
+    
+    Rows below the frame hold the input prompt and the player's answer, which
+    the renderer does not track, so they are always redrawn. A frame that
+    would not leave ``reserve`` rows for the prompt is drawn in full instead.
+    """
+
+    ENTER = "\x1b[?1049h"
+    LEAVE = "\x1b[?1049l"
+    HOME_CLEAR = "\x1b[H\x1b[2J"
+
+    def __init__(self, stream: Optional[TextIO] = None, size: Optional[tuple] = None,
+                 reserve: int = 8):
+        self._stream = stream
+        self.size = size
+        # Narration is pre-wrapped to the width of the last frame drawn
+        self.frame_key = ("screen", max(20, size[0] - 4)) if size else None
+        self.reserve = reserve
+        self.front = []
+        self.back = []
+        self.carry = []
+        self.turn_start = 0
+        self.turn_lines = []
+        self.active = False
+        self.valid = False
+
+    @property
+    def stream(self) -> TextIO:
+        """Output stream (resolved lazily so redirected stdout is honoured)"""
+        return self._stream if self._stream is not None else sys.stdout
+
+    def write_line(self, text: str = ""):
+        """Add a line (or several, for embedded newlines) to the back buffer"""
+        lines = text.split("\n")
+        self.back.extend(lines)
+        self.turn_lines.extend(lines)
+
+    def clear(self):
+        """Start a new frame, keeping this turn's narration"""
+        self.carry.extend(self.back[self.turn_start:])
+        self.back = []
+        self.turn_start = 0
+
+    def render_frame(self, lines: tuple, texts: Sequence[str]) -> tuple:
+        """The run as clears (None) and ``(lines, rows)`` wrapped to the current width"""
+        width = self.frame_key[1]
+        frame = []
+        for line in lines:
+            if line[0] is OP_CLEAR:
+                frame.append(None)
+            else:
+                split = tuple(texts[line[1]].split("\n"))
+                frame.append((split, tuple(self._rows(split, width))))
+        return tuple(frame)
+
+    def write_frame(self, frame: tuple):
+        """Add pre-wrapped narration to the back buffer"""
+        for part in frame:
+            if part is None:
+                self.clear()
+            else:
+                self.back.extend(part[1])
+                self.turn_lines.extend(part[0])
+
+    def _rows(self, lines: List[str], width: int) -> List[str]:
+        # Wrap long lines ourselves (with slack for wide emoji) so that one
+        # buffer row is always exactly one screen row
+        rows = []
+        for line in lines:
+            if len(line) < width:
+                rows.append(line)
+            else:
+                import textwrap
+                rows.extend(textwrap.wrap(line, width) or [""])
+        return rows
+
+    def flush(self):
+        """Write the rows that differ from the frame on screen, in one write"""
+        if self.size:
+            columns, lines = self.size
+        else:
+            import shutil
+            columns, lines = shutil.get_terminal_size((80, 24))
+        width = max(20, columns - 4)
+        if self.frame_key is None or self.frame_key[1] != width:
+            self.frame_key = ("screen", width)
+        frame = self._rows(self.back + self.carry, width)
+        out = []
+        if not self.active:
+            out.append(self.ENTER + self.HOME_CLEAR)
+            self.active = True
+            self.front = []
+            self.valid = True
+        if len(frame) + self.reserve > lines:
+            # Drawing would scroll the screen; redraw fully and diff again
+            # from a clean screen next time
+            out.append(self.HOME_CLEAR + "\n".join(frame) + "\n")
+            self.valid = False
+        else:
+            old = self.front if self.valid else []
+            changed = [row for row, line in enumerate(frame)
+                       if row >= len(old) or old[row] != line]
+            if not self.valid or len(changed) * 2 > len(frame):
+                # Mostly new content (a different scene): plain redraw is cheaper
+                out.append(self.HOME_CLEAR + "\n".join(frame) + "\n")
+            else:
+                last = None
+                for row in changed:
+                    out.append("\r\n" if last == row - 1 else f"\x1b[{row + 1};1H")
+                    out.append(frame[row] + "\x1b[K")
+                    last = row
+                out.append(f"\x1b[{len(frame) + 1};1H\x1b[J")
+            self.valid = True
+        stream = self.stream
+        stream.write("".join(out))
+        stream.flush()
+        self.front = frame
+        self.back = list(frame)
+        self.carry = []
+        self.turn_start = len(frame)
+        self.turn_lines = []
+
+    def close(self):
+        """Leave the alternate screen, repeating the final turn's output"""
+        if self.active:
+            tail = self.turn_lines or self.front[-3:]
+            self.stream.write(self.LEAVE + "\n".join(tail) + "\n")
+            self.stream.flush()
+            self.active = False
+
+class RecordingRenderer(Renderer):
+    """Records output as ``(text, delay)`` segments for a caller to deliver
+    
+    Used when output has to be paced or transported by someone other than
+    the engine, e.g. an asyncio server writing to a socket.
+    """
+
+    frame_key = "recording"
 
-class GameState:
-    """Manages the current state of the game"""
     def __init__(self):
+        self.segments = []
+
+    def write_line(self, text: str = ""):
+        """Record a line to be shown immediately"""
+        self.segments.append((text, 0.0))
+
+    def type_text(self, text: str, delay: float = 0.03):
+        """Record a line to be typed out with the given per-character delay"""
+        self.segments.append((text, delay))
+
+    def render_frame(self, lines: tuple, texts: Sequence[str]) -> tuple:
+        """The run's segments"""
+        return tuple(("\n" * 50, 0.0) if line[0] is OP_CLEAR
+                     else (texts[line[1]], 0.03 if line[0] is OP_TYPE else 0.0) for line in lines)
+
+    def write_frame(self, frame: tuple):
+        """Record a pre-rendered run of segments"""
+        self.segments.extend(frame)
+
+class NullRenderer(Renderer):
+    """Discards all output, for headless and automated runs"""
+    discards_output = True
+
+    def write_line(self, text: str = ""):
+        """Discard a line of text"""
+
+    def type_text(self, text: str, delay: float = 0.03):
+        """Discard narration without pacing"""
+
+    def clear(self):
+        """Nothing to clear"""
+
+class InputProvider:
+    """Source of player input for the engine"""
+
+    def read(self, prompt: str, valid_options: Optional[List[str]] = None) -> str:
+        """Return the next raw line of input; raise EOFError when exhausted"""
+        raise NotImplementedError
+
+class ConsoleInput(InputProvider):
+    """Reads input interactively from the keyboard"""
+
+    def read(self, prompt: str, valid_options: Optional[List[str]] = None) -> str:
+        """Prompt the player and return what they typed"""
+        return input(prompt)
+
+class ScriptedInput(InputProvider):
+    """Feeds a predetermined sequence of choices (list, file or generator)"""
+
+    def __init__(self, choices: Iterable[str]):
+        self._choices = iter(choices)
+
+    @classmethod
+    def from_file(cls, path: str) -> "ScriptedInput":
+        """Read one choice per line from a text file"""
+        with open(path, "r", encoding="utf-8") as fh:
+            return cls([line.rstrip("\r\n") for line in fh])
+
+    def read(self, prompt: str, valid_options: Optional[List[str]] = None) -> str:
+        """Return the next scripted choice"""
+        try:
+            return next(self._choices)
+        except StopIteration:
+            raise EOFError from None
+
+class RandomInput(InputProvider):
+    """Picks uniformly among the valid options using a seeded RNG"""
+
+    def __init__(self, rng: Optional["random.Random"] = None):
+        if rng is None:
+            import random
+            rng = random.Random()
+        self.rng = rng
+
+    def read(self, prompt: str, valid_options: Optional[List[str]] = None) -> str:
+        """Return a random valid choice (empty input for free-form prompts)"""
+        if not valid_options:
+            return ""
+        return self.rng.choice(valid_options)
+
+class InputRequired(Exception):
+    """Raised by QueuedInput when a scene asks for input that has not arrived"""
+
+    def __init__(self, prompt: str, valid_options: Optional[List[str]] = None):
+        super().__init__(prompt)
+        self.prompt = prompt
+        self.valid_options = valid_options
+
+class QueuedInput(InputProvider):
+    """Serves choices pushed by the caller; raises InputRequired when empty"""
+
+    def __init__(self, choices: Iterable[str] = ()):
+        self.queue = collections.deque(choices)
+
+    def read(self, prompt: str, valid_options: Optional[List[str]] = None) -> str:
+        """Return the next queued choice"""
+        if not self.queue:
+            raise InputRequired(prompt, valid_options)
+        return self.queue.popleft()
+
+class GameExit(Exception):
+    """Raised to end the session when the player quits or input runs out"""
+
+class TurnRewound(Exception):
+    """Raised when ``undo`` or ``rewind`` moved the game back; ``step`` runs the restored scene next"""
+
+# Interned IDs shared by every ItemSet, so each set stores small integers
+_symbol_ids = {}
+_symbol_names = []
+
+def symbol_id(name: str) -> int:
+    """Return the interned integer ID for an item or quest name"""
+    try:
+        return _symbol_ids[name]
+    except KeyError:
+        name = sys.intern(name)
+        _symbol_ids[name] = len(_symbol_names)
+        _symbol_names.append(name)
+        return _symbol_ids[name]
+
+class ItemSet:
+    """Insertion-ordered set of interned names with O(1) membership tests
+    
+    Membership is an integer bitmask over interned IDs; the order is kept as
+    a tuple of IDs. ``append`` is an idempotent alias of ``add`` so code that
+    treated inventories and quest logs as lists keeps working.
+    """
+    __slots__ = ("bits", "order")
+
+    def __init__(self, names: Iterable[str] = ()):
+        self.bits = 0
+        self.order = ()
+        for name in names:
+            self.add(name)
+
+    def add(self, name: str) -> bool:
+        """Add a name; returns False if it was already present"""
+        ident = symbol_id(name)
+        mask = 1 << ident
+        if self.bits & mask:
+            return False
+        self.bits |= mask
+        self.order += (ident,)
+        return True
+
+    append = add
+
+    def discard(self, name: str) -> bool:
+        """Remove a name if present; returns whether it was removed"""
+        ident = _symbol_ids.get(name)
+        if ident is None or not self.bits >> ident & 1:
+            return False
+        self.bits &= ~(1 << ident)
+        self.order = tuple(i for i in self.order if i != ident)
+        return True
+
+    def copy(self) -> "ItemSet":
+        """Return an independent copy"""
+        clone = ItemSet()
+        clone.bits = self.bits
+        clone.order = self.order
+        return clone
+
+    def __contains__(self, name) -> bool:
+        ident = _symbol_ids.get(name)
+        return ident is not None and bool(self.bits >> ident & 1)
+
+    def __iter__(self):
+        return map(_symbol_names.__getitem__, self.order)
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def __bool__(self) -> bool:
+        return bool(self.bits)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, ItemSet):
+            return self.order == other.order
+        if isinstance(other, (list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+# Flags the scenes know about live in a bitfield; anything else falls back to a dict
+KNOWN_FLAGS = ("accepted_quest", "wolf_quest", "herb_quest", "delivery_quest")
+_flag_bits = {name: 1 << i for i, name in enumerate(KNOWN_FLAGS)}
+
+class GameFlags:
+    """Dict-like store of boolean story flags backed by an integer bitfield
+    
+    Known flags are single bits; a known flag set to a false value is simply
+    cleared. Unknown flags are kept in a small dict created on first use.
+    """
+    __slots__ = ("bits", "extra")
+
+    def __init__(self, flags: Optional[Dict[str, bool]] = None):
+        self.bits = 0
+        self.extra = None
+        if flags:
+            for name, value in flags.items():
+                self[name] = value
+
+    def __getitem__(self, name: str):
+        bit = _flag_bits.get(name)
+        if bit is not None:
+            if self.bits & bit:
+                return True
+        elif self.extra and name in self.extra:
+            return self.extra[name]
+        raise KeyError(name)
+
+    def __setitem__(self, name: str, value):
+        bit = _flag_bits.get(name)
+        if bit is None:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[name] = value
+        elif value:
+            self.bits |= bit
+        else:
+            self.bits &= ~bit
+
+    def __delitem__(self, name: str):
+        bit = _flag_bits.get(name)
+        if bit is not None and self.bits & bit:
+            self.bits &= ~bit
+        elif self.extra and name in self.extra:
+            del self.extra[name]
+        else:
+            raise KeyError(name)
+
+    def get(self, name: str, default=None):
+        """Return a flag's value, or ``default`` if it is not set"""
+        bit = _flag_bits.get(name)
+        if bit is not None:
+            return True if self.bits & bit else default
+        if self.extra:
+            return self.extra.get(name, default)
+        return default
+
+    def __contains__(self, name) -> bool:
+        bit = _flag_bits.get(name)
+        if bit is not None:
+            return bool(self.bits & bit)
+        return bool(self.extra) and name in self.extra
+
+    def keys(self) -> List[str]:
+        """Names of the flags that are set"""
+        names = [name for name in KNOWN_FLAGS if self.bits & _flag_bits[name]]
+        if self.extra:
+            names.extend(self.extra)
+        return names
+
+    def items(self) -> List[tuple]:
+        """``(name, value)`` pairs of the flags that are set"""
+        return [(name, self[name]) for name in self.keys()]
+
+    def copy(self) -> "GameFlags":
+        """Return an independent copy"""
+        clone = GameFlags()
+        clone.bits = self.bits
+        clone.extra = dict(self.extra) if self.extra else None
+        return clone
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self) -> int:
+        return bin(self.bits).count("1") + (len(self.extra) if self.extra else 0)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (GameFlags, dict)):
+            return dict(self.items()) == dict(other.items())
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return repr(dict(self.items()))
+
+# Player-facing text outside the scenes, as (key, template) pairs. Every
+# text table starts with these in this order, so a message has the same ID
+# in every locale; scene text follows.
+MESSAGES = (
+    ("acquired", "✨ You acquired: {item}"),
+    ("health_restored", "❤️  Health restored by {amount}"),
+    ("health_reduced", "💔 Health reduced by {amount}"),
+    ("gold_gained", "💰 Gained {amount} gold"),
+    ("gold_lost", "💸 Lost {amount} gold"),
+    ("reputation_increased", "🌟 Reputation increased by {amount}"),
+    ("reputation_decreased", "👎 Reputation decreased by {amount}"),
+    ("choose_from", "❌ Please choose from: {options}"),
+    ("goodbye", "\n\n👋 Thanks for playing! Goodbye!"),
+    ("title", "    THE LOST REALMS OF ELDRIA"),
+    ("welcome", "Welcome, brave adventurer! You find yourself in the mystical realm of Eldria..."),
+    ("welcome_land", "A land where magic flows like rivers and ancient secrets lie hidden in every shadow."),
+    ("welcome_village", "Your journey begins in the peaceful village of Moonhaven, but destiny has greater plans for you."),
+    ("ask_name", "What is your name, traveler? "),
+    ("default_name", "Brave Adventurer"),
+    ("greeting", "Ah, {name}! The stars have foretold your arrival..."),
+    ("begin", "Your adventure is about to begin. Choose wisely, for every decision shapes your destiny."),
+    ("press_enter", "Press Enter to begin your journey..."),
+    ("status_health", "🏥 Health: {health}/100"),
+    ("status_gold", "💰 Gold: {gold}"),
+    ("status_reputation", "🌟 Reputation: {reputation}"),
+    ("status_inventory", "🎒 Inventory: {items}"),
+    ("status_empty", "Empty"),
+    ("inventory_empty", "Your inventory is empty."),
+    ("undo_usage", "⏪ Type undo, or rewind and a number of turns (up to {turns})."),
+    ("undo_nothing", "⏪ Nothing to undo yet."),
+    ("undo_limit_one", "⏪ You can go back at most 1 turn."),
+    ("undo_limit", "⏪ You can go back at most {turns} turns."),
+    ("undo_back_one", "⏪ Back 1 turn, to the {location}."),
+    ("undo_back", "⏪ Back {turns} turns, to the {location}."),
+    ("hint_topics", "💡 Ask for a hint about: {names}"),
+    ("hint_have", "💡 You already have {goal}."),
+    ("hint_no_route", "💡 No known way to {goal} from here."),
+    ("hint_route_one", "💡 {goal} is 1 turn away. Type: {typed}"),
+    ("hint_route", "💡 {goal} is {turns} turns away. Type: {typed}"),
+    ("autosave_unsaved", "⚠️  Your latest progress may not have been saved."),
+)
+(MSG_ACQUIRED, MSG_HEALTH_RESTORED, MSG_HEALTH_REDUCED, MSG_GOLD_GAINED, MSG_GOLD_LOST,
+ MSG_REPUTATION_INCREASED, MSG_REPUTATION_DECREASED, MSG_CHOOSE_FROM, MSG_GOODBYE, MSG_TITLE,
+ MSG_WELCOME, MSG_WELCOME_LAND, MSG_WELCOME_VILLAGE, MSG_ASK_NAME, MSG_DEFAULT_NAME, MSG_GREETING,
+ MSG_BEGIN, MSG_PRESS_ENTER, MSG_STATUS_HEALTH, MSG_STATUS_GOLD, MSG_STATUS_REPUTATION,
+ MSG_STATUS_INVENTORY, MSG_STATUS_EMPTY, MSG_INVENTORY_EMPTY, MSG_UNDO_USAGE, MSG_UNDO_NOTHING,
+ MSG_UNDO_LIMIT_ONE, MSG_UNDO_LIMIT, MSG_UNDO_BACK_ONE, MSG_UNDO_BACK, MSG_HINT_TOPICS, MSG_HINT_HAVE,
+ MSG_HINT_NO_ROUTE, MSG_HINT_ROUTE_ONE, MSG_HINT_ROUTE, MSG_AUTOSAVE_UNSAVED) = range(len(MESSAGES))
+MESSAGE_TEXTS = tuple(text for _, text in MESSAGES)
+
+class GameState:
+    """Manages the current state of the game
+    
+    ``texts`` is the text table its messages are looked up in (the
+    English messages by default; engines pass their world's table).
+    """
+    __slots__ = ("renderer", "texts", "current_location", "inventory", "health", "gold",
+                 "reputation", "completed_quests", "game_flags")
+    
+    def __init__(self, renderer: Optional[Renderer] = None, texts: Optional[Sequence[str]] = None):
+        self.renderer = renderer if renderer is not None else TerminalRenderer()
+        self.texts = texts if texts is not None else MESSAGE_TEXTS
         self.current_location = "start"
-        self.inventory = []
+        self.inventory = ItemSet()
         self.health = 100
         self.gold = 50
         self.reputation = 0
-        self.completed_quests = []
-        self.game_flags = {}
+        self.completed_quests = ItemSet()
+        self.game_flags = GameFlags()
         
+    def copy(self) -> "GameState":
+        """Return an independent copy that shares this state's renderer"""
+        clone = GameState.__new__(GameState)
+        clone.renderer = self.renderer
+        clone.texts = self.texts
+        clone.current_location = self.current_location
+        clone.inventory = self.inventory.copy()
+        clone.health = self.health
+        clone.gold = self.gold
+        clone.reputation = self.reputation
+        clone.completed_quests = self.completed_quests.copy()
+        clone.game_flags = self.game_flags.copy()
+        return clone
+    
     def add_item(self, item: str):
         """Add an item to player's inventory"""
-        if item not in self.inventory:
-            self.inventory.append(item)
-            print(f"✨ You acquired: {item}")
+        if self.inventory.add(item):
+            self.renderer.write_line(self.texts[MSG_ACQUIRED].format(item=item))
     
     def remove_item(self, item: str):
         """Remove an item from player's inventory"""
-        if item in self.inventory:
-            self.inventory.remove(item)
-            return True
-        return False
+        return self.inventory.discard(item)
+    
+    def complete_quest(self, quest: str) -> bool:
+        """Mark a quest as completed; returns False if it already was"""
+        return self.completed_quests.add(quest)
     
     def has_item(self, item: str) -> bool:
         """Check if player has a specific item"""
@@ -35,37 +724,76 @@ class GameState:
         """Modify player's health"""
         self.health = max(0, min(100, self.health + amount))
         if amount > 0:
-            print(f"❤️  Health restored by {amount}")
+            self.renderer.write_line(self.texts[MSG_HEALTH_RESTORED].format(amount=amount))
         elif amount < 0:
-            print(f"💔 Health reduced by {abs(amount)}")
+            self.renderer.write_line(self.texts[MSG_HEALTH_REDUCED].format(amount=-amount))
     
     def modify_gold(self, amount: int):
         """Modify player's gold"""
         self.gold = max(0, self.gold + amount)
         if amount > 0:
-            print(f"💰 Gained {amount} gold")
+            self.renderer.write_line(self.texts[MSG_GOLD_GAINED].format(amount=amount))
         elif amount < 0:
-            print(f"💸 Lost {abs(amount)} gold")
+            self.renderer.write_line(self.texts[MSG_GOLD_LOST].format(amount=-amount))
     
     def modify_reputation(self, amount: int):
         """Modify player's reputation"""
         self.reputation += amount
         if amount > 0:
-            print(f"🌟 Reputation increased by {amount}")
+            self.renderer.write_line(self.texts[MSG_REPUTATION_INCREASED].format(amount=amount))
         elif amount < 0:
-            print(f"👎 Reputation decreased by {abs(amount)}")
+            self.renderer.write_line(self.texts[MSG_REPUTATION_DECREASED].format(amount=-amount))
 
 class GameEngine:
-    """Main game engine that handles story progression and user interactions"""
+    """Main game engine that handles story progression and user interactions
     
-    def __init__(self):
-        self.state = GameState()
-        self.locations = {}
+    An engine built from a ``world`` starts with that world's read-only
+    location table shared with every other session; ``add_location`` copies
+    it on first write, so a session costs only its own state and cursor.
+    Scene text and messages are looked up by ID in ``texts``, the world's
+    text table.
+    """
+    __slots__ = ("renderer", "input_provider", "texts", "state", "world", "locations", "current_scene",
+                 "game_running", "player_name", "location_hooks", "input_hooks", "exit_hooks",
+                 "coverage", "metrics", "typeahead", "skipped", "hints", "history")
+    
+    def __init__(self, renderer: Optional[Renderer] = None,
+                 input_provider: Optional[InputProvider] = None,
+                 world: Optional["World"] = None):
+        self.renderer = renderer if renderer is not None else TerminalRenderer()
+        self.input_provider = input_provider if input_provider is not None else ConsoleInput()
+        self.texts = world.texts if world is not None else MESSAGE_TEXTS
+        self.state = GameState(self.renderer, self.texts)
+        self.world = world
+        self.locations = world.scenes if world is not None else {}
         self.current_scene = None
         self.game_running = True
+        self.player_name = None
+        self.location_hooks = ()
+        self.input_hooks = ()
+        self.exit_hooks = ()
+        self.coverage = None
+        self.metrics = None
+        self.typeahead = None
+        self.skipped = []
+        self.hints = None
+        self.history = None
         
+    def reset(self):
+        """Start a fresh game in the same engine, keeping scenes and I/O"""
+        self.state = GameState(self.renderer, self.texts)
+        self.current_scene = None
+        self.game_running = True
+        self.skipped = []
+        if self.history is not None:
+            self.history.clear()
+        self.go_to_location("start")
+    
     def add_location(self, location_id: str, scene_func: Callable):
         """Add a location/scene to the game"""
+        if type(self.locations) is not dict:
+            # Copy-on-write: detach from the shared world template
+            self.locations = dict(self.locations)
         self.locations[location_id] = scene_func
     
     def go_to_location(self, location_id: str):
@@ -73,426 +801,1171 @@ class GameEngine:
         if location_id in self.locations:
             self.state.current_location = location_id
             self.current_scene = self.locations[location_id]
+            for hook in self.location_hooks:
+                hook(self)
             return True
         return False
     
+    def add_location_hook(self, hook: Callable):
+        """Call ``hook(engine)`` after every successful go_to_location"""
+        self.location_hooks += (hook,)
+    
+    def add_input_hook(self, hook: Callable):
+        """Call ``hook(engine, choice)`` for every validated get_user_input answer"""
+        self.input_hooks += (hook,)
+    
+    def add_exit_hook(self, hook: Callable):
+        """Call ``hook(engine)`` when the player quits or input runs out"""
+        self.exit_hooks += (hook,)
+    
     def get_user_input(self, prompt: str, valid_options: List[str] = None) -> str:
-        """Get and validate user input"""
+        """Get and validate user input
+        
+        Several answers can be typed ahead on one line ("4 3 2"). The extra
+        tokens are queued and answer the following menus without prompting,
+        and scenes skip their narration while answers are queued; if a
+        queued answer is rejected, the narration skipped since the last
+        accepted answer is shown before the error. With a
+        hint index attached (``engine.hints``), "hint <goal>" at a menu
+        prints a route to that goal and asks again. With a history attached
+        (``engine.history``), "undo" and "rewind N" at a menu restore an
+        earlier turn and raise TurnRewound to leave the current scene.
+        """
         while True:
             try:
-                user_input = input(f"\n{prompt} ").strip().lower()
+                if self.typeahead:
+                    # "Press Enter" pauses don't use up typed-ahead answers
+                    user_input = self.typeahead.popleft() if valid_options is not None else ""
+                else:
+                    user_input = self._read(f"\n{prompt} ", valid_options).strip().lower()
+                    if self.hints is not None and valid_options is not None and user_input.startswith("hint"):
+                        self.echo(self.hints.answer(self.state, user_input[4:]))
+                        continue
+                    if (self.history is not None and valid_options is not None
+                            and user_input.startswith(("undo", "rewind")) and user_input not in valid_options):
+                        if self.history.command(self, user_input):
+                            raise TurnRewound()
+                        continue
+                    if valid_options is not None and user_input not in valid_options and " " in user_input:
+                        user_input, *rest = user_input.split()
+                        self.typeahead = collections.deque(rest)
                 if valid_options is None or user_input in valid_options:
+                    if self.skipped:
+                        self.skipped = []
+                    for hook in self.input_hooks:
+                        hook(self, user_input)
                     return user_input
                 else:
-                    print(f"❌ Please choose from: {', '.join(valid_options)}")
+                    # The rest of the line was meant for a different path; show
+                    # the scene it skipped so the error refers to something
+                    self.typeahead = None
+                    skipped, self.skipped = self.skipped, []
+                    for show, args in skipped:
+                        show(*args)
+                    self.echo(self.texts[MSG_CHOOSE_FROM].format(options=", ".join(valid_options)))
             except KeyboardInterrupt:
-                print("\n\n👋 Thanks for playing! Goodbye!")
-                sys.exit(0)
+                self.end_game()
             except EOFError:
-                print("\n\n👋 Thanks for playing! Goodbye!")
-                sys.exit(0)
+                self.end_game()
+    
+    def end_game(self):
+        """Say goodbye and stop the game loop"""
+        self.game_running = False
+        self.typeahead = None
+        for hook in self.exit_hooks:
+            hook(self)
+        self.echo(self.texts[MSG_GOODBYE])
+        self.renderer.flush()
+        raise GameExit()
     
     def display_status(self):
         """Display current player status"""
-        print(f"\n{'='*50}")
-        print(f"🏥 Health: {self.state.health}/100")
-        print(f"💰 Gold: {self.state.gold}")
-        print(f"🌟 Reputation: {self.state.reputation}")
-        print(f"🎒 Inventory: {', '.join(self.state.inventory) if self.state.inventory else 'Empty'}")
-        print(f"{'='*50}")
+        if self.renderer.discards_output:
+            return
+        if self.typeahead:
+            self.skipped.append((self.display_status, ()))
+            return
+        texts, state = self.texts, self.state
+        items = ", ".join(state.inventory) if state.inventory else texts[MSG_STATUS_EMPTY]
+        self.echo(f"\n{'='*50}")
+        self.echo(texts[MSG_STATUS_HEALTH].format(health=state.health))
+        self.echo(texts[MSG_STATUS_GOLD].format(gold=state.gold))
+        self.echo(texts[MSG_STATUS_REPUTATION].format(reputation=state.reputation))
+        self.echo(texts[MSG_STATUS_INVENTORY].format(items=items))
+        self.echo(f"{'='*50}")
+    
+    def echo(self, text: str = ""):
+        """Display a line of text immediately, without typing effect"""
+        if not self.typeahead:
+            self.renderer.write_line(text)
+        else:
+            self.skipped.append((self.echo, (text,)))
     
     def type_text(self, text: str, delay: float = 0.03):
         """Display text with typing effect"""
-        for char in text:
-            print(char, end='', flush=True)
-            time.sleep(delay)
-        print()
+        if not self.typeahead:
+            self.renderer.type_text(text, delay)
+        else:
+            self.skipped.append((self.type_text, (text, delay)))
     
     def clear_screen(self):
         """Clear the console screen"""
-        print("\n" * 50)
+        if not self.typeahead:
+            self.renderer.clear()
+        else:
+            self.skipped.append((self.clear_screen, ()))
     
-    def run(self):
-        """Main game loop"""
-        self.clear_screen()
-        self.show_intro()
-        
-        while self.game_running:
-            if self.current_scene:
-                self.current_scene(self)
-            else:
-                # Default to start location
-                self.go_to_location("start")
+    def step(self):
+        """Run the current scene once (one turn)"""
+        if self.current_scene:
+            try:
+                if self.metrics is None:
+                    self.current_scene(self)
+                else:
+                    self.metrics.run_scene(self, self.current_scene)
+            except TurnRewound:
+                pass
+        else:
+            # Default to start location
+            self.go_to_location("start")
+    
+    def run(self, fast_start: bool = False):
+        """Main game loop; ``fast_start`` shows the intro without the typing effect"""
+        try:
+            self.clear_screen()
+            self.show_intro(paced=not fast_start)
+            
+            while self.game_running:
+                self.step()
+        except GameExit:
+            pass
+        finally:
+            self.renderer.close()
     
-    def show_intro(self):
+    def show_intro(self, paced: bool = True):
         """Display game introduction"""
-        print("🎮" * 20)
-        print("    THE LOST REALMS OF ELDRIA")
-        print("🎮" * 20)
-        print()
+        texts = self.texts
+        narrate = self.type_text if paced else self.echo
+        self.echo("🎮" * 20)
+        self.echo(texts[MSG_TITLE])
+        self.echo("🎮" * 20)
+        self.echo()
         
-        self.type_text("Welcome, brave adventurer! You find yourself in the mystical realm of Eldria...")
-        self.type_text("A land where magic flows like rivers and ancient secrets lie hidden in every shadow.")
-        self.type_text("Your journey begins in the peaceful village of Moonhaven, but destiny has greater plans for you.")
-        print()
+        narrate(texts[MSG_WELCOME])
+        narrate(texts[MSG_WELCOME_LAND])
+        narrate(texts[MSG_WELCOME_VILLAGE])
+        self.echo()
         
-        name = input("What is your name, traveler? ").strip()
+        name = self.read_line(texts[MSG_ASK_NAME]).strip()
         if not name:
-            name = "Brave Adventurer"
+            name = texts[MSG_DEFAULT_NAME]
+        self.player_name = name
         
-        self.type_text(f"Ah, {name}! The stars have foretold your arrival...")
-        self.type_text("Your adventure is about to begin. Choose wisely, for every decision shapes your destiny.")
-        print()
+        narrate(texts[MSG_GREETING].format(name=name))
+        narrate(texts[MSG_BEGIN])
+        self.echo()
         
-        input("Press Enter to begin your journey...")
+        self.read_line(texts[MSG_PRESS_ENTER])
         self.clear_screen()
+    
+    def read_line(self, prompt: str) -> str:
+        """Read a line of free-form input, ending the game on EOF or Ctrl+C"""
+        try:
+            return self._read(prompt)
+        except (KeyboardInterrupt, EOFError):
+            self.end_game()
+    
+    def _read(self, prompt: str, valid_options: List[str] = None) -> str:
+        """Flush pending output and read from the input provider"""
+        self.renderer.flush()
+        if self.metrics is None:
+            return self.input_provider.read(prompt, valid_options)
+        return self.metrics.timed_read(self.input_provider, prompt, valid_options)
 
-def create_game():
-    """Create and configure the game with all scenes and locations"""
-    game = GameEngine()
-    
-    # Define all game scenes
-    def start_scene(game_engine):
-        """Starting scene in Moonhaven village"""
-        game_engine.clear_screen()
-        game_engine.type_text("🌙 MOONHAVEN VILLAGE")
-        game_engine.type_text("You stand in the center of Moonhaven, a quaint village nestled between rolling hills.")
-        game_engine.type_text("The air is crisp with the scent of pine and the distant sound of a blacksmith's hammer.")
-        game_engine.type_text("Villagers go about their daily business, casting curious glances your way.")
-        print()
-        
-        game_engine.display_status()
-        
-        game_engine.type_text("What would you like to do?")
-        choice = game_engine.get_user_input(
-            "1. Visit the local tavern\n2. Check the notice board\n3. Talk to the village elder\n4. Explore the forest path\n5. Check your inventory\nChoice: ",
-            ["1", "2", "3", "4", "5"]
-        )
-        
-        if choice == "1":
-            game_engine.go_to_location("tavern")
-        elif choice == "2":
-            game_engine.go_to_location("notice_board")
-        elif choice == "3":
-            game_engine.go_to_location("elder")
-        elif choice == "4":
-            game_engine.go_to_location("forest_path")
-        elif choice == "5":
-            game_engine.go_to_location("inventory")
-    
-    def tavern_scene(game_engine):
-        """Tavern scene with first major decision"""
-        game_engine.clear_screen()
-        game_engine.type_text("🍺 THE GOLDEN ALE TAVERN")
-        game_engine.type_text("The tavern is warm and inviting, filled with the sound of laughter and clinking mugs.")
-        game_engine.type_text("A bard strums a lute in the corner, singing tales of distant lands and heroic deeds.")
-        game_engine.type_text("At the bar, you notice a mysterious figure in dark robes, watching you intently.")
-        print()
-        
-        game_engine.type_text("🎯 DECISION POINT #1: The Mysterious Stranger")
-        game_engine.type_text("The stranger approaches you with a proposition...")
-        game_engine.type_text("'I have a map to an ancient temple filled with treasures,' they whisper.")
-        game_engine.type_text("'But I need a partner for this dangerous journey. Are you interested?'")
-        print()
-        
-        choice = game_engine.get_user_input(
-            "1. Accept the offer (requires 20 gold)\n2. Decline politely\n3. Ask for more details\n4. Return to village square\nChoice: ",
-            ["1", "2", "3", "4"]
-        )
+# World content
+#
+# Every scene is plain data: a list of steps run in order. A step is a tuple
+# whose first element names it:
+#   ("clear",)                          clear the screen
+#   ("type", text)                      narration with the typing effect
+#   ("echo", text)                      text shown immediately ("" = blank line)
+#   ("status",)                         the player status block
+#   ("inventory",)                      numbered listing of the inventory
+#   ("gold" | "health" | "reputation", amount)
+#   ("add_item" | "remove_item", item)
+#   ("flag", name)                      set a story flag
+#   ("quest", name)                     complete a quest
+#   ("goto", location)                  move to another location
+#   ("if", condition, then_steps, else_steps)
+#   ("menu", prompt, {choice: steps})   ask the player, run the chosen steps
+#   ("pause", prompt)                   wait for any input
+# Conditions are ("gold_at_least", amount), ("has_item", item) or ("flag", name).
+WORLD_SPEC = (
+    {
+        "id": "start",
+        "description": "Starting scene in Moonhaven village",
+        "steps": [
+            ("clear",),
+            ("type", "🌙 MOONHAVEN VILLAGE"),
+            ("type", "You stand in the center of Moonhaven, a quaint village nestled between rolling hills."),
+            ("type", "The air is crisp with the scent of pine and the distant sound of a blacksmith's hammer."),
+            ("type", "Villagers go about their daily business, casting curious glances your way."),
+            ("echo", ""),
+            ("status",),
+            ("type", "What would you like to do?"),
+            ("menu", "1. Visit the local tavern\n2. Check the notice board\n3. Talk to the village elder\n4. Explore the forest path\n5. Check your inventory\nChoice: ", {
+                "1": [("goto", "tavern")],
+                "2": [("goto", "notice_board")],
+                "3": [("goto", "elder")],
+                "4": [("goto", "forest_path")],
+                "5": [("goto", "inventory")],
+            }),
+        ],
+    },
+    {
+        "id": "tavern",
+        "description": "Tavern scene with first major decision",
+        "steps": [
+            ("clear",),
+            ("type", "🍺 THE GOLDEN ALE TAVERN"),
+            ("type", "The tavern is warm and inviting, filled with the sound of laughter and clinking mugs."),
+            ("type", "A bard strums a lute in the corner, singing tales of distant lands and heroic deeds."),
+            ("type", "At the bar, you notice a mysterious figure in dark robes, watching you intently."),
+            ("echo", ""),
+            ("type", "🎯 DECISION POINT #1: The Mysterious Stranger"),
+            ("type", "The stranger approaches you with a proposition..."),
+            ("type", "'I have a map to an ancient temple filled with treasures,' they whisper."),
+            ("type", "'But I need a partner for this dangerous journey. Are you interested?'"),
+            ("echo", ""),
+            ("menu", "1. Accept the offer (requires 20 gold)\n2. Decline politely\n3. Ask for more details\n4. Return to village square\nChoice: ", {
+                "1": [
+                    ("if", ("gold_at_least", 20), [
+                        ("gold", -20),
+                        ("add_item", "Ancient Map"),
+                        ("flag", "accepted_quest"),
+                        ("type", "You hand over 20 gold and receive the ancient map."),
+                        ("type", "'Meet me at the forest edge at dawn tomorrow,' the stranger says."),
+                        ("goto", "start"),
+                    ], [
+                        ("type", "❌ You don't have enough gold for this venture."),
+                        ("goto", "start"),
+                    ]),
+                ],
+                "2": [
+                    ("reputation", 5),
+                    ("type", "You decline politely. The stranger nods respectfully and leaves."),
+                    ("type", "The villagers seem to appreciate your cautious nature."),
+                    ("goto", "start"),
+                ],
+                "3": [
+                    ("type", "'The temple lies in the Darkwood Forest, guarded by ancient traps and creatures.'"),
+                    ("type", "'The reward could be worth thousands of gold pieces...'"),
+                    ("type", "The stranger seems impatient with your questions."),
+                    ("goto", "tavern"),
+                ],
+                "4": [("goto", "start")],
+            }),
+        ],
+    },
+    {
+        "id": "notice_board",
+        "description": "Notice board with quest opportunities",
+        "steps": [
+            ("clear",),
+            ("type", "📋 VILLAGE NOTICE BOARD"),
+            ("type", "Various notices and requests are pinned to the weathered wooden board."),
+            ("type", "Some are recent, others have been here for weeks."),
+            ("echo", ""),
+            ("type", "Available Quests:"),
+            ("type", "1. 🐺 Hunt wolves threatening the village (Reward: 30 gold)"),
+            ("type", "2. 🌿 Gather rare herbs for the healer (Reward: 15 gold + healing potion)"),
+            ("type", "3. 📦 Deliver a package to the next village (Reward: 25 gold)"),
+            ("echo", ""),
+            ("menu", "1. Accept wolf hunting quest\n2. Accept herb gathering quest\n3. Accept delivery quest\n4. Return to village square\nChoice: ", {
+                "1": [
+                    ("add_item", "Wolf Hunting Contract"),
+                    ("flag", "wolf_quest"),
+                    ("type", "You take the wolf hunting contract from the board."),
+                    ("type", "The village guard will provide you with a weapon."),
+                    ("goto", "start"),
+                ],
+                "2": [
+                    ("add_item", "Herb Gathering List"),
+                    ("flag", "herb_quest"),
+                    ("type", "You take the herb gathering list."),
+                    ("type", "The healer's hut is near the forest edge."),
+                    ("goto", "start"),
+                ],
+                "3": [
+                    ("add_item", "Delivery Package"),
+                    ("flag", "delivery_quest"),
+                    ("type", "You take the delivery package."),
+                    ("type", "The recipient is in the village of Stonebridge, a day's journey away."),
+                    ("goto", "start"),
+                ],
+                "4": [("goto", "start")],
+            }),
+        ],
+    },
+    {
+        "id": "elder",
+        "description": "Village elder with wisdom and lore",
+        "steps": [
+            ("clear",),
+            ("type", "👴 VILLAGE ELDER'S COTTAGE"),
+            ("type", "The elder's cottage is filled with books, scrolls, and mysterious artifacts."),
+            ("type", "Elder Thorne sits by the fireplace, his wise eyes twinkling with ancient knowledge."),
+            ("echo", ""),
+            ("type", "'Ah, a new face in Moonhaven,' the elder says warmly."),
+            ("type", "'I sense great potential in you, young one. Perhaps you seek knowledge?'"),
+            ("echo", ""),
+            ("menu", "1. Ask about the village's history\n2. Inquire about local legends\n3. Seek advice for your journey\n4. Return to village square\nChoice: ", {
+                "1": [
+                    ("type", "'Moonhaven was founded by the Moonweaver family, blessed by the goddess Luna.'"),
+                    ("type", "'We've lived in peace for generations, but dark times may be coming...'"),
+                    ("reputation", 3),
+                    ("goto", "elder"),
+                ],
+                "2": [
+                    ("type", "'Legends speak of the Crystal Caverns beneath the mountains.'"),
+                    ("type", "'They say the crystals there can grant visions of the future...'"),
+                    ("add_item", "Crystal Cavern Knowledge"),
+                    ("goto", "elder"),
+                ],
+                "3": [
+                    ("type", "'Trust your instincts, but remember: not all that glitters is gold.'"),
+                    ("type", "'Sometimes the greatest treasures are found in unexpected places.'"),
+                    ("reputation", 5),
+                    ("goto", "elder"),
+                ],
+                "4": [("goto", "start")],
+            }),
+        ],
+    },
+    {
+        "id": "forest_path",
+        "description": "Forest path with second major decision",
+        "steps": [
+            ("clear",),
+            ("type", "🌲 FOREST PATH"),
+            ("type", "The forest path winds through ancient trees, their branches creating a natural canopy."),
+            ("type", "Sunlight filters through the leaves, creating dancing patterns on the forest floor."),
+            ("type", "You hear the distant sound of running water and the calls of forest creatures."),
+            ("echo", ""),
+            ("type", "🎯 DECISION POINT #2: The Forest Crossroads"),
+            ("type", "The path splits into three directions:"),
+            ("type", "1. A well-traveled path leading to a nearby village"),
+            ("type", "2. A narrow, overgrown trail that seems to lead deeper into the forest"),
+            ("type", "3. A path that follows the sound of water"),
+            ("echo", ""),
+            ("menu", "1. Take the well-traveled path\n2. Follow the overgrown trail\n3. Follow the water sound\n4. Return to village\nChoice: ", {
+                "1": [
+                    ("type", "You follow the well-traveled path..."),
+                    ("type", "After a short walk, you reach the village of Stonebridge."),
+                    ("reputation", 2),
+                    ("if", ("flag", "delivery_quest"), [
+                        ("gold", 25),
+                        ("remove_item", "Delivery Package"),
+                        ("quest", "Delivery Quest"),
+                        ("type", "✅ You successfully delivered the package and earned 25 gold!"),
+                    ], []),
+                    ("goto", "stonebridge"),
+                ],
+                "2": [
+                    ("type", "You venture down the overgrown trail..."),
+                    ("type", "The path becomes increasingly difficult to follow."),
+                    ("type", "Suddenly, you stumble upon a hidden clearing with rare herbs!"),
+                    ("if", ("flag", "herb_quest"), [
+                        ("add_item", "Rare Herbs"),
+                        ("gold", 15),
+                        ("add_item", "Healing Potion"),
+                        ("quest", "Herb Quest"),
+                        ("type", "✅ You found the rare herbs and completed the quest!"),
+                    ], [
+                        ("add_item", "Rare Herbs"),
+                        ("type", "You found some rare herbs. These might be valuable!"),
+                    ]),
+                    ("goto", "hidden_clearing"),
+                ],
+                "3": [
+                    ("type", "You follow the sound of water..."),
+                    ("type", "You discover a beautiful waterfall with a small cave behind it."),
+                    ("type", "Inside the cave, you find an old chest!"),
+                    ("goto", "waterfall_cave"),
+                ],
+                "4": [("goto", "start")],
+            }),
+        ],
+    },
+    {
+        "id": "inventory",
+        "description": "Inventory management scene",
+        "steps": [
+            ("clear",),
+            ("type", "🎒 INVENTORY"),
+            ("echo", ""),
+            ("inventory",),
+            ("echo", ""),
+            ("status",),
+            ("pause", "Press Enter to return to village square..."),
+            ("goto", "start"),
+        ],
+    },
+    {
+        "id": "stonebridge",
+        "description": "Stonebridge village scene",
+        "steps": [
+            ("clear",),
+            ("type", "🏘️  STONEBRIDGE VILLAGE"),
+            ("type", "Stonebridge is a larger village, known for its stone architecture and bustling market."),
+            ("type", "Merchants call out their wares, and the air is filled with the aroma of fresh bread."),
+            ("echo", ""),
+            ("menu", "1. Visit the market\n2. Check the local inn\n3. Return to Moonhaven\nChoice: ", {
+                "1": [
+                    ("type", "The market is filled with various goods and merchants."),
+                    ("if", ("gold_at_least", 10), [
+                        ("menu", "Would you like to buy a healing potion for 10 gold? (y/n): ", {
+                            "y": [("gold", -10), ("add_item", "Healing Potion")],
+                            "n": [],
+                        }),
+                    ], []),
+                    ("goto", "stonebridge"),
+                ],
+                "2": [
+                    ("type", "The inn is cozy and welcoming."),
+                    ("type", "You rest for a while and feel refreshed."),
+                    ("health", 20),
+                    ("goto", "stonebridge"),
+                ],
+                "3": [("goto", "start")],
+            }),
+        ],
+    },
+    {
+        "id": "hidden_clearing",
+        "description": "Hidden clearing in the forest",
+        "steps": [
+            ("clear",),
+            ("type", "🌿 HIDDEN CLEARING"),
+            ("type", "The clearing is bathed in golden sunlight, with rare flowers blooming everywhere."),
+            ("type", "A small stone altar stands in the center, covered in ancient runes."),
+            ("echo", ""),
+            ("menu", "1. Examine the altar\n2. Gather more herbs\n3. Return to forest path\nChoice: ", {
+                "1": [
+                    ("type", "The runes glow faintly as you approach..."),
+                    ("type", "You feel a surge of magical energy!"),
+                    ("health", 30),
+                    ("reputation", 10),
+                    ("type", "The altar's magic has restored your health and blessed you!"),
+                    ("goto", "hidden_clearing"),
+                ],
+                "2": [
+                    ("add_item", "More Rare Herbs"),
+                    ("type", "You gather additional rare herbs."),
+                    ("goto", "hidden_clearing"),
+                ],
+                "3": [("goto", "forest_path")],
+            }),
+        ],
+    },
+    {
+        "id": "waterfall_cave",
+        "description": "Waterfall cave with third major decision",
+        "steps": [
+            ("clear",),
+            ("type", "💎 WATERFALL CAVE"),
+            ("type", "Behind the waterfall, you find a small cave illuminated by glowing crystals."),
+            ("type", "An ornate chest sits in the center, but you notice strange markings on the floor."),
+            ("type", "The air is thick with ancient magic."),
+            ("echo", ""),
+            ("type", "🎯 DECISION POINT #3: The Ancient Chest"),
+            ("type", "The chest looks valuable, but the markings suggest it might be trapped."),
+            ("type", "You also notice a small passage leading deeper into the cave."),
+            ("echo", ""),
+            ("menu", "1. Try to open the chest\n2. Explore the deeper passage\n3. Leave the cave\nChoice: ", {
+                "1": [
+                    ("type", "You carefully approach the chest..."),
+                    ("if", ("has_item", "Ancient Map"), [
+                        ("type", "The map's markings help you avoid the trap!"),
+                        ("add_item", "Ancient Artifact"),
+                        ("gold", 100),
+                        ("reputation", 15),
+                        ("type", "✅ You successfully opened the chest and found a valuable artifact!"),
+                    ], [
+                        ("type", "A magical trap activates!"),
+                        ("health", -30),
+                        ("type", "You're injured by the trap, but you manage to escape."),
+                    ]),
+                    ("goto", "forest_path"),
+                ],
+                "2": [
+                    ("type", "You venture deeper into the cave..."),
+                    ("type", "You discover an ancient library filled with forgotten knowledge!"),
+                    ("add_item", "Ancient Tome"),
+                    ("reputation", 20),
+                    ("type", "The knowledge you've found could be priceless!"),
+                    ("goto", "forest_path"),
+                ],
+                "3": [
+                    ("type", "You decide to leave the cave for now."),
+                    ("goto", "forest_path"),
+                ],
+            }),
+        ],
+    },
+)
+
+# Compiled steps are tuples whose first element is the function that runs
+# them, so executing a scene is a straight call per step. The functions
+# double as opcodes for tools that inspect the compiled graph.
+
+def _step_clear(engine: "GameEngine", step: tuple):
+    engine.clear_screen()
+
+def _step_type(engine: "GameEngine", step: tuple):
+    engine.type_text(engine.texts[step[1]])
+
+def _step_echo(engine: "GameEngine", step: tuple):
+    engine.echo(engine.texts[step[1]])
+
+def _step_narrate(engine: "GameEngine", step: tuple):
+    # A run of consecutive clear/type/echo steps merged at compile time. It
+    # reads no state, so renderers that can pre-render it write a cached
+    # frame; the rest get it line by line, straight from the text table
+    renderer = engine.renderer
+    if renderer.discards_output:
+        return
+    if engine.typeahead:
+        engine.skipped.append((_step_narrate, (engine, step)))
+        return
+    if renderer.frame_key is not None and renderer.frames is not None:
+        renderer.write_frame(renderer.frames.get(renderer, step[1], engine.texts))
+        return
+    texts = engine.texts
+    for line in step[1]:
+        op = line[0]
+        if op is OP_TYPE:
+            renderer.type_text(texts[line[1]], 0.03)
+        elif op is OP_ECHO:
+            renderer.write_line(texts[line[1]])
+        else:
+            renderer.clear()
+
+def _step_status(engine: "GameEngine", step: tuple):
+    engine.display_status()
+
+def _step_inventory(engine: "GameEngine", step: tuple):
+    if engine.state.inventory:
+        for i, item in enumerate(engine.state.inventory, 1):
+            engine.type_text(f"{i}. {item}")
+    else:
+        engine.type_text(engine.texts[MSG_INVENTORY_EMPTY])
+
+def _step_gold(engine: "GameEngine", step: tuple):
+    engine.state.modify_gold(step[1])
+
+def _step_health(engine: "GameEngine", step: tuple):
+    engine.state.modify_health(step[1])
+
+def _step_reputation(engine: "GameEngine", step: tuple):
+    engine.state.modify_reputation(step[1])
+
+def _step_add_item(engine: "GameEngine", step: tuple):
+    engine.state.add_item(step[1])
+
+def _step_remove_item(engine: "GameEngine", step: tuple):
+    engine.state.remove_item(step[1])
+
+def _step_flag(engine: "GameEngine", step: tuple):
+    engine.state.game_flags[step[1]] = True
+
+def _step_quest(engine: "GameEngine", step: tuple):
+    engine.state.complete_quest(step[1])
+
+def _step_goto(engine: "GameEngine", step: tuple):
+    engine.go_to_location(step[1])
+
+def _step_if(engine: "GameEngine", step: tuple):
+    taken = check_condition(engine.state, step[1])
+    if engine.coverage is not None:
+        engine.coverage.add((step[4], taken))
+    run_steps(engine, step[2] if taken else step[3])
+
+def _step_menu(engine: "GameEngine", step: tuple):
+    choice = engine.get_user_input(engine.texts[step[1]], step[2])
+    if engine.coverage is not None:
+        engine.coverage.add((step[4], choice))
+    run_steps(engine, step[3][choice])
+
+def _step_pause(engine: "GameEngine", step: tuple):
+    engine.get_user_input(engine.texts[step[1]])
+
+OP_CLEAR = _step_clear
+OP_TYPE = _step_type
+OP_ECHO = _step_echo
+OP_NARRATE = _step_narrate
+OP_STATUS = _step_status
+OP_INVENTORY = _step_inventory
+OP_GOLD = _step_gold
+OP_HEALTH = _step_health
+OP_REPUTATION = _step_reputation
+OP_ADD_ITEM = _step_add_item
+OP_REMOVE_ITEM = _step_remove_item
+OP_FLAG = _step_flag
+OP_QUEST = _step_quest
+OP_GOTO = _step_goto
+OP_IF = _step_if
+OP_MENU = _step_menu
+OP_PAUSE = _step_pause
+
+_OPCODES = {
+    "clear": OP_CLEAR, "type": OP_TYPE, "echo": OP_ECHO, "status": OP_STATUS,
+    "inventory": OP_INVENTORY, "gold": OP_GOLD, "health": OP_HEALTH,
+    "reputation": OP_REPUTATION, "add_item": OP_ADD_ITEM,
+    "remove_item": OP_REMOVE_ITEM, "flag": OP_FLAG, "quest": OP_QUEST,
+    "goto": OP_GOTO, "if": OP_IF, "menu": OP_MENU, "pause": OP_PAUSE,
+}
+
+# Condition codes
+COND_GOLD_AT_LEAST, COND_HAS_ITEM, COND_FLAG = range(3)
+_CONDITIONS = {"gold_at_least": COND_GOLD_AT_LEAST, "has_item": COND_HAS_ITEM, "flag": COND_FLAG}
+
+def check_condition(state: GameState, condition: tuple) -> bool:
+    """Evaluate a compiled condition against a game state"""
+    code, arg = condition
+    if code == COND_GOLD_AT_LEAST:
+        return state.gold >= arg
+    if code == COND_HAS_ITEM:
+        return state.has_item(arg)
+    return bool(state.game_flags.get(arg))
+
+def run_steps(engine: "GameEngine", steps: tuple):
+    """Execute compiled scene steps against an engine"""
+    for step in steps:
+        step[0](engine, step)
+
+class Scene:
+    """A compiled scene; calling it with an engine plays one turn
+    
+    A scene built with a ``source`` instead of steps compiles itself (by
+    calling ``source()`` for its steps and transitions) the first time it
+    is played or inspected.
+    """
+    __slots__ = ("id", "index", "description", "_steps", "_transitions", "_source")
+
+    def __init__(self, scene_id: str, index: int, description: str, steps: Optional[tuple] = None,
+                 transitions: Optional[Dict[str, tuple]] = None,
+                 source: Optional[Callable[[], tuple]] = None):
+        self.id = scene_id
+        self.index = index
+        self.description = description
+        self._transitions = MappingProxyType(transitions) if transitions is not None else None
+        self._steps = steps
+        self._source = source
+
+    @property
+    def compiled(self) -> bool:
+        """Whether the steps have been compiled yet"""
+        return self._steps is not None
+
+    def compile(self) -> "Scene":
+        """Compile the steps now if that has not happened yet"""
+        if self._steps is None:
+            steps, transitions = self._source()
+            self._transitions = MappingProxyType(transitions)
+            self._steps = steps
+            self._source = None
+        return self
+
+    @property
+    def steps(self) -> tuple:
+        """Compiled steps"""
+        return self.compile()._steps
+
+    @property
+    def transitions(self) -> MappingProxyType:
+        """Locations each top-level menu choice can lead to"""
+        return self.compile()._transitions
+
+    def __call__(self, engine: "GameEngine"):
+        steps = self._steps
+        run_steps(engine, steps if steps is not None else self.steps)
+
+    def __reduce__(self):
+        transitions = dict(self._transitions) if self._transitions is not None else None
+        return (Scene, (self.id, self.index, self.description, self._steps, transitions, self._source))
+
+    def __repr__(self) -> str:
+        return f"<Scene {self.id}>"
+
+class World:
+    """Read-only compiled scene graph shared by every game session
+    
+    ``transitions[location][choice]`` lists the locations a top-level menu
+    choice can lead to (more than one when the outcome depends on a
+    condition), so tools can inspect the graph without running scenes.
+    The mappings are read-only views, so sessions can share them safely.
+    
+    Compiled steps refer to their text by ID: ``texts[id]`` is the text
+    and ``text_keys[id]`` its stable key ("message.goodbye",
+    "tavern#5[1]#0"). ``localized`` swaps in another table, such as a
+    memory-mapped ``texts.StringTable``, without recompiling anything.
+    
+    In a lazily compiled world, ``texts`` entries of scenes that have not
+    been compiled yet are None; ``transitions``, ``text_keys`` and
+    ``compile_all`` compile every scene first.
+    """
+
+    def __init__(self, scenes: List[Scene], texts: Sequence[str] = MESSAGE_TEXTS,
+                 text_keys: Sequence[str] = tuple(f"message.{key}" for key, _ in MESSAGES),
+                 spec: Optional[Sequence[dict]] = None):
+        self.scenes = MappingProxyType({scene.id: scene for scene in scenes})
+        self.locations = tuple(scene.id for scene in scenes)
+        self.index = MappingProxyType({scene.id: scene.index for scene in scenes})
+        self.texts = texts
+        self._text_keys = text_keys
+        self._transitions = None
+        self._text_digest = None
+        self._spec = spec
+        self._source_digest = None
+
+    def __getstate__(self) -> dict:
+        # Mapping proxies cannot be pickled; worlds are sent to worker processes
+        state = dict(self.__dict__)
+        state["scenes"] = dict(self.scenes)
+        state["index"] = dict(self.index)
+        state["_transitions"] = None
+        return state
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        self.scenes = MappingProxyType(self.scenes)
+        self.index = MappingProxyType(self.index)
+
+    def compile_all(self) -> "World":
+        """Compile every scene that has not been compiled yet"""
+        for scene in self.scenes.values():
+            scene.compile()
+        return self
+
+    @property
+    def transitions(self) -> MappingProxyType:
+        """``transitions[location][choice]``: the locations a menu choice can lead to"""
+        if self._transitions is None:
+            self._transitions = MappingProxyType({scene.id: scene.transitions
+                                                  for scene in self.scenes.values()})
+        return self._transitions
+
+    @property
+    def text_keys(self) -> tuple:
+        """Stable key of every text ID"""
+        if type(self._text_keys) is not tuple:
+            self.compile_all()
+            self._text_keys = tuple(self._text_keys)
+        return self._text_keys
+
+    @property
+    def text_digest(self) -> bytes:
+        """Digest of ``text_keys``; text tables record it to check they fit"""
+        if self._text_digest is None:
+            import hashlib
+            self._text_digest = hashlib.blake2b("\0".join(self.text_keys).encode("utf-8"),
+                                                digest_size=16).digest()
+        return self._text_digest
+
+    @property
+    def source_digest(self) -> bytes:
+        """Digest of the spec and ``MESSAGES`` the world was compiled from
         
-        if choice == "1":
-            if game_engine.state.gold >= 20:
-                game_engine.state.modify_gold(-20)
-                game_engine.state.add_item("Ancient Map")
-                game_engine.state.game_flags["accepted_quest"] = True
-                game_engine.type_text("You hand over 20 gold and receive the ancient map.")
-                game_engine.type_text("'Meet me at the forest edge at dawn tomorrow,' the stranger says.")
-                game_engine.go_to_location("start")
+        Text tables record it to tell whether they are stale. Working it
+        out compiles nothing, so a lazy world stays lazy.
+        """
+        if self._source_digest is None:
+            import hashlib
+            if self._spec is not None:
+                source = repr((self._spec, MESSAGES))
             else:
-                game_engine.type_text("❌ You don't have enough gold for this venture.")
-                game_engine.go_to_location("start")
-        elif choice == "2":
-            game_engine.state.modify_reputation(5)
-            game_engine.type_text("You decline politely. The stranger nods respectfully and leaves.")
-            game_engine.type_text("The villagers seem to appreciate your cautious nature.")
-            game_engine.go_to_location("start")
-        elif choice == "3":
-            game_engine.type_text("'The temple lies in the Darkwood Forest, guarded by ancient traps and creatures.'")
-            game_engine.type_text("'The reward could be worth thousands of gold pieces...'")
-            game_engine.type_text("The stranger seems impatient with your questions.")
-            game_engine.go_to_location("tavern")
-        elif choice == "4":
-            game_engine.go_to_location("start")
-    
-    def notice_board_scene(game_engine):
-        """Notice board with quest opportunities"""
-        game_engine.clear_screen()
-        game_engine.type_text("📋 VILLAGE NOTICE BOARD")
-        game_engine.type_text("Various notices and requests are pinned to the weathered wooden board.")
-        game_engine.type_text("Some are recent, others have been here for weeks.")
-        print()
-        
-        game_engine.type_text("Available Quests:")
-        game_engine.type_text("1. 🐺 Hunt wolves threatening the village (Reward: 30 gold)")
-        game_engine.type_text("2. 🌿 Gather rare herbs for the healer (Reward: 15 gold + healing potion)")
-        game_engine.type_text("3. 📦 Deliver a package to the next village (Reward: 25 gold)")
-        print()
-        
-        choice = game_engine.get_user_input(
-            "1. Accept wolf hunting quest\n2. Accept herb gathering quest\n3. Accept delivery quest\n4. Return to village square\nChoice: ",
-            ["1", "2", "3", "4"]
-        )
-        
-        if choice == "1":
-            game_engine.state.add_item("Wolf Hunting Contract")
-            game_engine.state.game_flags["wolf_quest"] = True
-            game_engine.type_text("You take the wolf hunting contract from the board.")
-            game_engine.type_text("The village guard will provide you with a weapon.")
-            game_engine.go_to_location("start")
-        elif choice == "2":
-            game_engine.state.add_item("Herb Gathering List")
-            game_engine.state.game_flags["herb_quest"] = True
-            game_engine.type_text("You take the herb gathering list.")
-            game_engine.type_text("The healer's hut is near the forest edge.")
-            game_engine.go_to_location("start")
-        elif choice == "3":
-            game_engine.state.add_item("Delivery Package")
-            game_engine.state.game_flags["delivery_quest"] = True
-            game_engine.type_text("You take the delivery package.")
-            game_engine.type_text("The recipient is in the village of Stonebridge, a day's journey away.")
-            game_engine.go_to_location("start")
-        elif choice == "4":
-            game_engine.go_to_location("start")
-    
-    def elder_scene(game_engine):
-        """Village elder with wisdom and lore"""
-        game_engine.clear_screen()
-        game_engine.type_text("👴 VILLAGE ELDER'S COTTAGE")
-        game_engine.type_text("The elder's cottage is filled with books, scrolls, and mysterious artifacts.")
-        game_engine.type_text("Elder Thorne sits by the fireplace, his wise eyes twinkling with ancient knowledge.")
-        print()
-        
-        game_engine.type_text("'Ah, a new face in Moonhaven,' the elder says warmly.")
-        game_engine.type_text("'I sense great potential in you, young one. Perhaps you seek knowledge?'")
-        print()
-        
-        choice = game_engine.get_user_input(
-            "1. Ask about the village's history\n2. Inquire about local legends\n3. Seek advice for your journey\n4. Return to village square\nChoice: ",
-            ["1", "2", "3", "4"]
-        )
-        
-        if choice == "1":
-            game_engine.type_text("'Moonhaven was founded by the Moonweaver family, blessed by the goddess Luna.'")
-            game_engine.type_text("'We've lived in peace for generations, but dark times may be coming...'")
-            game_engine.state.modify_reputation(3)
-            game_engine.go_to_location("elder")
-        elif choice == "2":
-            game_engine.type_text("'Legends speak of the Crystal Caverns beneath the mountains.'")
-            game_engine.type_text("'They say the crystals there can grant visions of the future...'")
-            game_engine.state.add_item("Crystal Cavern Knowledge")
-            game_engine.go_to_location("elder")
-        elif choice == "3":
-            game_engine.type_text("'Trust your instincts, but remember: not all that glitters is gold.'")
-            game_engine.type_text("'Sometimes the greatest treasures are found in unexpected places.'")
-            game_engine.state.modify_reputation(5)
-            game_engine.go_to_location("elder")
-        elif choice == "4":
-            game_engine.go_to_location("start")
-    
-    def forest_path_scene(game_engine):
-        """Forest path with second major decision"""
-        game_engine.clear_screen()
-        game_engine.type_text("🌲 FOREST PATH")
-        game_engine.type_text("The forest path winds through ancient trees, their branches creating a natural canopy.")
-        game_engine.type_text("Sunlight filters through the leaves, creating dancing patterns on the forest floor.")
-        game_engine.type_text("You hear the distant sound of running water and the calls of forest creatures.")
-        print()
-        
-        game_engine.type_text("🎯 DECISION POINT #2: The Forest Crossroads")
-        game_engine.type_text("The path splits into three directions:")
-        game_engine.type_text("1. A well-traveled path leading to a nearby village")
-        game_engine.type_text("2. A narrow, overgrown trail that seems to lead deeper into the forest")
-        game_engine.type_text("3. A path that follows the sound of water")
-        print()
+                source = repr((self.text_keys, list(self.texts)))
+            self._source_digest = hashlib.blake2b(source.encode("utf-8"), digest_size=16).digest()
+        return self._source_digest
+
+    def localized(self, texts: Sequence[str]) -> "World":
+        """This world showing another text table, which must have been built for it
         
-        choice = game_engine.get_user_input(
-            "1. Take the well-traveled path\n2. Follow the overgrown trail\n3. Follow the water sound\n4. Return to village\nChoice: ",
-            ["1", "2", "3", "4"]
-        )
+        A table recording this world's ``source_digest`` is taken as it
+        is; any other is checked against ``text_keys``.
+        """
+        if len(texts) != len(self._text_keys):
+            raise ValueError("text table was built for a different world")
+        if getattr(texts, "source", None) != self.source_digest:
+            digest = getattr(texts, "digest", self.text_digest)
+            if digest != self.text_digest:
+                raise ValueError("text table was built for a different world")
+        import copy
+        world = copy.copy(self)
+        world.texts = texts
+        return world
+
+    def referenced(self, opcode: Callable) -> List[str]:
+        """Names used by every step with the given opcode, in world order"""
+        names = []
+        for scene in self.scenes.values():
+            for step in iter_steps(scene.steps):
+                if step[0] is opcode and step[1] not in names:
+                    names.append(step[1])
+        return names
+
+    def branches(self) -> List[tuple]:
+        """Every ``(label, outcome)`` pair that coverage can record
         
-        if choice == "1":
-            game_engine.type_text("You follow the well-traveled path...")
-            game_engine.type_text("After a short walk, you reach the village of Stonebridge.")
-            game_engine.state.modify_reputation(2)
-            if game_engine.state.game_flags.get("delivery_quest"):
-                game_engine.state.modify_gold(25)
-                game_engine.state.remove_item("Delivery Package")
-                game_engine.state.completed_quests.append("Delivery Quest")
-                game_engine.type_text("✅ You successfully delivered the package and earned 25 gold!")
-            game_engine.go_to_location("stonebridge")
-        elif choice == "2":
-            game_engine.type_text("You venture down the overgrown trail...")
-            game_engine.type_text("The path becomes increasingly difficult to follow.")
-            game_engine.type_text("Suddenly, you stumble upon a hidden clearing with rare herbs!")
-            if game_engine.state.game_flags.get("herb_quest"):
-                game_engine.state.add_item("Rare Herbs")
-                game_engine.state.modify_gold(15)
-                game_engine.state.add_item("Healing Potion")
-                game_engine.state.completed_quests.append("Herb Quest")
-                game_engine.type_text("✅ You found the rare herbs and completed the quest!")
+        Outcomes are the choice for menus and True/False for conditions.
+        """
+        pairs = []
+        for scene in self.scenes.values():
+            for step in iter_steps(scene.steps):
+                if step[0] is OP_MENU:
+                    pairs.extend((step[4], choice) for choice in step[2])
+                elif step[0] is OP_IF:
+                    pairs.extend(((step[4], True), (step[4], False)))
+        return pairs
+
+    def describe_branch(self, label: str) -> str:
+        """Human-readable description of a menu or condition label"""
+        for scene in self.scenes.values():
+            for step in iter_steps(scene.steps):
+                if step[0] is OP_IF and step[4] == label:
+                    code, arg = step[1]
+                    name = next(k for k, v in _CONDITIONS.items() if v == code)
+                    return f"{label} if {name}({arg!r})"
+                if step[0] is OP_MENU and step[4] == label:
+                    return f"{label} menu {step[2]}"
+        return label
+
+    def tested(self, code: int) -> List:
+        """Arguments of every condition of the given kind (``COND_*``)"""
+        values = []
+        for scene in self.scenes.values():
+            for step in iter_steps(scene.steps):
+                if step[0] is OP_IF and step[1][0] == code and step[1][1] not in values:
+                    values.append(step[1][1])
+        return values
+
+    def gold_thresholds(self) -> List[int]:
+        """Every amount tested by a ``gold_at_least`` condition"""
+        return sorted(self.tested(COND_GOLD_AT_LEAST))
+
+    def items(self) -> List[str]:
+        """Every item a scene can grant"""
+        return self.referenced(OP_ADD_ITEM)
+
+    def quests(self) -> List[str]:
+        """Every quest a scene can complete"""
+        return self.referenced(OP_QUEST)
+
+    def flags(self) -> List[str]:
+        """Every story flag a scene can set"""
+        return self.referenced(OP_FLAG)
+
+def iter_steps(steps: tuple):
+    """Yield every compiled step, descending into menus and conditions"""
+    for step in steps:
+        yield step
+        if step[0] is OP_NARRATE:
+            yield from step[1]
+        elif step[0] is OP_IF:
+            yield from iter_steps(step[2])
+            yield from iter_steps(step[3])
+        elif step[0] is OP_MENU:
+            for branch in step[3].values():
+                yield from iter_steps(branch)
+
+def _compile_steps(steps: list, location_ids: set, where: str, add_text: Callable) -> tuple:
+    # Menus and conditions are labelled "<scene>[<choice>...]#<index>" so
+    # coverage can be reported against the source data. Text is replaced
+    # by the ID ``add_text(label, text)`` gives it.
+    compiled = []
+    for index, step in enumerate(steps):
+        try:
+            op = _OPCODES[step[0]]
+        except KeyError:
+            raise ValueError(f"{where}: unknown step {step[0]!r}") from None
+        if op == OP_IF:
+            code = _CONDITIONS.get(step[1][0])
+            if code is None:
+                raise ValueError(f"{where}: unknown condition {step[1][0]!r}")
+            label = f"{where}#{index}"
+            compiled.append((OP_IF, (code, step[1][1]),
+                             _compile_steps(step[2], location_ids, f"{label}+", add_text),
+                             _compile_steps(step[3], location_ids, f"{label}-", add_text),
+                             label))
+        elif op == OP_MENU:
+            label = f"{where}#{index}"
+            prompt = add_text(label, step[1])
+            branches = {choice: _compile_steps(branch, location_ids, f"{label}[{choice}]", add_text)
+                        for choice, branch in step[2].items()}
+            compiled.append((OP_MENU, prompt, list(branches), branches, label))
+        elif op == OP_GOTO:
+            if step[1] not in location_ids:
+                raise ValueError(f"{where}: unknown location {step[1]!r}")
+            compiled.append((OP_GOTO, step[1]))
+        elif op in (OP_TYPE, OP_ECHO, OP_PAUSE):
+            compiled.append((op, add_text(f"{where}#{index}", step[1])))
+        elif op in (OP_ADD_ITEM, OP_REMOVE_ITEM, OP_QUEST, OP_FLAG):
+            compiled.append((op, sys.intern(step[1])))
+        else:
+            compiled.append((op,) + tuple(step[1:]))
+    return tuple(_merge_narration(compiled))
+
+def _merge_narration(steps: list) -> list:
+    merged = []
+    for step in steps:
+        if step[0] in (OP_CLEAR, OP_TYPE, OP_ECHO):
+            if merged and merged[-1][0] is OP_NARRATE:
+                merged[-1] = (OP_NARRATE, merged[-1][1] + (step,))
             else:
-                game_engine.state.add_item("Rare Herbs")
-                game_engine.type_text("You found some rare herbs. These might be valuable!")
-            game_engine.go_to_location("hidden_clearing")
-        elif choice == "3":
-            game_engine.type_text("You follow the sound of water...")
-            game_engine.type_text("You discover a beautiful waterfall with a small cave behind it.")
-            game_engine.type_text("Inside the cave, you find an old chest!")
-            game_engine.go_to_location("waterfall_cave")
-        elif choice == "4":
-            game_engine.go_to_location("start")
-    
-    def inventory_scene(game_engine):
-        """Inventory management scene"""
-        game_engine.clear_screen()
-        game_engine.type_text("🎒 INVENTORY")
-        print()
-        
-        if game_engine.state.inventory:
-            for i, item in enumerate(game_engine.state.inventory, 1):
-                game_engine.type_text(f"{i}. {item}")
+                merged.append((OP_NARRATE, (step,)))
         else:
-            game_engine.type_text("Your inventory is empty.")
-        
-        print()
-        game_engine.display_status()
-        
-        game_engine.get_user_input("Press Enter to return to village square...")
-        game_engine.go_to_location("start")
-    
-    def stonebridge_scene(game_engine):
-        """Stonebridge village scene"""
-        game_engine.clear_screen()
-        game_engine.type_text("🏘️  STONEBRIDGE VILLAGE")
-        game_engine.type_text("Stonebridge is a larger village, known for its stone architecture and bustling market.")
-        game_engine.type_text("Merchants call out their wares, and the air is filled with the aroma of fresh bread.")
-        print()
-        
-        choice = game_engine.get_user_input(
-            "1. Visit the market\n2. Check the local inn\n3. Return to Moonhaven\nChoice: ",
-            ["1", "2", "3"]
-        )
-        
-        if choice == "1":
-            game_engine.type_text("The market is filled with various goods and merchants.")
-            if game_engine.state.gold >= 10:
-                buy = game_engine.get_user_input(
-                    "Would you like to buy a healing potion for 10 gold? (y/n): ",
-                    ["y", "n"]
-                )
-                if buy == "y":
-                    game_engine.state.modify_gold(-10)
-                    game_engine.state.add_item("Healing Potion")
-            game_engine.go_to_location("stonebridge")
-        elif choice == "2":
-            game_engine.type_text("The inn is cozy and welcoming.")
-            game_engine.type_text("You rest for a while and feel refreshed.")
-            game_engine.state.modify_health(20)
-            game_engine.go_to_location("stonebridge")
-        elif choice == "3":
-            game_engine.go_to_location("start")
-    
-    def hidden_clearing_scene(game_engine):
-        """Hidden clearing in the forest"""
-        game_engine.clear_screen()
-        game_engine.type_text("🌿 HIDDEN CLEARING")
-        game_engine.type_text("The clearing is bathed in golden sunlight, with rare flowers blooming everywhere.")
-        game_engine.type_text("A small stone altar stands in the center, covered in ancient runes.")
-        print()
-        
-        choice = game_engine.get_user_input(
-            "1. Examine the altar\n2. Gather more herbs\n3. Return to forest path\nChoice: ",
-            ["1", "2", "3"]
-        )
-        
-        if choice == "1":
-            game_engine.type_text("The runes glow faintly as you approach...")
-            game_engine.type_text("You feel a surge of magical energy!")
-            game_engine.state.modify_health(30)
-            game_engine.state.modify_reputation(10)
-            game_engine.type_text("The altar's magic has restored your health and blessed you!")
-            game_engine.go_to_location("hidden_clearing")
-        elif choice == "2":
-            game_engine.state.add_item("More Rare Herbs")
-            game_engine.type_text("You gather additional rare herbs.")
-            game_engine.go_to_location("hidden_clearing")
-        elif choice == "3":
-            game_engine.go_to_location("forest_path")
-    
-    def waterfall_cave_scene(game_engine):
-        """Waterfall cave with third major decision"""
-        game_engine.clear_screen()
-        game_engine.type_text("💎 WATERFALL CAVE")
-        game_engine.type_text("Behind the waterfall, you find a small cave illuminated by glowing crystals.")
-        game_engine.type_text("An ornate chest sits in the center, but you notice strange markings on the floor.")
-        game_engine.type_text("The air is thick with ancient magic.")
-        print()
-        
-        game_engine.type_text("🎯 DECISION POINT #3: The Ancient Chest")
-        game_engine.type_text("The chest looks valuable, but the markings suggest it might be trapped.")
-        game_engine.type_text("You also notice a small passage leading deeper into the cave.")
-        print()
-        
-        choice = game_engine.get_user_input(
-            "1. Try to open the chest\n2. Explore the deeper passage\n3. Leave the cave\nChoice: ",
-            ["1", "2", "3"]
-        )
+            merged.append(step)
+    return merged
+
+def _targets(steps: tuple) -> tuple:
+    targets = []
+    for step in iter_steps(steps):
+        if step[0] is OP_GOTO and step[1] not in targets:
+            targets.append(step[1])
+    return tuple(targets)
+
+def _count_texts(steps: list) -> int:
+    """Number of text IDs compiling ``steps`` will use"""
+    count = 0
+    for step in steps:
+        if step[0] in ("type", "echo", "pause"):
+            count += 1
+        elif step[0] == "menu":
+            count += 1 + sum(_count_texts(branch) for branch in step[2].values())
+        elif step[0] == "if":
+            count += _count_texts(step[2]) + _count_texts(step[3])
+    return count
+
+def _compile_scene(data: dict, location_ids: frozenset, texts: list, keys: list, base: int) -> tuple:
+    """Steps and transitions of one scene, filling in its block of text IDs from ``base``"""
+    next_id = itertools.count(base)
+
+    def add_text(key: str, text: str) -> int:
+        text_id = next(next_id)
+        texts[text_id] = text
+        keys[text_id] = key
+        return text_id
+
+    steps = _compile_steps(data["steps"], location_ids, data["id"], add_text)
+    menus = [step for step in steps if step[0] is OP_MENU]
+    if menus:
+        transitions = {choice: _targets(branch) for choice, branch in menus[0][3].items()}
+    else:
+        transitions = {"": _targets(steps)}
+    return steps, transitions
+
+def compile_world(spec=WORLD_SPEC, lazy: bool = False) -> World:
+    """Compile declarative scene data into a World
+    
+    A ``lazy`` world only counts each scene's text to reserve its IDs and
+    compiles the scene the first time it is visited or inspected, so
+    content errors surface then rather than here.
+    """
+    location_ids = frozenset(scene["id"] for scene in spec)
+    texts = list(MESSAGE_TEXTS)
+    keys = [f"message.{key}" for key, _ in MESSAGES]
+    scenes = []
+    for index, data in enumerate(spec):
+        base = len(texts)
+        reserved = _count_texts(data["steps"])
+        texts.extend([None] * reserved)
+        keys.extend([None] * reserved)
+        source = functools.partial(_compile_scene, data, location_ids, texts, keys, base)
+        scenes.append(Scene(data["id"], index, data.get("description", ""), source=source))
+    world = World(scenes, texts, keys, spec)
+    return world if lazy else world.compile_all()
+
+# Scenes compile on first visit, keeping the import cheap for short-lived processes
+WORLD = compile_world(lazy=True)
+
+def create_game(renderer: Optional[Renderer] = None,
+                input_provider: Optional[InputProvider] = None,
+                world: Optional[World] = None):
+    """Create a game session on the shared, pre-compiled world"""
+    return GameEngine(renderer, input_provider, world if world is not None else WORLD)
+
+class SceneCursor:
+    """Advances an engine one choice at a time instead of blocking on input
+    
+    Scenes are ordinary functions that call ``get_user_input``. When a scene
+    asks for a choice that has not arrived yet, the attempt is abandoned and
+    the state rolled back to the start of the scene; once the choice arrives
+    the scene is replayed with every choice it has received so far. Output
+    that was already delivered is skipped on replay, so scenes must only
+    depend on the state and the choices they are given.
+    
+    An answer the menu rejects (or a ``hint`` question) changes nothing, so
+    it is not kept for replay: ``inputs`` only grows with accepted answers.
+    The intro's free-form answers (name, Enter) are always accepted.
+    """
+
+    def __init__(self, engine: "GameEngine", intro: bool = False):
+        if not isinstance(engine.input_provider, QueuedInput):
+            engine.input_provider = QueuedInput()
+        if not isinstance(engine.renderer, RecordingRenderer):
+            engine.renderer = engine.state.renderer = RecordingRenderer()
+        self.engine = engine
+        self.intro = intro
+        self.inputs = []
+        self.sent = 0
+        self.request = None
+        self.answered = 0
+        engine.add_input_hook(self._accepted)
+        if engine.current_scene is None:
+            engine.go_to_location(engine.state.current_location)
+        self._checkpoint()
+
+    def _accepted(self, engine: "GameEngine", choice: str):
+        # Number of inputs read when the scene last accepted an answer
+        self.answered = len(self.inputs) - len(engine.input_provider.queue)
+
+    def _checkpoint(self):
+        """Remember the state at the start of the current scene"""
+        self.inputs = []
+        self.sent = 0
+        typeahead = self.engine.typeahead
+        self._saved = (self.engine.state.copy(), self.engine.current_scene,
+                       self.engine.player_name, tuple(typeahead) if typeahead else None)
+
+    def _rollback(self):
+        """Restore the state saved at the start of the current scene"""
+        state, scene, name, typeahead = self._saved
+        self.engine.state = state.copy()
+        self.engine.current_scene = scene
+        self.engine.player_name = name
+        self.engine.typeahead = collections.deque(typeahead) if typeahead else None
+        self.engine.skipped = []
+
+    def advance(self, choice: Optional[str] = None) -> List[tuple]:
+        """Feed one choice and run until the next prompt
         
-        if choice == "1":
-            game_engine.type_text("You carefully approach the chest...")
-            if game_engine.state.has_item("Ancient Map"):
-                game_engine.type_text("The map's markings help you avoid the trap!")
-                game_engine.state.add_item("Ancient Artifact")
-                game_engine.state.modify_gold(100)
-                game_engine.state.modify_reputation(15)
-                game_engine.type_text("✅ You successfully opened the chest and found a valuable artifact!")
-            else:
-                game_engine.type_text("A magical trap activates!")
-                game_engine.state.modify_health(-30)
-                game_engine.type_text("You're injured by the trap, but you manage to escape.")
-            game_engine.go_to_location("forest_path")
-        elif choice == "2":
-            game_engine.type_text("You venture deeper into the cave...")
-            game_engine.type_text("You discover an ancient library filled with forgotten knowledge!")
-            game_engine.state.add_item("Ancient Tome")
-            game_engine.state.modify_reputation(20)
-            game_engine.type_text("The knowledge you've found could be priceless!")
-            game_engine.go_to_location("forest_path")
-        elif choice == "3":
-            game_engine.type_text("You decide to leave the cave for now.")
-            game_engine.go_to_location("forest_path")
-    
-    # Add all scenes to the game
-    game.add_location("start", start_scene)
-    game.add_location("tavern", tavern_scene)
-    game.add_location("notice_board", notice_board_scene)
-    game.add_location("elder", elder_scene)
-    game.add_location("forest_path", forest_path_scene)
-    game.add_location("inventory", inventory_scene)
-    game.add_location("stonebridge", stonebridge_scene)
-    game.add_location("hidden_clearing", hidden_clearing_scene)
-    game.add_location("waterfall_cave", waterfall_cave_scene)
-    
-    return game
-
-def main():
+        Returns the new output as ``(text, delay)`` segments; the pending
+        prompt is available as ``self.request``.
+        """
+        engine = self.engine
+        renderer = engine.renderer
+        pending = choice is not None
+        if pending:
+            self.inputs.append(choice)
+        output = []
+        while engine.game_running:
+            renderer.segments = []
+            engine.input_provider.queue = collections.deque(self.inputs)
+            self.answered = 0
+            try:
+                if self.intro:
+                    engine.show_intro()
+                else:
+                    engine.step()
+            except InputRequired as request:
+                self._rollback()
+                output.extend(renderer.segments[self.sent:])
+                if pending and not self.intro and self.answered < len(self.inputs):
+                    # Nothing accepted the new choice: forget it and its reply
+                    self.inputs.pop()
+                else:
+                    self.sent = len(renderer.segments)
+                self.request = request
+                return output
+            except GameExit:
+                pass
+            output.extend(renderer.segments[self.sent:])
+            self.intro = False
+            pending = False
+            self._checkpoint()
+        self.request = None
+        return output
+
+class PlaythroughResult(NamedTuple):
+    """Outcome of a headless playthrough"""
+    state: GameState
+    trace: List[str]
+
+def run_headless(choices: Iterable[str], player_name: Optional[str] = None,
+                 max_turns: Optional[int] = None,
+                 renderer: Optional[Renderer] = None,
+                 world: Optional[World] = None) -> PlaythroughResult:
+    """Play a scripted choice sequence through the real scenes without pacing
+    
+    The session ends when the choices run out or after ``max_turns`` scenes.
+    If ``player_name`` is given the intro is played first with that name.
+    """
+    if player_name is not None:
+        choices = itertools.chain([player_name, ""], choices)
+    game = create_game(renderer if renderer is not None else NullRenderer(),
+                       ScriptedInput(choices), world)
+    trace = []
+    try:
+        if player_name is not None:
+            game.show_intro()
+        game.go_to_location("start")
+        while game.game_running and (max_turns is None or len(trace) < max_turns):
+            trace.append(game.state.current_location)
+            game.step()
+    except GameExit:
+        pass
+    return PlaythroughResult(game.state, trace)
+
+def main(argv=None):
     """Main function to run the game"""
+    import argparse
+    parser = argparse.ArgumentParser(description="The Lost Realms of Eldria")
+    parser.add_argument("--screen", action="store_true",
+                        help="full-screen renderer that redraws only what changed (for SSH and slow terminals)")
+    parser.add_argument("--hints", metavar="PATH",
+                        help="hint index to answer 'hint <goal>' at menus (built here if missing or stale)")
+    parser.add_argument("--autosave", metavar="DIR",
+                        help="save after every move from a background thread into this directory")
+    parser.add_argument("--fast-start", action="store_true",
+                        help="show the intro without the typing effect")
+    parser.add_argument("--texts", metavar="PATH",
+                        help="text table to show, e.g. another locale (see texts.py)")
+    parser.add_argument("--events", metavar="PATH",
+                        help="append a JSON event for every turn to this log (see analytics.py)")
+    args = parser.parse_args(argv)
+    
     print("🎮 Starting The Lost Realms of Eldria...")
-    print("Loading game assets...")
     
     # Create and run the game
-    game = create_game()
-    game.run()
+    if args.texts:
+        from texts import StringTable
+        world = WORLD.localized(StringTable(args.texts))
+    else:
+        from texts import default_world
+        world = default_world()
+    game = create_game(ScreenRenderer() if args.screen else None, world=world)
+    from history import History
+    History().attach(game)
+    if args.hints:
+        from hints import load_or_build
+        load_or_build(args.hints).attach(game)
+    writer = None
+    if args.autosave:
+        from autosave import EXIT_TIMEOUT, Autosave, AutosaveWriter
+        writer = AutosaveWriter(args.autosave)
+        Autosave(writer).attach(game)
+    events = None
+    if args.events:
+        from analytics import EventLog
+        events = EventLog.open(args.events).attach(game)
+    try:
+        game.run(fast_start=args.fast_start)
+    finally:
+        if writer is not None:
+            writer.close(EXIT_TIMEOUT)
+        if events is not None:
+            events.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,440 @@
+#!/usr/bin/env python3
+"""
+Decision and quest-funnel analytics for The Lost Realms of Eldria.
+
+An EventLog attached to an engine appends one compact JSON line per turn
+to an event log: the player, the turn number, the location the turn was
+played in, the choices made, the location it led to and what changed.
+Changes are found by comparing the saved state fields at each move, so
+the ``modify_*`` methods, items, quests and flags cost nothing extra on
+the scene path. A game that starts (or restarts) writes a ``start``
+event and one that quits or runs out of input writes an ``end`` event::
+
+    {"p":"3f9c…","n":4,"at":"tavern","c":["1"],"to":"tavern","gold":-5,"f":["accepted_quest"]}
+
+The Aggregator reads such a log one line at a time and keeps only
+counters sized by the world: a choice histogram per scene, a
+location-to-location transition matrix, where sessions ended, and a
+funnel from accepting to completing each quest. Unique players, overall
+and per funnel stage, are counted with fixed-size HyperLogLog sketches
+(about 1.6% standard error), so memory stays constant however large the
+log grows. Lines naming locations, flags or quests the world does not
+know are counted as malformed rather than creating new counters.
+``follow`` tails a log that is still being written, holding back a
+partial last line and reopening the file if it is truncated or rotated.
+
+Usage:
+    python adventure_game.py --events events.jsonl
+    python analytics.py --generate 2000 events.jsonl
+    python analytics.py events.jsonl
+    python analytics.py --follow --every 10 events.jsonl
+"""
+
+import argparse
+import collections
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import sys
+import time
+import uuid
+from typing import Dict, Iterator, List, Optional, TextIO
+
+from adventure_game import (OP_MENU, OP_TYPE, GameEngine, GameExit, GameFlags, NullRenderer,
+                            RandomInput, World, WORLD, create_game, iter_steps)
+from savegame import state_fields
+
+# 2**12 one-byte registers per sketch: 4 KiB, about 1.6% standard error
+SKETCH_PRECISION = 12
+# Longest choice path kept per turn; longer ones are type-ahead noise
+MAX_PATH = 8
+# A "line" longer than this without a newline is not an event; drop it while tailing
+MAX_LINE = 1 << 20
+DECISION_PATTERN = re.compile(r"DECISION POINT #(\d+):?\s*(.*)")
+OPTION_PATTERN = re.compile(r"^\s*(\S+)\.\s+(.*)$")
+
+class EventLog:
+    """Appends a compact JSON event for every turn an engine plays"""
+
+    def __init__(self, stream: TextIO, player: Optional[str] = None):
+        self.stream = stream
+        self.player = player or uuid.uuid4().hex[:12]
+        self.turn = 0
+        self.written = 0
+        self.choices = []
+        self.state = None
+        self.fields = None
+
+    @classmethod
+    def open(cls, path: str, player: Optional[str] = None) -> "EventLog":
+        """Append to the log at ``path``, one whole line per write"""
+        return cls(open(path, "a", encoding="utf-8", buffering=1), player)
+
+    def _choice(self, engine: GameEngine, choice: str):
+        self.choices.append(choice)
+
+    def _moved(self, engine: GameEngine):
+        fields = state_fields(engine.state)
+        if engine.state is not self.state:
+            # A new game, or a reset of this one
+            self.state = engine.state
+            self.turn = 0
+            self.choices = []
+            self.fields = fields
+            self._write({"p": self.player, "n": 0, "start": 1, "to": fields[0]})
+            return
+        self.turn += 1
+        event = {"p": self.player, "n": self.turn, "at": self.fields[0], "c": self.choices,
+                 "to": fields[0]}
+        self._delta(event, fields)
+        self._write(event)
+
+    def _exit(self, engine: GameEngine):
+        if self.fields is None:
+            return
+        fields = state_fields(engine.state)
+        event = {"p": self.player, "n": self.turn + 1, "at": fields[0], "c": self.choices, "end": 1}
+        self._delta(event, fields)
+        self._write(event)
+        self.stream.flush()
+
+    def _delta(self, event: Dict, fields: tuple):
+        """Add what changed since the last event and start a new turn"""
+        old = self.fields
+        # Fields are (location, health, gold, reputation, bits, extra, inventory, quests)
+        for key, index in (("health", 1), ("gold", 2), ("rep", 3)):
+            if fields[index] != old[index]:
+                event[key] = fields[index] - old[index]
+        if fields[6] != old[6]:
+            added = [item for item in fields[6] if item not in old[6]]
+            removed = [item for item in old[6] if item not in fields[6]]
+            if added:
+                event["+"] = added
+            if removed:
+                event["-"] = removed
+        if fields[7] != old[7]:
+            event["q"] = [quest for quest in fields[7] if quest not in old[7]]
+        if fields[4] != old[4] or fields[5] != old[5]:
+            before = _flag_names(old)
+            event["f"] = [name for name in _flag_names(fields) if name not in before]
+        self.fields = fields
+        self.choices = []
+
+    def _write(self, event: Dict):
+        self.stream.write(json.dumps(event, separators=(",", ":"), ensure_ascii=False) + "\n")
+        self.written += 1
+
+    def attach(self, engine: GameEngine) -> "EventLog":
+        """Log every turn, start and end of ``engine``'s games"""
+        engine.add_input_hook(self._choice)
+        engine.add_location_hook(self._moved)
+        engine.add_exit_hook(self._exit)
+        return self
+
+    def close(self):
+        """Close the underlying stream"""
+        self.stream.close()
+
+def _flag_names(fields: tuple) -> List[str]:
+    """Set flag names of a ``state_fields`` tuple"""
+    flags = GameFlags()
+    flags.bits = fields[4]
+    names = flags.keys()
+    names.extend(name for name, value in fields[5] if value)
+    return names
+
+class HyperLogLog:
+    """Fixed-size approximate distinct counter"""
+
+    def __init__(self, precision: int = SKETCH_PRECISION):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, value: str):
+        """Count ``value``"""
+        digest = hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest()
+        hashed = int.from_bytes(digest, "big")
+        rest_bits = 64 - self.precision
+        index = hashed >> rest_bits
+        rank = rest_bits - (hashed & ((1 << rest_bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: "HyperLogLog"):
+        """Fold another sketch of the same precision into this one"""
+        if other.precision != self.precision:
+            raise ValueError("cannot merge sketches of different precision")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def __len__(self) -> int:
+        size = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / size)
+        estimate = alpha * size * size / sum(2.0 ** -rank for rank in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * size and zeros:
+            # Small-range correction: linear counting is exact-ish here
+            estimate = size * math.log(size / zeros)
+        return round(estimate)
+
+def decision_points(world: World = WORLD) -> Dict[str, tuple]:
+    """Scenes announcing a "DECISION POINT #n": ``{location: (n, title, {choice: label})}``"""
+    points = {}
+    for location, scene in world.scenes.items():
+        number = title = None
+        for step in iter_steps(scene.steps):
+            if step[0] is OP_TYPE and number is None:
+                match = DECISION_PATTERN.search(world.texts[step[1]])
+                if match:
+                    number, title = int(match.group(1)), match.group(2)
+            elif step[0] is OP_MENU and number is not None:
+                labels = {}
+                for line in world.texts[step[1]].splitlines():
+                    option = OPTION_PATTERN.match(line)
+                    if option:
+                        labels[option.group(1)] = option.group(2)
+                points[location] = (number, title, labels)
+                break
+    return dict(sorted(points.items(), key=lambda item: item[1][0]))
+
+def quest_funnels(world: World = WORLD) -> Dict[str, List[str]]:
+    """Stages of each quest, from the flag that accepts it to its completion
+
+    A quest flag is paired with the quest of the same name ("herb_quest"
+    and "Herb Quest"); flags without a completable quest end at acceptance.
+    """
+    quests = {quest.lower().replace(" ", "_"): quest for quest in world.quests()}
+    funnels = {}
+    for flag in world.flags():
+        if flag.endswith("_quest"):
+            quest = quests.get(flag)
+            funnels[quest or flag] = [f"flag:{flag}"] + ([f"quest:{quest}"] if quest else [])
+    return funnels
+
+class Aggregator:
+    """Constant-memory summary of an event log"""
+
+    def __init__(self, world: World = WORLD, precision: int = SKETCH_PRECISION):
+        self.world = world
+        self.locations = frozenset(world.locations)
+        self.decisions = decision_points(world)
+        self.funnels = quest_funnels(world)
+        self.events = 0
+        self.turns = 0
+        self.starts = 0
+        self.malformed = 0
+        self.players = HyperLogLog(precision)
+        self.choices = {location: collections.Counter() for location in world.locations}
+        self.transitions = collections.Counter()
+        self.ends = collections.Counter()
+        self.stages = {f"flag:{flag}": HyperLogLog(precision) for flag in world.flags()}
+        self.stages.update({f"quest:{quest}": HyperLogLog(precision) for quest in world.quests()})
+        self.menus = {location: set(transitions) for location, transitions in world.transitions.items()}
+
+    def feed(self, line: str):
+        """Add one event line; malformed lines are counted and skipped"""
+        try:
+            event = json.loads(line)
+            self._add(event)
+        except (ValueError, TypeError, KeyError, AttributeError):
+            self.malformed += 1
+
+    def _add(self, event: Dict):
+        player = event["p"]
+        if not isinstance(player, str):
+            raise TypeError("player id must be a string")
+        if event.get("start"):
+            if event["to"] not in self.locations:
+                raise KeyError(event["to"])
+            self.events += 1
+            self.starts += 1
+            self.players.add(player)
+            return
+        at = event["at"]
+        if at not in self.locations:
+            raise KeyError(at)
+        stages = [f"flag:{flag}" for flag in event.get("f", ())]
+        stages.extend(f"quest:{quest}" for quest in event.get("q", ()))
+        if any(stage not in self.stages for stage in stages):
+            raise KeyError("unknown flag or quest")
+        choices = event.get("c") or []
+        if event.get("end"):
+            self.ends[at] += 1
+        else:
+            to = event["to"]
+            if to not in self.locations:
+                raise KeyError(to)
+            self.turns += 1
+            self.transitions[at, to] += 1
+            if choices and choices[0] in self.menus[at] and len(choices) <= MAX_PATH:
+                # Only the scene's own options are keys, so the histogram stays world-sized
+                self.choices[at][choices[0]] += 1
+        self.events += 1
+        self.players.add(player)
+        for stage in stages:
+            self.stages[stage].add(player)
+
+    def consume(self, lines) -> "Aggregator":
+        """Feed every line of an iterable (a file, ``follow(...)``)"""
+        for line in lines:
+            self.feed(line)
+        return self
+
+    def report(self) -> Dict:
+        """Plain-data summary"""
+        players = len(self.players)
+        decisions = {}
+        for location, (number, title, labels) in self.decisions.items():
+            counts = self.choices[location]
+            total = sum(counts.values())
+            decisions[f"#{number} {location}"] = {
+                "title": title,
+                "visits": total,
+                "options": {choice: {"label": labels.get(choice, ""), "count": counts[choice],
+                                     "share": counts[choice] / total if total else 0.0}
+                            for choice in sorted(self.menus[location])},
+            }
+        funnels = {}
+        for quest, stages in self.funnels.items():
+            funnels[quest] = [["players", players]] + [[stage, len(self.stages[stage])]
+                                                       for stage in stages]
+        return {
+            "events": self.events,
+            "turns": self.turns,
+            "games": self.starts,
+            "players": players,
+            "malformed": self.malformed,
+            "decisions": decisions,
+            "funnels": funnels,
+            "ends": dict(self.ends.most_common()),
+            "choices": {location: dict(counts) for location, counts in self.choices.items() if counts},
+            "transitions": {f"{at} -> {to}": count
+                            for (at, to), count in self.transitions.most_common()},
+        }
+
+def follow(path: str, interval: float = 1.0, idle: Optional[float] = None,
+           start: int = 0) -> Iterator[str]:
+    """Yield complete lines of a growing file, like ``tail -f``
+
+    A trailing partial line is held back until its newline arrives. If the
+    file shrinks or is replaced, reading restarts at its beginning. Stops
+    after ``idle`` seconds without new data (never, if None).
+    """
+    fh = None
+    inode = None
+    position = start
+    pending = b""
+    quiet_since = time.monotonic()
+    try:
+        while True:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                stat = None
+            if stat is not None and (fh is None or stat.st_ino != inode or stat.st_size < position):
+                if fh is not None:
+                    fh.close()
+                    position, pending = 0, b""
+                fh = open(path, "rb")
+                inode = stat.st_ino
+                fh.seek(position)
+            data = fh.read(1 << 16) if fh is not None else b""
+            if data:
+                position += len(data)
+                quiet_since = time.monotonic()
+                lines = (pending + data).split(b"\n")
+                pending = lines.pop()
+                if len(pending) > MAX_LINE:
+                    pending = b""
+                for line in lines:
+                    if line.strip():
+                        yield line.decode("utf-8", "replace")
+                continue
+            if idle is not None and time.monotonic() - quiet_since >= idle:
+                return
+            time.sleep(interval)
+    finally:
+        if fh is not None:
+            fh.close()
+
+def generate(path: str, games: int, seed: int = 0, max_turns: int = 60, world: World = WORLD) -> int:
+    """Append the events of ``games`` random games; returns the number of lines written"""
+    rng = random.Random(seed)
+    written = 0
+    with open(path, "a", encoding="utf-8") as fh:
+        for _ in range(games):
+            engine = create_game(NullRenderer(), RandomInput(rng), world)
+            log = EventLog(fh, player=f"player-{rng.randrange(games)}").attach(engine)
+            engine.go_to_location("start")
+            try:
+                for _ in range(rng.randrange(1, max_turns)):
+                    engine.step()
+                engine.end_game()
+            except GameExit:
+                pass
+            written += log.written
+    return written
+
+def format_report(report: Dict) -> str:
+    """Human-readable summary"""
+    lines = [f"📊 {report['events']} events, {report['turns']} turns, {report['games']} games, "
+             f"~{report['players']} players"
+             + (f", {report['malformed']} malformed lines" if report["malformed"] else "")]
+    for name, decision in report["decisions"].items():
+        lines.append(f"\n🎯 {name}: {decision['title']} ({decision['visits']} choices)")
+        for choice, option in decision["options"].items():
+            lines.append(f"   {choice}. {option['label'][:40]:<40} {option['count']:>8} "
+                         f"{option['share']:>6.1%}")
+    lines.append("\n📜 Quest funnels (unique players)")
+    for quest, stages in report["funnels"].items():
+        top = stages[0][1] or 1
+        lines.append(f"   {quest}: " + " → ".join(f"{stage.split(':')[-1]} {count} ({count / top:.0%})"
+                                                 for stage, count in stages))
+    lines.append("\n🚪 Games ended at")
+    for location, count in report["ends"].items():
+        lines.append(f"   {location:<18} {count:>8}")
+    lines.append("\n🧭 Top transitions")
+    for transition, count in list(report["transitions"].items())[:10]:
+        lines.append(f"   {transition:<34} {count:>8}")
+    return "\n".join(lines)
+
+def main(argv=None):
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Summarize Eldria event logs")
+    parser.add_argument("log", help="event log written by adventure_game.py --events")
+    parser.add_argument("--follow", action="store_true", help="keep reading as the log grows")
+    parser.add_argument("--every", type=float, default=10.0,
+                        help="with --follow, seconds between reports")
+    parser.add_argument("--generate", type=int, metavar="GAMES",
+                        help="append the events of this many random games first")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    show = (lambda report: print(json.dumps(report, indent=2, ensure_ascii=False))) if args.json \
+        else (lambda report: print(format_report(report)))
+    if args.generate:
+        started = time.perf_counter()
+        written = generate(args.log, args.generate, args.seed)
+        print(f"📝 Wrote {written} events in {time.perf_counter() - started:.2f}s")
+    aggregator = Aggregator()
+    if not args.follow:
+        with open(args.log, encoding="utf-8", errors="replace") as fh:
+            aggregator.consume(fh)
+        show(aggregator.report())
+        return 0
+    next_report = time.monotonic() + args.every
+    try:
+        for line in follow(args.log, interval=min(1.0, args.every)):
+            aggregator.feed(line)
+            if time.monotonic() >= next_report:
+                show(aggregator.report())
+                next_report = time.monotonic() + args.every
+    except KeyboardInterrupt:
+        show(aggregator.report())
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
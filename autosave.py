@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+Write-behind autosave for The Lost Realms of Eldria.
+
+Saving inside the scene loop would put disk latency on every turn. An
+Autosave attached to an engine instead takes a copy of the GameState
+after every ``go_to_location`` (under a microsecond) and hands it to a
+shared AutosaveWriter thread, which encodes it and does the file I/O.
+
+The writer keeps at most one pending snapshot per session: a newer save
+replaces an older one that has not been written yet, so a session that
+moves faster than the disk is only encoded and written once per batch.
+Each batch is written as temporary files that are fsynced and renamed
+over the old saves, followed by a single fsync of the directory, so a
+crash leaves either the old or the new save and never a torn one. The
+number of sessions waiting to be written is bounded; when it is full,
+the turn thread blocks until the writer catches up, and the writer
+counts and times those stalls.
+
+Failed writes, renames and directory fsyncs are counted and the temporary
+files removed; the writer keeps running and ``flush`` reports False until
+the sessions whose newest save failed have been written. Should the
+writer thread stop anyway, saves are dropped (and counted) instead of
+blocking the turn thread.
+
+When the player quits or input runs out (the KeyboardInterrupt and
+EOFError paths of ``get_user_input``), the final state is saved and the
+writer is flushed before the game exits, waiting at most EXIT_TIMEOUT
+seconds so a hung disk cannot hang the exit; if the flush does not
+succeed, the player is told their latest progress may not be saved.
+Save files use the ``savegame`` format and load with ``SaveLog.load``.
+
+Usage:
+    python autosave.py --latency
+    python adventure_game.py --autosave saves
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, Optional
+
+from adventure_game import (MSG_AUTOSAVE_UNSAVED, GameEngine, GameExit, GameState, NullRenderer,
+                            RandomInput, create_game)
+from metrics import Histogram
+from savegame import snapshot_record
+
+SESSION_PATTERN = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+# Longest the game waits for the final save when it exits, in seconds
+EXIT_TIMEOUT = 2.0
+
+# A batch is one fsync per file plus one per directory: sub-millisecond to seconds
+WRITE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                 0.25, 0.5, 1.0, 5.0)
+
+class AutosaveWriter:
+    """Background thread writing the newest snapshot of each session to disk"""
+
+    def __init__(self, directory: str, max_pending: int = 1024, fsync: bool = True):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_pending = max_pending
+        self.fsync = fsync
+        self.pending = {}
+        self.cond = threading.Condition()
+        self.closing = False
+        self.stopped = False
+        # Every submit gets a sequence number; ``durable`` is the last one on disk
+        self.sequence = 0
+        self.durable = 0
+        self.submitted = 0
+        self.coalesced = 0
+        self.written = 0
+        self.batches = 0
+        self.errors = 0
+        self.last_error = None
+        # Sessions whose newest save has not reached the disk
+        self.failed = set()
+        self.dropped = 0
+        self.stalls = 0
+        self.stall_seconds = 0.0
+        self.max_depth = 0
+        self.write_seconds = Histogram(WRITE_BUCKETS)
+        self.thread = threading.Thread(target=self._run, name="autosave-writer", daemon=True)
+        self.thread.start()
+
+    def path(self, session_id: str) -> str:
+        """Save file of a session"""
+        return os.path.join(self.directory, f"{session_id}.save")
+
+    def submit(self, session_id: str, state: GameState):
+        """Queue a session's newest state, blocking only while the queue is full
+
+        The writer encodes ``state`` later, so pass a copy the caller will
+        not modify.
+        """
+        with self.cond:
+            if self.closing:
+                raise RuntimeError("autosave writer is closed")
+            self.submitted += 1
+            if session_id in self.pending:
+                self.coalesced += 1
+            elif len(self.pending) >= self.max_pending:
+                started = time.perf_counter()
+                self.stalls += 1
+                while (len(self.pending) >= self.max_pending and session_id not in self.pending
+                       and not self.stopped):
+                    self.cond.wait()
+                self.stall_seconds += time.perf_counter() - started
+            if self.stopped:
+                # Nobody will write it; never block the turn thread on a dead writer
+                self.dropped += 1
+                self.failed.add(session_id)
+                return
+            self.sequence += 1
+            self.pending[session_id] = state
+            depth = len(self.pending)
+            if depth > self.max_depth:
+                self.max_depth = depth
+            if depth == 1:
+                # The writer only sleeps on an empty queue
+                self.cond.notify_all()
+
+    def _run(self):
+        try:
+            while True:
+                with self.cond:
+                    while not self.pending and not self.closing:
+                        self.cond.wait()
+                    if not self.pending:
+                        return
+                    batch, self.pending = self.pending, {}
+                    sequence = self.sequence
+                    # Room in the queue again: wake stalled turn threads
+                    self.cond.notify_all()
+                started = time.perf_counter()
+                try:
+                    written = self._write_batch(batch)
+                except Exception as exc:
+                    written = ()
+                    self._error("batch", exc)
+                self.write_seconds.observe(time.perf_counter() - started)
+                with self.cond:
+                    for session_id in batch:
+                        if session_id in written:
+                            self.failed.discard(session_id)
+                        else:
+                            self.failed.add(session_id)
+                    self.durable = sequence
+                    self.batches += 1
+                    self.cond.notify_all()
+        finally:
+            with self.cond:
+                self.stopped = True
+                self.cond.notify_all()
+
+    def _error(self, what: str, exc: BaseException):
+        self.errors += 1
+        self.last_error = f"{what}: {exc}"
+
+    def _write_batch(self, batch: Dict[str, GameState]) -> set:
+        """Write a batch; returns the sessions whose save is now on disk"""
+        renames = []
+        for session_id, state in batch.items():
+            path = self.path(session_id)
+            temp = path + ".tmp"
+            try:
+                with open(temp, "wb") as fh:
+                    fh.write(snapshot_record(state))
+                    if self.fsync:
+                        fh.flush()
+                        os.fsync(fh.fileno())
+                renames.append((session_id, temp, path))
+            except OSError as exc:
+                self._error(session_id, exc)
+                _remove(temp)
+        written = set()
+        for session_id, temp, path in renames:
+            try:
+                os.replace(temp, path)
+                written.add(session_id)
+            except OSError as exc:
+                self._error(session_id, exc)
+                _remove(temp)
+        self.written += len(written)
+        if self.fsync and written and hasattr(os, "O_DIRECTORY"):
+            # One directory fsync makes every rename in the batch durable
+            try:
+                fd = os.open(self.directory, os.O_RDONLY | os.O_DIRECTORY)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+            except OSError as exc:
+                self._error(self.directory, exc)
+                return set()
+        return written
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every save submitted so far is on disk
+        
+        Returns False on timeout, if the writer stopped first or if the
+        newest save of any session failed to be written.
+        """
+        with self.cond:
+            target = self.sequence
+            self.cond.wait_for(lambda: self.durable >= target or self.stopped, timeout)
+            return self.durable >= target and not self.failed
+
+    def close(self, timeout: Optional[float] = None):
+        """Write everything still pending and stop the thread"""
+        with self.cond:
+            self.closing = True
+            self.cond.notify_all()
+        self.thread.join(timeout)
+
+    def stats(self) -> Dict:
+        """Queue, coalescing and backpressure counters"""
+        with self.cond:
+            depth = len(self.pending)
+        write = self.write_seconds.snapshot()
+        return {
+            "submitted": self.submitted,
+            "coalesced": self.coalesced,
+            "written": self.written,
+            "batches": self.batches,
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "failed_sessions": len(self.failed),
+            "dropped": self.dropped,
+            "stopped": self.stopped,
+            "queue_depth": depth,
+            "max_depth": self.max_depth,
+            "max_pending": self.max_pending,
+            "stalls": self.stalls,
+            "stall_seconds": self.stall_seconds,
+            "write_seconds": write,
+        }
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+class Autosave:
+    """Saves one engine's state through a shared writer"""
+
+    def __init__(self, writer: AutosaveWriter, session_id: str = "autosave",
+                 exit_timeout: float = EXIT_TIMEOUT):
+        if not SESSION_PATTERN.match(session_id):
+            raise ValueError(f"session id must match {SESSION_PATTERN.pattern}: {session_id!r}")
+        self.writer = writer
+        self.session_id = session_id
+        self.exit_timeout = exit_timeout
+
+    def save(self, engine: GameEngine):
+        """Snapshot the engine's state and queue it"""
+        self.writer.submit(self.session_id, engine.state.copy())
+
+    def _exit(self, engine: GameEngine):
+        self.save(engine)
+        if not self.writer.flush(self.exit_timeout):
+            engine.echo(engine.texts[MSG_AUTOSAVE_UNSAVED])
+
+    def attach(self, engine: GameEngine) -> "Autosave":
+        """Save after every location change and flush when the game ends"""
+        engine.add_location_hook(self.save)
+        engine.add_exit_hook(self._exit)
+        return self
+
+def measure_latency(turns: int = 20000, seed: int = 0, fsync: bool = True) -> Dict:
+    """Time random turns without and with autosave enabled"""
+    def run(directory: Optional[str]) -> float:
+        engine = create_game(NullRenderer(), RandomInput(random.Random(seed)))
+        if directory is not None:
+            writer = AutosaveWriter(directory, fsync=fsync)
+            Autosave(writer, "bench").attach(engine)
+        engine.go_to_location("start")
+        started = time.perf_counter()
+        for turn in range(turns):
+            if turn % 50 == 0:
+                engine.reset()
+            try:
+                engine.step()
+            except GameExit:
+                engine.reset()
+        elapsed = time.perf_counter() - started
+        if directory is not None:
+            writer.close()
+            run.stats = writer.stats()
+        return elapsed
+
+    with tempfile.TemporaryDirectory() as tmp:
+        run(None)
+        plain = min(run(None) for _ in range(3))
+        saving = min(run(tmp) for _ in range(3))
+    stats = run.stats
+    return {
+        "turns": turns,
+        "plain_us_per_turn": round(plain / turns * 1e6, 3),
+        "autosave_us_per_turn": round(saving / turns * 1e6, 3),
+        "overhead_us_per_turn": round((saving - plain) / turns * 1e6, 3),
+        "saves_submitted": stats["submitted"],
+        "saves_written": stats["written"],
+        "batches": stats["batches"],
+        "stalls": stats["stalls"],
+    }
+
+def main(argv=None):
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Eldria write-behind autosave")
+    parser.add_argument("--latency", action="store_true",
+                        help="measure per-turn cost with autosave enabled")
+    parser.add_argument("--turns", type=int, default=20000)
+    parser.add_argument("--no-fsync", action="store_true", help="skip fsync (faster, not crash-safe)")
+    args = parser.parse_args(argv)
+
+    if not args.latency:
+        parser.error("nothing to do; try --latency or python adventure_game.py --autosave DIR")
+    for key, value in measure_latency(args.turns, fsync=not args.no_fsync).items():
+        print(f"{key:>22}: {value}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Vectorized batch simulator for The Lost Realms of Eldria (requires NumPy).
+
+Where ``simulator.py`` plays one GameState at a time in each worker
+process, this module keeps a whole population of players as a
+struct-of-arrays state: location, health, gold and reputation are arrays,
+and inventory, completed quests and story flags are bit matrices (one
+``uint64`` word per 64 names). The compiled scene steps of the World are
+translated once into a small vector program; each turn runs every scene's
+program on the players standing in it, using index masks for conditions
+(``gold >= 20`` at the tavern, ``has_item("Ancient Map")`` at the waterfall
+cave) and a uniform random draw per player for menus, exactly like
+RandomInput.
+
+Results are reported with the same OutcomeStats histograms as the scalar
+simulator. ``--verify N`` records the choices drawn for N sampled players
+and replays them through the real engine with ``run_headless``; every
+final state must match.
+
+Usage:
+    python batch_sim.py --players 1000000 --turns 50
+    python batch_sim.py --players 100000 --verify 500
+    python batch_sim.py --players 1000000 --compare 20000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+from typing import Dict, List
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency, only needed by this tool
+    np = None
+
+from adventure_game import (COND_FLAG, COND_GOLD_AT_LEAST, COND_HAS_ITEM, OP_ADD_ITEM, OP_FLAG, OP_GOLD,
+                            OP_GOTO, OP_HEALTH, OP_IF, OP_MENU, OP_PAUSE, OP_QUEST, OP_REMOVE_ITEM,
+                            OP_REPUTATION, WORLD, World, run_headless)
+from simulator import OutcomeStats, format_report, simulate
+
+# Vector program opcodes
+V_GOLD, V_HEALTH, V_REPUTATION, V_SET, V_CLEAR, V_GOTO, V_IF, V_MENU, V_PAUSE = range(9)
+
+class BitNames:
+    """Maps names to (word, bit) positions in a bit matrix"""
+
+    def __init__(self, names: List[str]):
+        self.names = list(names)
+        self.position = {name: (i // 64, np.uint64(1 << (i % 64))) for i, name in enumerate(self.names)}
+        self.words = max(1, (len(self.names) + 63) // 64)
+
+    def matrix(self, players: int):
+        """An all-clear bit matrix for ``players`` rows"""
+        return np.zeros((players, self.words), np.uint64)
+
+    def column(self, matrix, name: str):
+        """Boolean array: which rows have ``name`` set"""
+        word, bit = self.position[name]
+        return (matrix[:, word] & bit) != 0
+
+class BatchState:
+    """Struct-of-arrays GameState for a population of players"""
+
+    def __init__(self, world: World, players: int, seed: int = 0):
+        self.world = world
+        self.players = players
+        self.rng = np.random.default_rng(seed)
+        self.items = BitNames(_names(world.items(), world.referenced(OP_REMOVE_ITEM),
+                                     world.tested(COND_HAS_ITEM)))
+        self.quests = BitNames(world.quests())
+        self.flags = BitNames(_names(world.flags(), world.tested(COND_FLAG)))
+        start = world.locations.index("start")
+        self.location = np.full(players, start, np.int16)
+        self.health = np.full(players, 100, np.int16)
+        self.gold = np.full(players, 50, np.int64)
+        self.reputation = np.zeros(players, np.int64)
+        self.inventory = self.items.matrix(players)
+        self.completed = self.quests.matrix(players)
+        self.game_flags = self.flags.matrix(players)
+        self.programs = [self._compile(world.scenes[name].steps) for name in world.locations]
+        # When every path through every scene ends in exactly one goto, the
+        # players arriving at each location are known without a scan
+        self.single_exit = all(_goto_counts(program) == {1} for program in self.programs)
+        self.groups = None
+        if self.single_exit:
+            self.groups = [np.arange(players) if i == start else np.empty(0, np.int64)
+                           for i in range(len(self.programs))]
+        self.turns = 0
+        self.traced = None
+        self.trace = {}
+
+    def trace_players(self, players: List[int]):
+        """Record every input drawn for the given players"""
+        self.traced = np.zeros(self.players, bool)
+        self.traced[players] = True
+        self.trace = {int(p): [] for p in players}
+
+    def _compile(self, steps: tuple) -> list:
+        program = []
+        for step in steps:
+            op = step[0]
+            if op is OP_GOLD:
+                program.append((V_GOLD, step[1]))
+            elif op is OP_HEALTH:
+                program.append((V_HEALTH, step[1]))
+            elif op is OP_REPUTATION:
+                program.append((V_REPUTATION, step[1]))
+            elif op is OP_ADD_ITEM:
+                program.append((V_SET, "inventory") + self.items.position[step[1]])
+            elif op is OP_REMOVE_ITEM:
+                program.append((V_CLEAR, "inventory") + self.items.position[step[1]])
+            elif op is OP_QUEST:
+                program.append((V_SET, "completed") + self.quests.position[step[1]])
+            elif op is OP_FLAG:
+                program.append((V_SET, "game_flags") + self.flags.position[step[1]])
+            elif op is OP_GOTO:
+                program.append((V_GOTO, self.world.locations.index(step[1])))
+            elif op is OP_IF:
+                program.append((V_IF, step[1], self._compile(step[2]), self._compile(step[3])))
+            elif op is OP_MENU:
+                program.append((V_MENU, step[2], [self._compile(step[3][c]) for c in step[2]]))
+            elif op is OP_PAUSE:
+                program.append((V_PAUSE,))
+            # Narration, status and inventory listings do not change state
+        return program
+
+    def _condition(self, condition: tuple, idx):
+        code, arg = condition
+        if code == COND_GOLD_AT_LEAST:
+            return self.gold[idx] >= arg
+        if code == COND_HAS_ITEM:
+            word, bit = self.items.position[arg]
+            return (self.inventory[idx, word] & bit) != 0
+        word, bit = self.flags.position[arg]
+        return (self.game_flags[idx, word] & bit) != 0
+
+    def _record(self, idx, choices):
+        selected = self.traced[idx]
+        if selected.any():
+            for player, choice in zip(idx[selected].tolist(), choices[selected].tolist()):
+                self.trace[player].append(choice)
+
+    def _run(self, program: list, idx):
+        for instruction in program:
+            if not idx.size:
+                return
+            op = instruction[0]
+            if op == V_GOLD:
+                self.gold[idx] = np.maximum(self.gold[idx] + instruction[1], 0)
+            elif op == V_HEALTH:
+                self.health[idx] = np.clip(self.health[idx] + instruction[1], 0, 100)
+            elif op == V_REPUTATION:
+                self.reputation[idx] += instruction[1]
+            elif op == V_SET:
+                getattr(self, instruction[1])[idx, instruction[2]] |= instruction[3]
+            elif op == V_CLEAR:
+                getattr(self, instruction[1])[idx, instruction[2]] &= ~instruction[3]
+            elif op == V_GOTO:
+                if self.single_exit:
+                    self.arrivals[instruction[1]].append(idx)
+                else:
+                    self.next_location[idx] = instruction[1]
+            elif op == V_IF:
+                taken = self._condition(instruction[1], idx)
+                self._run(instruction[2], idx[taken])
+                self._run(instruction[3], idx[~taken])
+            elif op == V_MENU:
+                valid, branches = instruction[1], instruction[2]
+                drawn = self.rng.integers(0, len(valid), size=idx.size, dtype=np.uint8)
+                if self.traced is not None:
+                    self._record(idx, np.asarray(valid, dtype=object)[drawn])
+                # One stable sort splits the players by choice, keeping each
+                # part in ascending order
+                ordered = idx[np.argsort(drawn, kind="stable")]
+                ends = np.cumsum(np.bincount(drawn, minlength=len(valid)))
+                start = 0
+                for branch, end in zip(branches, ends.tolist()):
+                    self._run(branch, ordered[start:end])
+                    start = end
+            elif op == V_PAUSE and self.traced is not None:
+                self._record(idx, np.full(idx.size, "", dtype=object))
+
+    def step(self):
+        """Play one turn (one scene) for every player"""
+        if self.single_exit:
+            self.arrivals = [[] for _ in self.programs]
+            for program, idx in zip(self.programs, self.groups):
+                self._run(program, idx)
+            self.groups = [np.concatenate(parts) if parts else np.empty(0, np.int64)
+                           for parts in self.arrivals]
+            self.arrivals = None
+        else:
+            self.next_location = self.location.copy()
+            for index, program in enumerate(self.programs):
+                self._run(program, np.flatnonzero(self.location == index))
+            self.location = self.next_location
+        self.turns += 1
+
+    def locations(self):
+        """Location index of every player"""
+        if self.single_exit:
+            for index, idx in enumerate(self.groups):
+                self.location[idx] = index
+        return self.location
+
+    def player(self, index: int) -> Dict:
+        """One player's state in the same shape as ``state_summary``"""
+        def names(bits: BitNames, matrix):
+            return sorted(name for name in bits.names if bits.column(matrix[index:index + 1], name)[0])
+        return {
+            "location": self.world.locations[self.locations()[index]],
+            "health": int(self.health[index]),
+            "gold": int(self.gold[index]),
+            "reputation": int(self.reputation[index]),
+            "inventory": names(self.items, self.inventory),
+            "quests": names(self.quests, self.completed),
+            "flags": names(self.flags, self.game_flags),
+        }
+
+    def outcome_stats(self, gold_bucket: int = 10) -> OutcomeStats:
+        """Fold the population into the scalar simulator's histograms"""
+        stats = OutcomeStats(gold_bucket)
+        stats.runs = self.players
+        stats.turns = self.players * self.turns
+        stats.gold = _histogram(self.gold // gold_bucket * gold_bucket)
+        stats.health = _histogram(self.health)
+        stats.reputation = _histogram(self.reputation)
+        held = np.zeros(self.players, np.int64)
+        for name in self.items.names:
+            column = self.items.column(self.inventory, name)
+            held += column
+            if column.any():
+                stats.items[name] = int(column.sum())
+        done = np.zeros(self.players, np.int64)
+        for name in self.quests.names:
+            column = self.quests.column(self.completed, name)
+            done += column
+            if column.any():
+                stats.quests[name] = int(column.sum())
+        stats.inventory_size = _histogram(held)
+        stats.quest_count = _histogram(done)
+        return stats
+
+def _goto_counts(program: list) -> set:
+    """Possible numbers of gotos along the paths of a program (capped at 2)"""
+    counts = {0}
+    for instruction in program:
+        if instruction[0] == V_GOTO:
+            options = {1}
+        elif instruction[0] == V_IF:
+            options = _goto_counts(instruction[2]) | _goto_counts(instruction[3])
+        elif instruction[0] == V_MENU:
+            options = set().union(*map(_goto_counts, instruction[2]))
+        else:
+            continue
+        counts = {min(2, count + extra) for count in counts for extra in options}
+    return counts
+
+def _names(*groups) -> List[str]:
+    names = []
+    for group in groups:
+        names.extend(name for name in group if name not in names)
+    return names
+
+def _histogram(values) -> Counter:
+    keys, counts = np.unique(values, return_counts=True)
+    return Counter(dict(zip(keys.tolist(), counts.tolist())))
+
+def state_summary(state) -> Dict:
+    """A scalar GameState in the shape of ``BatchState.player``"""
+    return {
+        "location": state.current_location,
+        "health": state.health,
+        "gold": state.gold,
+        "reputation": state.reputation,
+        "inventory": sorted(state.inventory),
+        "quests": sorted(state.completed_quests),
+        "flags": sorted(name for name, value in state.game_flags.items() if value),
+    }
+
+def simulate_batch(players: int, turns: int = 50, seed: int = 0, world: World = WORLD,
+                   chunk_size: int = 1000000) -> OutcomeStats:
+    """Simulate ``players`` random playthroughs in lockstep, ``chunk_size`` at a time"""
+    if np is None:
+        raise RuntimeError("batch_sim requires NumPy (pip install numpy)")
+    total = OutcomeStats()
+    seeds = np.random.SeedSequence(seed).spawn((players + chunk_size - 1) // chunk_size)
+    for chunk_seed, start in zip(seeds, range(0, players, chunk_size)):
+        batch = BatchState(world, min(chunk_size, players - start), chunk_seed)
+        for _ in range(turns):
+            batch.step()
+        total.merge(batch.outcome_stats())
+    return total
+
+def verify(players: int, sample: int, turns: int = 50, seed: int = 0,
+           world: World = WORLD) -> List[Dict]:
+    """Replay sampled players through the scalar engine; return any mismatches"""
+    batch = BatchState(world, players, seed)
+    chosen = np.random.default_rng(seed + 1).choice(players, size=min(sample, players), replace=False)
+    batch.trace_players(chosen)
+    for _ in range(turns):
+        batch.step()
+    mismatches = []
+    for player, choices in batch.trace.items():
+        expected = batch.player(player)
+        actual = state_summary(run_headless(choices, max_turns=turns, world=world).state)
+        if actual != expected:
+            mismatches.append({"player": player, "batch": expected, "engine": actual})
+    return mismatches
+
+def main(argv=None):
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Vectorized lockstep simulation of Eldria players")
+    parser.add_argument("--players", type=int, default=1000000)
+    parser.add_argument("--turns", type=int, default=50, help="scenes per playthrough")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-size", type=int, default=1000000, help="players held in memory at once")
+    parser.add_argument("--verify", type=int, metavar="N", default=0,
+                        help="check N sampled players against the scalar engine")
+    parser.add_argument("--compare", type=int, metavar="RUNS", default=0,
+                        help="also time RUNS playthroughs with the process-pool simulator")
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = parser.parse_args(argv)
+    if np is None:
+        parser.error("NumPy is required: pip install numpy")
+
+    if args.verify:
+        mismatches = verify(args.players, args.verify, args.turns, args.seed)
+        for mismatch in mismatches[:10]:
+            print(json.dumps(mismatch))
+        print(f"{'❌' if mismatches else '✅'} {args.verify - len(mismatches)}/{args.verify} "
+              "sampled players match the scalar engine")
+        return 1 if mismatches else 0
+
+    started = time.perf_counter()
+    stats = simulate_batch(args.players, args.turns, args.seed, chunk_size=args.chunk_size)
+    elapsed = time.perf_counter() - started
+    summary = stats.summary()
+    summary["seconds"] = round(elapsed, 3)
+    summary["runs_per_second"] = round(stats.runs / elapsed) if elapsed else None
+    if args.compare:
+        started = time.perf_counter()
+        simulate(args.compare, os.cpu_count(), args.turns, args.seed)
+        pool_rate = args.compare / (time.perf_counter() - started)
+        summary["pool_runs_per_second"] = round(pool_rate)
+        summary["speedup"] = round(summary["runs_per_second"] / pool_rate, 1)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print(format_report(summary))
+        print(f"\n⏱️  {elapsed:.2f}s ({summary['runs_per_second']} playthroughs/s)")
+        if args.compare:
+            print(f"🏎️  {summary['speedup']}x the process pool ({summary['pool_runs_per_second']} playthroughs/s "
+                  f"on {os.cpu_count()} cores)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
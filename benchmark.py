@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for The Lost Realms of Eldria.
+
+Times the engine's hot paths (GameState mutations, ``go_to_location``
+dispatch, scene execution under a NullRenderer, scene rendering with the
+buffered and full-screen backends, ``create_game`` construction, turn API token round trips), the cold import of
+``adventure_game`` and end-to-end scripted playthroughs. Each benchmark is
+calibrated to run for at least ``min_time`` seconds per sample and
+repeated several times; the median time per operation is reported.
+
+Results are written as JSON and can be compared against a stored baseline:
+any benchmark whose median is slower than the baseline by more than the
+threshold is flagged as a regression and the command exits with status 1.
+
+``--startup`` instead reports what a short-lived per-connection process
+pays before the player can type: the import, building the world and the
+time to the first prompt of ``main()`` with ``--fast-start``, each measured in fresh
+interpreters and checked against STARTUP_BUDGET.
+
+Usage:
+    python benchmark.py --save-baseline bench_baseline.json
+    python benchmark.py --baseline bench_baseline.json --threshold 0.10
+    python benchmark.py --sessions 100000
+    python benchmark.py --startup
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+from adventure_game import (BufferedRenderer, GameEngine, GameExit, GameState, NullRenderer,
+                            QueuedInput, RandomInput, ScreenRenderer, ScriptedInput, World, WORLD,
+                            WORLD_SPEC, compile_world, create_game, run_headless)
+
+RESULTS_VERSION = 1
+
+# Milliseconds a fresh process may spend before the first prompt, with headroom for slow CI
+STARTUP_BUDGET = {"import_ms": 40.0, "world_ms": 2.0, "first_prompt_ms": 60.0, "process_ms": 400.0}
+
+# Run in a fresh interpreter; prints its timings as JSON on the last line
+STARTUP_PROBE = r"""
+import time
+started = time.perf_counter()
+import adventure_game
+imported = time.perf_counter()
+
+# The shipped entry point, stopped at its first prompt
+def first_prompt(self, prompt, valid_options=None):
+    global prompted
+    prompted = (time.perf_counter(), time.time(),
+                sum(scene.compiled for scene in adventure_game.WORLD.scenes.values()))
+    raise EOFError
+
+adventure_game.ConsoleInput.read = first_prompt
+adventure_game.main(["--fast-start"])
+built = time.perf_counter()
+adventure_game.compile_world(lazy=True)
+lazy = time.perf_counter()
+adventure_game.compile_world()
+eager = time.perf_counter()
+import json
+print(json.dumps({"import_ms": (imported - started) * 1e3, "world_ms": (lazy - built) * 1e3,
+                  "world_eager_ms": (eager - lazy) * 1e3,
+                  "first_prompt_ms": (prompted[0] - started) * 1e3, "prompt_at": prompted[1],
+                  "scenes_compiled": prompted[2]}))
+"""
+
+# name -> (function(loops) -> seconds, fixed loop count or None to calibrate)
+BENCHMARKS = {}
+
+def bench(name: str, loops: Optional[int] = None):
+    """Register ``func(loops)`` as a benchmark
+
+    One loop is one operation; the function returns the seconds spent in
+    the timed section so that setup is not counted.
+    """
+    def register(func: Callable[[int], float]):
+        BENCHMARKS[name] = (func, loops)
+        return func
+    return register
+
+@bench("state_mutations")
+def bench_state_mutations(loops: int):
+    """Inventory, quest and stat changes on a GameState"""
+    state = GameState(NullRenderer())
+    started = time.perf_counter()
+    for _ in range(loops):
+        state.add_item("Healing Potion")
+        state.modify_gold(10)
+        state.modify_health(-5)
+        state.modify_reputation(1)
+        state.complete_quest("Herb Quest")
+        state.remove_item("Healing Potion")
+    return time.perf_counter() - started
+
+@bench("location_dispatch")
+def bench_location_dispatch(loops: int):
+    """``go_to_location`` plus one step through a no-op scene"""
+    engine = GameEngine(NullRenderer())
+    engine.add_location("a", lambda game: None)
+    engine.add_location("b", lambda game: None)
+    go_to, step = engine.go_to_location, engine.step
+    started = time.perf_counter()
+    for i in range(loops):
+        go_to("b" if i & 1 else "a")
+        step()
+    return time.perf_counter() - started
+
+@bench("scene_execution")
+def bench_scene_execution(loops: int):
+    """One real scene run with random choices and a NullRenderer"""
+    engine = create_game(NullRenderer(), RandomInput(random.Random(0)))
+    scenes = list(WORLD.scenes.values())
+    started = time.perf_counter()
+    for i in range(loops):
+        if i % 50 == 0:
+            engine.state = GameState(engine.renderer)
+        scenes[i % len(scenes)](engine)
+    return time.perf_counter() - started
+
+def _render_turns(renderer, loops: int) -> float:
+    engine = create_game(renderer, RandomInput(random.Random(0)))
+    engine.go_to_location("start")
+    started = time.perf_counter()
+    for i in range(loops):
+        if i % 50 == 0:
+            engine.reset()
+        try:
+            engine.step()
+        except GameExit:
+            engine.reset()
+        renderer.flush()
+    return time.perf_counter() - started
+
+@bench("buffered_rendering")
+def bench_buffered_rendering(loops: int):
+    """One turn with random choices rendered by a BufferedRenderer to /dev/null"""
+    with open(os.devnull, "w") as sink:
+        return _render_turns(BufferedRenderer(sink), loops)
+
+@bench("screen_rendering")
+def bench_screen_rendering(loops: int):
+    """One turn with random choices drawn by an 80-column ScreenRenderer to /dev/null"""
+    with open(os.devnull, "w") as sink:
+        return _render_turns(ScreenRenderer(sink, size=(80, 200)), loops)
+
+@bench("create_game")
+def bench_create_game(loops: int):
+    """Build a fresh GameEngine with every scene registered"""
+    renderer = NullRenderer()
+    started = time.perf_counter()
+    for _ in range(loops):
+        create_game(renderer)
+    return time.perf_counter() - started
+
+# Deterministic choice script shared by every playthrough sample
+PLAYTHROUGH_CHOICES = [random.Random(2024).choice("12345ny") for _ in range(400)]
+
+@bench("playthrough")
+def bench_playthrough(loops: int):
+    """A 50-scene scripted playthrough through ``run_headless``"""
+    started = time.perf_counter()
+    for _ in range(loops):
+        run_headless(PLAYTHROUGH_CHOICES, max_turns=50)
+    return time.perf_counter() - started
+
+@bench("playthrough_metrics")
+def bench_playthrough_metrics(loops: int):
+    """The scripted playthrough with run-loop metrics recording every turn"""
+    from metrics import GameMetrics
+    started = time.perf_counter()
+    for _ in range(loops):
+        game = create_game(NullRenderer(), ScriptedInput(PLAYTHROUGH_CHOICES))
+        GameMetrics().attach(game)
+        game.go_to_location("start")
+        try:
+            for _ in range(50):
+                game.step()
+        except GameExit:
+            pass
+    return time.perf_counter() - started
+
+@bench("turn_token")
+def bench_turn_token(loops: int):
+    """Decode and re-encode a stateless turn API token"""
+    from turn_api import TurnAPI
+    api = TurnAPI(b"benchmark-key-0123456789")
+    token = api.turn(api.turn(api.start().token, "1").token, "1").token
+    codec = api.codec
+    started = time.perf_counter()
+    for _ in range(loops):
+        paused = codec.decode(token)
+        codec.encode(paused.state, paused.inputs, paused.sent, paused.typeahead)
+    return time.perf_counter() - started
+
+@bench("cold_import", loops=5)
+def bench_cold_import(loops: int):
+    """``import adventure_game`` in a fresh interpreter, minus interpreter startup"""
+    total = 0.0
+    for _ in range(loops):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "import adventure_game"], check=True)
+        middle = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"], check=True)
+        total += max(0.0, (middle - started) - (time.perf_counter() - middle))
+    return total
+
+def startup_report(repeat: int = 5) -> Dict:
+    """Median startup timings of fresh interpreters, in milliseconds
+
+    ``import_ms`` is ``import adventure_game``, ``world_ms`` building the
+    (lazy) world and ``world_eager_ms`` compiling every scene up front for
+    comparison. ``first_prompt_ms`` runs from the start of the import to
+    the name prompt of ``adventure_game.main(["--fast-start"])``, so it
+    includes everything the shipped entry point sets up, and
+    ``scenes_compiled`` counts the scenes compiled by then;
+    ``process_ms`` runs from launching the interpreter.
+    """
+    samples = []
+    for _ in range(repeat):
+        launched = time.time()
+        output = subprocess.run([sys.executable, "-c", STARTUP_PROBE], check=True,
+                                capture_output=True, text=True).stdout
+        sample = json.loads(output.splitlines()[-1])
+        sample["process_ms"] = (sample.pop("prompt_at") - launched) * 1e3
+        samples.append(sample)
+    return {key: round(statistics.median(sample[key] for sample in samples), 3) for key in samples[0]}
+
+def over_budget(report: Dict, budget: Dict = STARTUP_BUDGET) -> List[str]:
+    """Descriptions of the startup timings that exceed ``budget``"""
+    return [f"{key} {report[key]:.1f} ms > {limit:g} ms" for key, limit in budget.items()
+            if report[key] > limit]
+
+def scaled_world(copies: int) -> World:
+    """A world with ``copies`` renamed duplicates of every scene"""
+    spec = list(WORLD_SPEC)
+    for n in range(1, copies):
+        spec.extend(dict(scene, id=f"{scene['id']}~{n}") for scene in WORLD_SPEC)
+    return compile_world(spec)
+
+def session_footprint(sessions: int = 100000, world: World = WORLD) -> Dict:
+    """Create ``sessions`` live sessions; report time and memory per session"""
+    renderer = NullRenderer()
+    provider = QueuedInput()
+    tracemalloc.start()
+    try:
+        live = [create_game(renderer, provider, world) for _ in range(sessions)]
+        allocated = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    # Timed separately: tracemalloc slows allocation down considerably
+    del live
+    started = time.perf_counter()
+    live = [create_game(renderer, provider, world) for _ in range(sessions)]
+    elapsed = time.perf_counter() - started
+    return {
+        "sessions": len(live),
+        "scenes": len(world.scenes),
+        "us_per_session": round(elapsed / sessions * 1e6, 3),
+        "bytes_per_session": round(allocated / sessions, 1),
+    }
+
+def calibrate(func: Callable[[int], float], min_time: float) -> int:
+    """Find a loop count whose run takes at least ``min_time`` seconds"""
+    loops = 1
+    while True:
+        elapsed = func(loops)
+        if elapsed >= min_time:
+            return loops
+        loops = loops * 10 if elapsed < min_time / 10 else int(loops * min_time / elapsed * 1.2) + 1
+
+def run_benchmarks(names: Optional[List[str]] = None, repeat: int = 5,
+                   min_time: float = 0.2, progress=None) -> Dict:
+    """Run the selected benchmarks and return a JSON-friendly result set"""
+    results = {}
+    for name in names or list(BENCHMARKS):
+        if name not in BENCHMARKS:
+            raise ValueError(f"Unknown benchmark: {name}")
+        func, loops = BENCHMARKS[name]
+        loops = loops or calibrate(func, min_time)
+        samples = [func(loops) / loops for _ in range(repeat)]
+        results[name] = {
+            "median": statistics.median(samples),
+            "min": min(samples),
+            "stdev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+            "loops": loops,
+            "repeat": repeat,
+        }
+        if progress:
+            progress(name, results[name])
+    return {
+        "version": RESULTS_VERSION,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "benchmarks": results,
+    }
+
+def compare(results: Dict, baseline: Dict, threshold: float = 0.10) -> List[Dict]:
+    """Compare median timings against a baseline result set
+
+    Each row has a status of "regression", "improvement", "ok", "new" (not
+    in the baseline) or "missing" (in the baseline but not run).
+    """
+    current = results["benchmarks"]
+    previous = baseline.get("benchmarks", {})
+    rows = []
+    for name in list(current) + [n for n in previous if n not in current]:
+        if name not in previous or name not in current:
+            rows.append({"name": name, "status": "new" if name in current else "missing"})
+            continue
+        ratio = current[name]["median"] / previous[name]["median"]
+        if ratio > 1 + threshold:
+            status = "regression"
+        elif ratio < 1 / (1 + threshold):
+            status = "improvement"
+        else:
+            status = "ok"
+        rows.append({"name": name, "status": status, "ratio": round(ratio, 4),
+                     "baseline": previous[name]["median"], "median": current[name]["median"]})
+    return rows
+
+def format_time(seconds: float) -> str:
+    """Human-readable duration"""
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3g} {unit}"
+    return f"{seconds / 1e-9:.3g} ns"
+
+def format_report(results: Dict, rows: Optional[List[Dict]] = None) -> str:
+    """Render results (and an optional baseline comparison) as a table"""
+    marks = {"regression": "❌", "improvement": "🚀", "ok": "✅", "new": "🆕", "missing": "❔"}
+    by_name = {row["name"]: row for row in rows or []}
+    lines = [f"⏱️  Python {results['python']} ({results['implementation']}, {results['machine']})", ""]
+    for name, result in results["benchmarks"].items():
+        line = f"{name:>18}: {format_time(result['median']):>10} ± {format_time(result['stdev'])}"
+        row = by_name.get(name)
+        if row:
+            line += f"  {marks[row['status']]} {row['status']}"
+            if "ratio" in row:
+                line += f" ({row['ratio']:.2f}x baseline)"
+        lines.append(line)
+    for row in rows or []:
+        if row["status"] == "missing":
+            lines.append(f"{row['name']:>18}: {marks['missing']} missing")
+    return "\n".join(lines)
+
+def main(argv=None):
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Benchmark the Eldria engine")
+    parser.add_argument("names", nargs="*", help=f"benchmarks to run (default: all of {', '.join(BENCHMARKS)})")
+    parser.add_argument("--repeat", type=int, default=5, help="samples per benchmark")
+    parser.add_argument("--min-time", type=float, default=0.2, help="minimum seconds per sample")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="compare against results stored in this file")
+    parser.add_argument("--save-baseline", metavar="PATH", help="store these results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="slowdown fraction flagged as a regression")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("--sessions", type=int, metavar="N",
+                        help="instead, create N live sessions on a normal and a 10x world "
+                             "and report time and memory per session")
+    parser.add_argument("--startup", action="store_true",
+                        help="instead, report cold-start timings and check them against the budget")
+    args = parser.parse_args(argv)
+
+    if args.startup:
+        report = startup_report(args.repeat)
+        failures = over_budget(report)
+        if args.json:
+            print(json.dumps({"startup": report, "budget": STARTUP_BUDGET, "over_budget": failures}, indent=2))
+        else:
+            for key, value in report.items():
+                limit = STARTUP_BUDGET.get(key)
+                unit = " ms" if key.endswith("_ms") else ""
+                print(f"🚀 {key:>16}: {value:>8.2f}{unit}" + (f"  (budget {limit:g} ms)" if limit else ""))
+            for failure in failures:
+                print(f"❌ over budget: {failure}")
+        return 1 if failures else 0
+
+    if args.sessions:
+        for world in (WORLD, scaled_world(10)):
+            report = session_footprint(args.sessions, world)
+            print(json.dumps(report) if args.json else
+                  f"🏰 {report['sessions']} sessions on {report['scenes']} scenes: "
+                  f"{report['us_per_session']} us and {report['bytes_per_session']} bytes per session")
+        return 0
+
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+    results = run_benchmarks(args.names or None, args.repeat, args.min_time)
+    rows = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as fh:
+            rows = compare(results, json.load(fh), args.threshold)
+        results["comparison"] = rows
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+    print(json.dumps(results, indent=2) if args.json else format_report(results, rows))
+    if rows and any(row["status"] == "regression" for row in rows):
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
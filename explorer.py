@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+Exhaustive state-space explorer for The Lost Realms of Eldria.
+
+Starting from a fresh game, every reachable combination of location,
+inventory, story flags, completed quests and bucketed stats is enumerated
+by playing each valid choice (including nested prompts) through the real
+compiled scenes. States are deduplicated through a transposition table of
+64-bit canonical hashes, which can spill to an on-disk sqlite table once it
+outgrows a memory budget, and each breadth-first level can be expanded
+across a process pool.
+
+The report lists reachable and unreachable items, quests and flags, menu
+choices and conditional branches that can never be taken, choices that
+loop without making progress, and dead-end states.
+
+Usage:
+    python explorer.py
+    python explorer.py --workers 4 --json
+"""
+
+import argparse
+import bisect
+import hashlib
+import json
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from adventure_game import (COND_FLAG, COND_HAS_ITEM, GameEngine, GameFlags, GameState, InputRequired,
+                            NullRenderer, QueuedInput, WORLD, World, create_game)
+from savegame import dump_state, load_state
+
+class Buckets:
+    """How stats are coarsened before states are compared
+
+    Each stat is mapped to the index of the highest threshold it has
+    reached. By default gold uses the thresholds the world's conditions test
+    (so every state that can afford the same things is merged), health
+    distinguishes 0, wounded and full, and reputation is ignored. Pass a
+    bucket width to track a stat in fixed-size steps instead.
+    """
+
+    def __init__(self, gold: List[int], health: List[int], reputation: List[int]):
+        self.gold = sorted(gold)
+        self.health = sorted(health)
+        self.reputation = sorted(reputation)
+
+    @classmethod
+    def for_world(cls, world: World, gold_width: int = 0, health_width: int = 0,
+                  reputation_width: int = 0, cap: int = 500) -> "Buckets":
+        """Default buckets for a world, optionally with fixed-width steps"""
+        gold = set(world.gold_thresholds())
+        if gold_width:
+            gold.update(range(gold_width, cap + 1, gold_width))
+        health = set(range(health_width, 101, health_width)) if health_width else {1, 100}
+        reputation = set(range(reputation_width, cap + 1, reputation_width)) if reputation_width else set()
+        return cls(list(gold), list(health), list(reputation))
+
+    def key(self, state: GameState) -> Tuple[int, int, int]:
+        """Bucketed ``(gold, health, reputation)``"""
+        return (bisect.bisect_right(self.gold, state.gold),
+                bisect.bisect_right(self.health, state.health),
+                bisect.bisect_right(self.reputation, state.reputation))
+
+class StateKeys:
+    """Canonical, process-independent hashing of game states
+
+    Scenes only branch on the items, flags and gold amounts named in their
+    conditions, so by default a state is identified by its location, the
+    tested items and flags, and its bucketed stats; everything else the
+    player collects is still recorded for the report but does not split
+    states. With ``full=True`` the whole inventory, every flag and the
+    completed quests are part of the key as well.
+    """
+
+    def __init__(self, world: World, buckets: Buckets, full: bool = False):
+        self.world = world
+        self.buckets = buckets
+        self.full = full
+        self.location = {name: i for i, name in enumerate(world.locations)}
+        items = world.items() if full else world.tested(COND_HAS_ITEM)
+        self.item = {name: i for i, name in enumerate(items)}
+        self.quest = {name: i for i, name in enumerate(world.quests())}
+        self.tested_flags = world.tested(COND_FLAG)
+        if full:
+            self.flag_mask = -1
+        else:
+            self.flag_mask = GameFlags({name: True for name in self.tested_flags}).bits
+
+    def _bits(self, names, index: Dict[str, int]) -> int:
+        bits = 0
+        for name in names:
+            position = index.get(name)
+            if position is None:
+                if not self.full:
+                    continue
+                position = index[name] = len(index)
+            bits |= 1 << position
+        return bits
+
+    def key(self, state: GameState) -> tuple:
+        """Canonical tuple describing a state"""
+        flags = state.game_flags
+        if self.full:
+            extra = tuple(sorted(flags.extra)) if flags.extra else ()
+            quests = self._bits(state.completed_quests, self.quest)
+        else:
+            extra = tuple(name for name in self.tested_flags
+                          if flags.extra and name in flags.extra)
+            quests = 0
+        return ((self.location[state.current_location],
+                 self._bits(state.inventory, self.item),
+                 flags.bits & self.flag_mask, extra, quests)
+                + self.buckets.key(state))
+
+    @staticmethod
+    def digest(key: tuple) -> int:
+        """64-bit hash of a canonical key"""
+        return int.from_bytes(hashlib.blake2b(repr(key).encode(), digest_size=8).digest(), "little")
+
+class TranspositionTable:
+    """Set of visited state hashes that spills to sqlite past a size limit"""
+
+    def __init__(self, memory_limit: int = 2000000, spill_dir: Optional[str] = None):
+        self.memory_limit = memory_limit
+        self.spill_dir = spill_dir
+        self.memory = set()
+        self.db = None
+        self.size = 0
+        self.spilled = 0
+
+    def add(self, digest: int) -> bool:
+        """Insert a hash; returns False if it was already present"""
+        if digest in self.memory:
+            return False
+        signed = digest - (1 << 64) if digest >= 1 << 63 else digest
+        if self.db is not None and self.db.execute(
+                "SELECT 1 FROM seen WHERE h = ?", (signed,)).fetchone():
+            return False
+        self.memory.add(digest)
+        self.size += 1
+        if len(self.memory) >= self.memory_limit:
+            self._spill()
+        return True
+
+    def _spill(self):
+        if self.db is None:
+            directory = self.spill_dir or tempfile.gettempdir()
+            fd, self.path = tempfile.mkstemp(dir=directory, prefix="eldria-states-", suffix=".db")
+            os.close(fd)
+            self.db = sqlite3.connect(self.path)
+            self.db.execute("CREATE TABLE seen (h INTEGER PRIMARY KEY)")
+        self.db.executemany("INSERT OR IGNORE INTO seen VALUES (?)",
+                            ((d - (1 << 64) if d >= 1 << 63 else d,) for d in self.memory))
+        self.db.commit()
+        self.spilled += len(self.memory)
+        self.memory = set()
+
+    def close(self):
+        """Drop the spill file, if any"""
+        if self.db is not None:
+            self.db.close()
+            os.remove(self.path)
+            self.db = None
+
+# Per-process engine used to expand states, and the world workers explore
+_engine = None
+_world = WORLD
+
+def _get_engine(world: World = WORLD) -> GameEngine:
+    global _engine
+    if _engine is None or _engine.world is not world:
+        _engine = create_game(NullRenderer(), QueuedInput(), world)
+        _engine.coverage = set()
+    return _engine
+
+def _init_worker(world: World):
+    global _world
+    _world = world
+
+def expand(state: GameState, engine: Optional[GameEngine] = None,
+           world: World = WORLD) -> List[Tuple[tuple, GameState, set]]:
+    """Play every valid input sequence of the current scene from ``state``
+
+    Returns ``(inputs, next_state, coverage)`` for each complete turn. The
+    engine must read from a QueuedInput; by default a shared one over
+    ``world`` is used.
+    """
+    if engine is None:
+        engine = _get_engine(world)
+    results = []
+    pending = [()]
+    while pending:
+        inputs = pending.pop()
+        engine.state = state.copy()
+        engine.go_to_location(state.current_location)
+        engine.input_provider.queue.clear()
+        engine.input_provider.queue.extend(inputs)
+        engine.coverage = set()
+        try:
+            engine.step()
+        except InputRequired as request:
+            for option in reversed(request.valid_options or [""]):
+                pending.append(inputs + (option,))
+            continue
+        results.append((inputs, engine.state, engine.coverage))
+    return results
+
+def expand_batch(blobs: List[bytes], world: Optional[World] = None) -> List[List[Tuple[tuple, bytes, set]]]:
+    """Worker entry point: expand serialized states
+
+    States are played in ``world``, or the world the worker was started with.
+    """
+    engine = _get_engine(world if world is not None else _world)
+    return [[(inputs, dump_state(child), coverage)
+             for inputs, child, coverage in expand(load_state(blob), engine)]
+            for blob in blobs]
+
+class Exploration:
+    """Results of a state-space exploration"""
+
+    def __init__(self, world: World):
+        self.world = world
+        self.states = 0
+        self.edges = 0
+        self.levels = 0
+        self.per_location = Counter()
+        self.items = set()
+        self.quests = set()
+        self.flags = set()
+        self.coverage = set()
+        self.no_progress = Counter()
+        self.dead_ends = []
+        self.truncated = False
+        self.seconds = 0.0
+
+    def report(self) -> Dict:
+        """JSON-friendly summary"""
+        world = self.world
+        unreachable = [pair for pair in world.branches() if pair not in self.coverage]
+        unvisited = [name for name in world.locations if not self.per_location[name]]
+        return {
+            "states": self.states,
+            "transitions": self.edges,
+            "depth": self.levels,
+            "truncated": self.truncated,
+            "seconds": round(self.seconds, 3),
+            "states_per_location": dict(self.per_location),
+            "unvisited_locations": unvisited,
+            "reachable_items": [i for i in world.items() if i in self.items],
+            "unreachable_items": [i for i in world.items() if i not in self.items],
+            "reachable_quests": [q for q in world.quests() if q in self.quests],
+            "unreachable_quests": [q for q in world.quests() if q not in self.quests],
+            "unreachable_flags": [f for f in world.flags() if f not in self.flags],
+            "unreachable_branches": [f"{world.describe_branch(label)} -> {outcome}"
+                                     for label, outcome in unreachable],
+            "no_progress_loops": [f"{location} {' '.join(inputs) or '<enter>'} ({count} states)"
+                                  for (location, inputs), count in self.no_progress.most_common()],
+            "dead_ends": self.dead_ends[:20],
+        }
+
+def explore(world: World = WORLD, buckets: Optional[Buckets] = None, full: bool = False,
+            workers: int = 1, max_states: int = 5000000, memory_limit: int = 2000000,
+            spill_dir: Optional[str] = None, batch_size: int = 256) -> Exploration:
+    """Breadth-first enumeration of every reachable state"""
+    keys = StateKeys(world, buckets or Buckets.for_world(world), full)
+    table = TranspositionTable(memory_limit, spill_dir)
+    result = Exploration(world)
+    started = time.perf_counter()
+
+    start = GameState(NullRenderer())
+    table.add(keys.digest(keys.key(start)))
+    frontier = [dump_state(start)]
+    pool = multiprocessing.Pool(workers, _init_worker, (world,)) if workers > 1 else None
+    try:
+        while frontier and not result.truncated:
+            result.levels += 1
+            batches = [frontier[i:i + batch_size] for i in range(0, len(frontier), batch_size)]
+            expanded = (pool.imap(expand_batch, batches) if pool
+                        else (expand_batch(batch, world) for batch in batches))
+            next_frontier = []
+            for batch, children in zip(batches, expanded):
+                for blob, successors in zip(batch, children):
+                    parent = load_state(blob)
+                    parent_digest = keys.digest(keys.key(parent))
+                    _record_state(result, parent)
+                    progressed = False
+                    for inputs, child_blob, coverage in successors:
+                        result.edges += 1
+                        result.coverage |= coverage
+                        child = load_state(child_blob)
+                        _record_reached(result, child)
+                        digest = keys.digest(keys.key(child))
+                        if digest == parent_digest:
+                            result.no_progress[(parent.current_location, inputs)] += 1
+                            continue
+                        progressed = True
+                        if table.add(digest):
+                            if table.size > max_states:
+                                result.truncated = True
+                                continue
+                            next_frontier.append(child_blob)
+                    if not progressed:
+                        result.dead_ends.append(
+                            f"{parent.current_location} gold={parent.gold} "
+                            f"health={parent.health} items={list(parent.inventory)}")
+            frontier = next_frontier
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+        table.close()
+    result.seconds = time.perf_counter() - started
+    return result
+
+def _record_state(result: Exploration, state: GameState):
+    result.states += 1
+    result.per_location[state.current_location] += 1
+    _record_reached(result, state)
+
+def _record_reached(result: Exploration, state: GameState):
+    # Every successor counts towards reachability, even when it merges
+    # into an already-known state
+    result.items.update(state.inventory)
+    result.quests.update(state.completed_quests)
+    result.flags.update(state.game_flags.keys())
+
+def format_report(report: Dict) -> str:
+    """Render an exploration report for humans"""
+    lines = [f"🗺️  {report['states']} states, {report['transitions']} transitions, "
+             f"depth {report['depth']} in {report['seconds']}s"
+             + (" (truncated)" if report["truncated"] else ""), ""]
+    for title, key in (("Unvisited locations", "unvisited_locations"),
+                       ("Unreachable items", "unreachable_items"),
+                       ("Unreachable quests", "unreachable_quests"),
+                       ("Unreachable flags", "unreachable_flags"),
+                       ("Unreachable branches", "unreachable_branches"),
+                       ("Choices that loop without progress", "no_progress_loops"),
+                       ("Dead ends", "dead_ends")):
+        values = report[key]
+        lines.append(f"{title}: {len(values)}")
+        lines.extend(f"  - {value}" for value in values)
+    lines.append("")
+    lines.append("Reachable items: " + ", ".join(report["reachable_items"]))
+    return "\n".join(lines)
+
+def main(argv=None):
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Enumerate every reachable Eldria state")
+    parser.add_argument("--workers", type=int, default=1, help="processes expanding each level")
+    parser.add_argument("--max-states", type=int, default=5000000)
+    parser.add_argument("--memory-limit", type=int, default=2000000,
+                        help="hashes kept in memory before spilling to disk")
+    parser.add_argument("--spill-dir", default=None)
+    parser.add_argument("--gold-bucket", type=int, default=0,
+                        help="also track gold in steps of this size")
+    parser.add_argument("--health-bucket", type=int, default=0,
+                        help="track health in steps of this size")
+    parser.add_argument("--reputation-bucket", type=int, default=0,
+                        help="track reputation in steps of this size")
+    parser.add_argument("--full", action="store_true",
+                        help="key states on the whole inventory, all flags and quests")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    buckets = Buckets.for_world(WORLD, args.gold_bucket, args.health_bucket,
+                                args.reputation_bucket)
+    result = explore(WORLD, buckets, args.full, args.workers, args.max_states,
+                     args.memory_limit, args.spill_dir)
+    report = result.report()
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
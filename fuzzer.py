@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""
+Coverage-guided fuzzer for The Lost Realms of Eldria.
+
+Each execution plays an input sequence through the real scenes with a
+NullRenderer, recording which branches (every menu choice and both sides
+of every condition) and which location-to-location transitions it hits.
+Features are bits in a coverage map shared by every worker process; an
+input that sets a new bit joins the corpus and is mutated further
+(replace, insert, delete, duplicate, splice and append, drawing from the
+world's menu choices plus invalid, empty and type-ahead inputs).
+
+Every turn is checked for:
+  * crashes: any exception escaping a scene,
+  * invariant violations: health outside 0-100, negative gold, an
+    inventory or quest log whose order does not match its set bits, or a
+    location with no scene,
+  * no-progress loops: many turns in a row that read no input, which on
+    a terminal would spin forever, or that end in exactly the state they
+    started from (the same choice taken again and again to no effect).
+
+Findings are deduplicated, minimized by deleting inputs while the same
+finding still reproduces, and reported with the inputs that trigger them.
+
+Usage:
+    python fuzzer.py --seconds 30
+    python fuzzer.py --execs 200000 --workers 4 --json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence
+
+from adventure_game import (OP_MENU, GameEngine, GameExit, GameState, InputProvider, NullRenderer,
+                            World, WORLD, create_game, iter_steps)
+
+# Inputs no menu accepts, or that exercise parsing (type-ahead, hints, junk)
+EXTRA_TOKENS = ("", " ", "0", "6", "99", "-1", "y", "n", "yes", "hint", "hint map", "quit",
+                "1 2", "4 3 2", "1 1 1 1", "x" * 300, "é", "\t1", "1.")
+
+class Finding(NamedTuple):
+    """A crash, invariant violation or loop found by the fuzzer"""
+    kind: str
+    message: str
+    location: str
+    inputs: List[str]
+
+    @property
+    def signature(self) -> tuple:
+        """What makes two findings the same bug"""
+        return (self.kind, self.message, self.location)
+
+class FuzzInput(InputProvider):
+    """Serves a fixed input sequence and counts how much was read"""
+
+    __slots__ = ("choices", "pos")
+
+    def __init__(self, choices: Sequence[str]):
+        self.choices = choices
+        self.pos = 0
+
+    def read(self, prompt: str, valid_options: Optional[List[str]] = None) -> str:
+        """Return the next input; EOFError ends the game when they run out"""
+        if self.pos >= len(self.choices):
+            raise EOFError
+        self.pos += 1
+        return self.choices[self.pos - 1]
+
+def check_invariants(engine: GameEngine) -> Optional[str]:
+    """Describe the first broken state invariant, or None"""
+    state = engine.state
+    if not 0 <= state.health <= 100:
+        return f"health {state.health} outside 0-100"
+    if state.gold < 0:
+        return f"negative gold {state.gold}"
+    for label, items in (("inventory", state.inventory), ("completed_quests", state.completed_quests)):
+        # The bitmask cannot hold duplicates; its order can, or drift from it
+        bits = 0
+        for ident in items.order:
+            bits |= 1 << ident
+        if bits != items.bits or len(items.order) != bin(items.bits).count("1"):
+            return f"{label} order {list(items)} does not match its set bits"
+    if state.current_location not in engine.locations:
+        return f"location {state.current_location!r} has no scene"
+    return None
+
+def fingerprint(state: GameState) -> tuple:
+    """Everything a turn can change, as a comparable tuple"""
+    flags = state.game_flags
+    return (state.current_location, state.health, state.gold, state.reputation, flags.bits,
+            tuple(flags.extra.items()) if flags.extra else (), state.inventory.order,
+            state.completed_quests.order)
+
+class CoverageMap:
+    """Numbers every branch and transition of a world as a coverage bit"""
+
+    def __init__(self, world: World):
+        self.branches = world.branches()
+        self.locations = {name: i for i, name in enumerate(world.locations)}
+        self.branch_bits = {pair: i for i, pair in enumerate(self.branches)}
+        self.size = len(self.branches) + len(self.locations) ** 2
+
+    def transition(self, origin: str, target: str) -> int:
+        """Bit of a move between two locations (-1 for unknown locations)"""
+        a = self.locations.get(origin)
+        b = self.locations.get(target)
+        if a is None or b is None:
+            return -1
+        return len(self.branches) + a * len(self.locations) + b
+
+    def describe(self, bit: int) -> str:
+        """Human-readable name of a coverage bit"""
+        if bit < len(self.branches):
+            label, outcome = self.branches[bit]
+            return f"{label} -> {outcome}"
+        names = list(self.locations)
+        a, b = divmod(bit - len(self.branches), len(names))
+        return f"{names[a]} => {names[b]}"
+
+class Executor:
+    """Runs input sequences on one reusable engine"""
+
+    def __init__(self, world: World = WORLD, max_turns: int = 200, loop_limit: int = 50,
+                 factory: Optional[Callable[[], GameEngine]] = None):
+        self.world = world
+        self.coverage_map = CoverageMap(world)
+        self.max_turns = max_turns
+        self.loop_limit = loop_limit
+        self.engine = (factory or (lambda: create_game(NullRenderer(), world=world)))()
+
+    def run(self, inputs: Sequence[str]) -> tuple:
+        """Play ``inputs``; returns ``(coverage bits, finding or None)``"""
+        engine = self.engine
+        provider = engine.input_provider = FuzzInput(inputs)
+        engine.typeahead = None
+        engine.reset()
+        engine.coverage = branches = set()
+        transitions = set()
+        idle = 0
+        unchanged = 0
+        location = engine.state.current_location
+        before = fingerprint(engine.state)
+        try:
+            for _ in range(self.max_turns):
+                read = provider.pos
+                engine.step()
+                target = engine.state.current_location
+                transitions.add((location, target))
+                problem = check_invariants(engine)
+                if problem:
+                    return self._bits(branches, transitions), Finding("invariant", problem, location,
+                                                                      list(inputs))
+                idle = idle + 1 if provider.pos == read else 0
+                if idle >= self.loop_limit:
+                    return self._bits(branches, transitions), Finding(
+                        "loop", f"{self.loop_limit} turns without reading input", location, list(inputs))
+                after = fingerprint(engine.state)
+                unchanged = unchanged + 1 if after == before else 0
+                if unchanged >= self.loop_limit:
+                    return self._bits(branches, transitions), Finding(
+                        "loop", f"{self.loop_limit} turns without changing the state", location, list(inputs))
+                before = after
+                location = target
+        except GameExit:
+            pass
+        except Exception as exc:
+            # Anything escaping a scene is a bug in the scene or the engine
+            return self._bits(branches, transitions), Finding(
+                "crash", f"{type(exc).__name__}: {exc}", engine.state.current_location, list(inputs))
+        return self._bits(branches, transitions), None
+
+    def _bits(self, branches: set, transitions: set) -> List[int]:
+        coverage = self.coverage_map
+        bits = [coverage.branch_bits[pair] for pair in branches if pair in coverage.branch_bits]
+        bits.extend(bit for bit in map(lambda t: coverage.transition(*t), transitions) if bit >= 0)
+        return bits
+
+    def minimize(self, finding: Finding) -> Finding:
+        """Shorten a finding's inputs while it still reproduces"""
+        inputs = list(finding.inputs)
+        self.run(inputs)
+        # Inputs after the point of failure were never read
+        inputs = inputs[:self.engine.input_provider.pos]
+        chunk = max(1, len(inputs) // 2)
+        while chunk:
+            i = 0
+            while i < len(inputs):
+                candidate = inputs[:i] + inputs[i + chunk:]
+                _, again = self.run(candidate)
+                if again is not None and again.signature == finding.signature:
+                    inputs = candidate
+                else:
+                    i += chunk
+            chunk //= 2
+        return finding._replace(inputs=inputs)
+
+def menu_tokens(world: World) -> List[str]:
+    """Every answer any menu accepts"""
+    tokens = []
+    for scene in world.scenes.values():
+        for step in iter_steps(scene.steps):
+            if step[0] is OP_MENU:
+                tokens.extend(option for option in step[2] if option not in tokens)
+    return tokens
+
+class Mutator:
+    """Stacked random edits of input sequences
+
+    New inputs are drawn from ``tokens`` (usually the world's menu answers)
+    and, less often, from EXTRA_TOKENS.
+    """
+
+    def __init__(self, tokens: Sequence[str], rng: random.Random, max_length: int = 120):
+        self.tokens = list(tokens)
+        self.rng = rng
+        self.max_length = max_length
+
+    def token(self) -> str:
+        """A random input, mostly valid menu answers"""
+        rng = self.rng
+        if self.tokens and rng.random() < 0.85:
+            return rng.choice(self.tokens)
+        return rng.choice(EXTRA_TOKENS)
+
+    def mutate(self, inputs: List[str], corpus: Sequence[List[str]]) -> List[str]:
+        """Apply one to four random edits"""
+        rng = self.rng
+        inputs = list(inputs)
+        for _ in range(rng.randint(1, 4)):
+            op = rng.randrange(6)
+            at = rng.randrange(len(inputs) + 1)
+            if op == 0 and inputs:
+                inputs[min(at, len(inputs) - 1)] = self.token()
+            elif op == 1:
+                inputs.insert(at, self.token())
+            elif op == 2 and inputs:
+                del inputs[min(at, len(inputs) - 1)]
+            elif op == 3 and inputs:
+                end = rng.randint(at, min(len(inputs), at + 8))
+                inputs[at:at] = inputs[at:end]
+            elif op == 4:
+                other = rng.choice(corpus)
+                inputs = inputs[:at] + other[rng.randint(0, len(other)):]
+            else:
+                inputs.extend(self.token() for _ in range(rng.randint(1, 10)))
+        return inputs[:self.max_length]
+
+# Per-process fuzzing context
+_shared = None
+_executor = None
+
+def _init_worker(shared, max_turns: int, loop_limit: int):
+    global _shared, _executor
+    _shared = shared
+    _executor = Executor(WORLD, max_turns, loop_limit)
+
+def fuzz_round(job: tuple) -> tuple:
+    """Worker entry point: mutate the corpus ``execs`` times
+
+    Returns ``(new corpus entries, findings, executions)``.
+    """
+    seed, corpus, execs = job
+    rng = random.Random(seed)
+    executor = _executor
+    shared = _shared
+    mutator = Mutator(menu_tokens(executor.world), rng)
+    corpus = list(corpus)
+    found = []
+    findings = {}
+    for _ in range(execs):
+        child = mutator.mutate(rng.choice(corpus), corpus)
+        bits, finding = executor.run(child)
+        fresh = [bit for bit in bits if not shared[bit]]
+        if fresh:
+            for bit in fresh:
+                shared[bit] = 1
+            corpus.append(child)
+            found.append(child)
+        if finding is not None and finding.signature not in findings:
+            findings[finding.signature] = finding
+    return found, list(findings.values()), execs
+
+class FuzzReport(NamedTuple):
+    """Results of a fuzzing campaign"""
+    execs: int
+    seconds: float
+    covered: List[str]
+    uncovered_branches: List[str]
+    corpus: List[List[str]]
+    findings: List[Finding]
+
+    def to_json(self) -> Dict:
+        """JSON-friendly summary"""
+        return {
+            "execs": self.execs,
+            "seconds": round(self.seconds, 3),
+            "execs_per_second": round(self.execs / self.seconds) if self.seconds else 0,
+            "covered": len(self.covered),
+            "uncovered_branches": self.uncovered_branches,
+            "corpus": len(self.corpus),
+            "findings": [f._asdict() for f in self.findings],
+        }
+
+def fuzz(execs: int = 100000, seconds: Optional[float] = None, workers: int = 1, seed: int = 0,
+         round_execs: int = 2000, max_turns: int = 200, loop_limit: int = 50,
+         executor: Optional[Executor] = None) -> FuzzReport:
+    """Run a campaign until ``execs`` executions or ``seconds`` have passed
+
+    ``workers > 1`` fuzzes across a process pool with a shared coverage
+    map. Passing an ``executor`` fuzzes it in-process instead (for custom
+    worlds or engine factories).
+    """
+    global _shared, _executor
+    world = executor.world if executor is not None else WORLD
+    coverage_map = CoverageMap(world)
+    if workers > 1 and executor is None:
+        shared = multiprocessing.RawArray("B", coverage_map.size)
+        pool = multiprocessing.Pool(workers, _init_worker, (shared, max_turns, loop_limit))
+        run_jobs = lambda jobs: pool.imap_unordered(fuzz_round, jobs)
+    else:
+        pool = None
+        shared = bytearray(coverage_map.size)
+        _shared, _executor = shared, executor or Executor(world, max_turns, loop_limit)
+        run_jobs = lambda jobs: map(fuzz_round, jobs)
+    rng = random.Random(seed)
+    corpus = [[]]
+    findings = {}
+    done = 0
+    started = time.perf_counter()
+    try:
+        while done < execs and (seconds is None or time.perf_counter() - started < seconds):
+            jobs = [(rng.getrandbits(64), corpus, min(round_execs, execs - done))
+                    for _ in range(max(1, workers))]
+            for found, new_findings, count in run_jobs(jobs):
+                corpus.extend(found)
+                done += count
+                for finding in new_findings:
+                    findings.setdefault(finding.signature, finding)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    elapsed = time.perf_counter() - started
+    minimizer = executor or Executor(world, max_turns, loop_limit)
+    bits = [bit for bit in range(coverage_map.size) if shared[bit]]
+    return FuzzReport(
+        execs=done,
+        seconds=elapsed,
+        covered=[coverage_map.describe(bit) for bit in bits],
+        uncovered_branches=[world.describe_branch(label) + f" -> {outcome}"
+                            for i, (label, outcome) in enumerate(coverage_map.branches) if not shared[i]],
+        corpus=corpus,
+        findings=[minimizer.minimize(finding) for finding in findings.values()],
+    )
+
+def format_report(report: FuzzReport) -> str:
+    """Human-readable campaign summary"""
+    data = report.to_json()
+    lines = [f"🐛 {data['execs']} execs in {data['seconds']}s ({data['execs_per_second']}/s), "
+             f"{data['covered']} coverage bits, corpus {data['corpus']}"]
+    if report.uncovered_branches:
+        lines.append(f"\nUncovered branches: {len(report.uncovered_branches)}")
+        lines.extend(f"  {branch}" for branch in report.uncovered_branches)
+    lines.append(f"\nFindings: {len(report.findings)}")
+    for finding in report.findings:
+        lines.append(f"  ❌ [{finding.kind}] {finding.message} at {finding.location}")
+        lines.append(f"     inputs: {json.dumps(finding.inputs, ensure_ascii=False)}")
+    return "\n".join(lines)
+
+def main(argv=None):
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Coverage-guided fuzzer for the Eldria scenes")
+    parser.add_argument("--execs", type=int, default=100000, help="total executions")
+    parser.add_argument("--seconds", type=float, default=None, help="stop after this long")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-turns", type=int, default=200, help="turns per execution")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    execs = args.execs if args.seconds is None else sys.maxsize
+    report = fuzz(execs, args.seconds, args.workers, args.seed, max_turns=args.max_turns)
+    print(json.dumps(report.to_json(), indent=2, ensure_ascii=False) if args.json else format_report(report))
+    return 1 if report.findings else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
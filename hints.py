@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Precomputed hint and route index for The Lost Realms of Eldria.
+
+Building the index walks the same state graph as ``explorer.py``: states
+are identified by their location, the items and flags scenes test, and
+bucketed stats. Each state is expanded with everything the scenes never
+test stripped away, so every edge shows exactly what that turn grants.
+A reverse breadth-first search from the edges that grant each item,
+quest and flag then stores, per state and goal, the first turn of a
+shortest route and its length. Answering "how do I get X" is one dict
+lookup for the state plus a walk along stored next-hops; no search runs
+at play time.
+
+Expansions are cached by a digest of the scene's compiled steps, so when
+the world content changes a rebuild only replays the scenes that changed.
+
+In game, type ``hint`` at any menu to list the goals, or ``hint herb``
+for the route to the first goal whose name contains "herb". Routes are
+printed as type-ahead input that can be entered in one line.
+
+Usage:
+    python hints.py --build eldria.hints
+    python hints.py --index eldria.hints "Ancient Artifact"
+    python adventure_game.py --hints eldria.hints
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+import zlib
+from array import array
+from collections import deque
+from typing import Dict, List, Optional
+
+from adventure_game import (MSG_HINT_HAVE, MSG_HINT_NO_ROUTE, MSG_HINT_ROUTE, MSG_HINT_ROUTE_ONE,
+                            MSG_HINT_TOPICS, OP_ECHO, OP_MENU, OP_PAUSE, OP_TYPE, GameEngine, GameFlags,
+                            GameState, ItemSet, NullRenderer, QueuedInput, World, WORLD, create_game)
+from explorer import Buckets, StateKeys, expand
+from savegame import dump_state, load_state
+
+INDEX_VERSION = 1
+NO_ROUTE = -1
+
+def _canonical(value, texts):
+    """Process-independent form of compiled steps (opcodes become names, text IDs their text)"""
+    if callable(value):
+        return value.__name__
+    if isinstance(value, (tuple, list)):
+        if value and value[0] in (OP_TYPE, OP_ECHO, OP_PAUSE, OP_MENU):
+            value = (value[0], texts[value[1]], *value[2:])
+        return [_canonical(item, texts) for item in value]
+    if isinstance(value, dict):
+        return {str(key): _canonical(item, texts) for key, item in value.items()}
+    return value
+
+def scene_digest(world: World, location: str) -> str:
+    """Digest of a scene's compiled steps"""
+    data = json.dumps(_canonical(world.scenes[location].steps, world.texts), ensure_ascii=False)
+    return hashlib.blake2b(data.encode("utf-8"), digest_size=12).hexdigest()
+
+class HintIndex:
+    """Shortest routes from every reachable state to every item, quest and flag"""
+
+    def __init__(self, world: World = WORLD):
+        self.world = world
+        self.keys = StateKeys(world, Buckets.for_world(world))
+        self.goals = [*world.items(), *world.quests(), *world.flags()]
+        self.scenes = {}
+        self.node_ids = {}
+        self.edges = []
+        self.next_edge = {}
+        self.distance = {}
+        self.cache = {}
+        self.expanded = 0
+        self.reused = 0
+
+    def _strip(self, state: GameState) -> GameState:
+        """Copy of ``state`` keeping only what scenes can branch on"""
+        stripped = state.copy()
+        stripped.inventory = ItemSet(name for name in state.inventory if name in self.keys.item)
+        stripped.completed_quests = ItemSet()
+        tested = {name: True for name in self.keys.tested_flags if state.game_flags.get(name)}
+        stripped.game_flags = GameFlags(tested)
+        return stripped
+
+    def build(self, previous: Optional["HintIndex"] = None) -> "HintIndex":
+        """Explore the state graph and compute every route
+
+        Scene expansions recorded in ``previous`` are reused for scenes
+        whose compiled steps have not changed.
+        """
+        world = self.world
+        self.scenes = {location: scene_digest(world, location) for location in world.locations}
+        reusable = previous.cache if previous is not None else {}
+        engine = create_game(NullRenderer(), QueuedInput(), world)
+        start = self._strip(GameState(NullRenderer()))
+        states = [start]
+        self.node_ids = {self.keys.key(start): 0}
+        adjacency = []
+        while len(adjacency) < len(states):
+            parent = states[len(adjacency)]
+            blob = dump_state(parent)
+            cache_key = f"{self.scenes[parent.current_location]}:{blob.hex()}"
+            successors = reusable.get(cache_key)
+            if successors is None:
+                successors = [(list(inputs), dump_state(child).hex())
+                              for inputs, child, _ in expand(parent, engine)]
+                self.expanded += 1
+            else:
+                self.reused += 1
+            self.cache[cache_key] = successors
+            out = []
+            for inputs, child_hex in successors:
+                child = load_state(bytes.fromhex(child_hex))
+                granted = [goal for goal, name in enumerate(self.goals) if self._has(child, name)
+                           and not self._has(parent, name)]
+                stripped = self._strip(child)
+                key = self.keys.key(stripped)
+                child_id = self.node_ids.get(key)
+                if child_id is None:
+                    child_id = self.node_ids[key] = len(states)
+                    states.append(stripped)
+                self.edges.append((tuple(inputs), child_id, granted))
+                out.append(len(self.edges) - 1)
+            adjacency.append(out)
+        self._route(adjacency)
+        return self
+
+    @staticmethod
+    def _has(state: GameState, name: str) -> bool:
+        return (name in state.inventory or name in state.completed_quests
+                or bool(state.game_flags.get(name)))
+
+    def _route(self, adjacency: List[List[int]]):
+        """Reverse breadth-first search from the edges granting each goal"""
+        nodes = len(adjacency)
+        incoming = [[] for _ in range(nodes)]
+        for node, out in enumerate(adjacency):
+            for edge in out:
+                incoming[self.edges[edge][1]].append((node, edge))
+        for goal in range(len(self.goals)):
+            next_edge = array("i", [NO_ROUTE]) * nodes
+            distance = array("H", [0]) * nodes
+            queue = deque()
+            for node, out in enumerate(adjacency):
+                for edge in out:
+                    if goal in self.edges[edge][2]:
+                        next_edge[node] = edge
+                        distance[node] = 1
+                        queue.append(node)
+                        break
+            while queue:
+                node = queue.popleft()
+                for parent, edge in incoming[node]:
+                    if next_edge[parent] == NO_ROUTE:
+                        next_edge[parent] = edge
+                        distance[parent] = distance[node] + 1
+                        queue.append(parent)
+            self.next_edge[self.goals[goal]] = next_edge
+            self.distance[self.goals[goal]] = distance
+
+    def find_goal(self, query: str) -> Optional[str]:
+        """Goal named by ``query``: exact (case-insensitive) or by substring"""
+        query = query.strip().lower()
+        if not query:
+            return None
+        for goal in self.goals:
+            if goal.lower() == query:
+                return goal
+        return next((goal for goal in self.goals if query in goal.lower()), None)
+
+    def route(self, state: GameState, goal: str) -> Optional[List[tuple]]:
+        """Inputs for each turn of a shortest route, or None if unreachable"""
+        node = self.node_ids.get(self.keys.key(self._strip(state)))
+        if node is None:
+            return None
+        next_edge = self.next_edge[goal]
+        turns = []
+        for _ in range(self.distance[goal][node]):
+            inputs, node, _ = self.edges[next_edge[node]]
+            turns.append(inputs)
+        return turns if turns else None
+
+    def answer(self, state: GameState, query: str) -> str:
+        """Player-facing reply to ``hint <query>``, from the state's text table"""
+        texts = state.texts
+        goal = self.find_goal(query)
+        if goal is None:
+            names = ", ".join(self.world.items() + self.world.quests())
+            return texts[MSG_HINT_TOPICS].format(names=names)
+        if self._has(state, goal):
+            return texts[MSG_HINT_HAVE].format(goal=goal)
+        turns = self.route(state, goal)
+        if turns is None:
+            return texts[MSG_HINT_NO_ROUTE].format(goal=goal)
+        typed = " ".join(choice for inputs in turns for choice in inputs if choice)
+        message = MSG_HINT_ROUTE_ONE if len(turns) == 1 else MSG_HINT_ROUTE
+        return texts[message].format(goal=goal, turns=len(turns), typed=typed)
+
+    def attach(self, engine: GameEngine) -> "HintIndex":
+        """Answer ``hint`` commands typed at the engine's menus"""
+        engine.hints = self
+        return self
+
+    def to_json(self) -> Dict:
+        """Plain-data form of the index"""
+        return {
+            "version": INDEX_VERSION,
+            "goals": self.goals,
+            "scenes": self.scenes,
+            "nodes": [[list(key), node] for key, node in self.node_ids.items()],
+            "edges": [[list(inputs), child, granted] for inputs, child, granted in self.edges],
+            "next_edge": {goal: list(values) for goal, values in self.next_edge.items()},
+            "distance": {goal: list(values) for goal, values in self.distance.items()},
+            "cache": self.cache,
+        }
+
+    def save(self, path: str):
+        """Write the index as zlib-compressed JSON, atomically"""
+        data = json.dumps(self.to_json(), separators=(",", ":"), ensure_ascii=False)
+        temp = path + ".tmp"
+        with open(temp, "wb") as fh:
+            fh.write(zlib.compress(data.encode("utf-8")))
+        os.replace(temp, path)
+
+    @classmethod
+    def load(cls, path: str, world: World = WORLD) -> "HintIndex":
+        """Read an index saved by ``save``"""
+        with open(path, "rb") as fh:
+            data = json.loads(zlib.decompress(fh.read()))
+        if data.get("version") != INDEX_VERSION:
+            raise ValueError(f"unsupported hint index version {data.get('version')}")
+        index = cls(world)
+        index.goals = data["goals"]
+        index.scenes = data["scenes"]
+        # Keys are (location, items, flags, extra, quests, gold, health, reputation)
+        index.node_ids = {(key[0], key[1], key[2], tuple(key[3]), *key[4:]): node
+                          for key, node in data["nodes"]}
+        index.edges = [(tuple(inputs), child, granted) for inputs, child, granted in data["edges"]]
+        index.next_edge = {goal: array("i", values) for goal, values in data["next_edge"].items()}
+        index.distance = {goal: array("H", values) for goal, values in data["distance"].items()}
+        index.cache = data["cache"]
+        return index
+
+    def is_current(self) -> bool:
+        """Whether the index was built from this world's scenes"""
+        world = self.world
+        return self.scenes == {location: scene_digest(world, location) for location in world.locations}
+
+def load_or_build(path: str, world: World = WORLD) -> HintIndex:
+    """Load the index at ``path``, rebuilding (incrementally) and saving it if stale"""
+    previous = None
+    if os.path.exists(path):
+        try:
+            previous = HintIndex.load(path, world)
+        except (OSError, ValueError, KeyError, TypeError, zlib.error):
+            previous = None
+        if previous is not None and previous.is_current():
+            return previous
+    index = HintIndex(world).build(previous)
+    index.save(path)
+    return index
+
+def main(argv=None):
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Build and query the Eldria hint index")
+    parser.add_argument("goals", nargs="*", help="items, quests or flags to route to from the start")
+    parser.add_argument("--build", metavar="PATH", help="build (or incrementally update) the index")
+    parser.add_argument("--index", metavar="PATH", help="query an existing index")
+    args = parser.parse_args(argv)
+
+    if args.build:
+        started = time.perf_counter()
+        index = load_or_build(args.build)
+        print(f"💡 {len(index.node_ids)} states, {len(index.edges)} turns, {len(index.goals)} goals "
+              f"({index.expanded} scenes expanded, {index.reused} reused) "
+              f"in {time.perf_counter() - started:.2f}s")
+    elif args.index:
+        index = HintIndex.load(args.index)
+    else:
+        index = HintIndex().build()
+    start = GameState(NullRenderer())
+    for query in args.goals:
+        print(index.answer(start, query))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Undo and rewind for The Lost Realms of Eldria.
+
+A History attached to an engine records a Version of the GameState at
+every ``go_to_location``. Versions are immutable and share structure: the
+inventory and quest log are stored as the interned-ID tuples their
+ItemSets already hold (a turn that does not change them reuses the same
+tuple), and story flags as the bitfield integer. So a version costs one
+small node plus whatever the turn actually changed, rather than a copy
+of the whole state.
+
+Each version points at the previous one, which makes ``undo`` O(1). It
+also holds a jump pointer laid out like a skew-binary random-access
+list (Myers, "An applicative random-access stack"): following jump
+pointers where they do not overshoot reaches any earlier turn in
+O(log n) steps, which is how ``rewind`` finds its target. Undoing or
+rewinding moves back to an earlier version. Versions after it are
+dropped once the game moves on, because nothing else refers to them.
+
+In game, type ``undo`` at any menu to go back one turn, or ``rewind 3``
+to go back three. The game returns to the location you were at on that
+turn, with the state you arrived with, and plays that scene again.
+
+Usage:
+    python history.py --measure
+    python adventure_game.py
+"""
+
+import argparse
+import sys
+import time
+from typing import Dict, Iterator, Optional
+
+from adventure_game import (MSG_UNDO_BACK, MSG_UNDO_BACK_ONE, MSG_UNDO_LIMIT, MSG_UNDO_LIMIT_ONE,
+                            MSG_UNDO_NOTHING, MSG_UNDO_USAGE, GameEngine, GameExit, GameFlags,
+                            ItemSet, NullRenderer, RandomInput, create_game)
+
+class Version:
+    """One turn's state; never modified after it is created"""
+    __slots__ = ("parent", "jump", "turn", "location", "health", "gold", "reputation",
+                 "flags", "extra", "inventory", "quests")
+
+    def __init__(self, parent: Optional["Version"], location: str, health: int, gold: int,
+                 reputation: int, flags: int, extra: tuple, inventory: tuple, quests: tuple):
+        self.parent = parent
+        if parent is None:
+            self.turn = 0
+            self.jump = None
+        else:
+            self.turn = parent.turn + 1
+            jump = parent.jump
+            if (jump is not None and jump.jump is not None
+                    and parent.turn - jump.turn == jump.turn - jump.jump.turn):
+                self.jump = jump.jump
+            else:
+                self.jump = parent
+        self.location = location
+        self.health = health
+        self.gold = gold
+        self.reputation = reputation
+        self.flags = flags
+        self.extra = extra
+        self.inventory = inventory
+        self.quests = quests
+
+    def ancestor(self, turn: int) -> "Version":
+        """The version of an earlier (or this) turn, in O(log n) steps"""
+        if not 0 <= turn <= self.turn:
+            raise IndexError(f"turn {turn} is not in 0..{self.turn}")
+        version = self
+        while version.turn > turn:
+            jump = version.jump
+            version = jump if jump.turn >= turn else version.parent
+        return version
+
+    def __iter__(self) -> Iterator["Version"]:
+        """This version and every earlier one, newest first"""
+        version = self
+        while version is not None:
+            yield version
+            version = version.parent
+
+class History:
+    """Versions of one engine's state, with undo and rewind"""
+
+    def __init__(self):
+        self.current = None
+        self._restoring = False
+
+    def clear(self):
+        """Forget every version; the next location change starts a new history"""
+        self.current = None
+
+    def record(self, engine: GameEngine):
+        """Add a version for the engine's state (a location hook)"""
+        if self._restoring:
+            return
+        state = engine.state
+        flags = state.game_flags
+        inventory = state.inventory.order
+        quests = state.completed_quests.order
+        extra = tuple(flags.extra.items()) if flags.extra else ()
+        parent = self.current
+        if parent is not None:
+            # Share the parent's tuples when the turn left them unchanged
+            if inventory == parent.inventory:
+                inventory = parent.inventory
+            if quests == parent.quests:
+                quests = parent.quests
+            if extra == parent.extra:
+                extra = parent.extra
+        self.current = Version(parent, state.current_location, state.health, state.gold,
+                               state.reputation, flags.bits, extra, inventory, quests)
+
+    def restore(self, engine: GameEngine, version: Version):
+        """Put the engine back at ``version`` and make it the current one"""
+        state = engine.state
+        state.health = version.health
+        state.gold = version.gold
+        state.reputation = version.reputation
+        flags = GameFlags()
+        flags.bits = version.flags
+        if version.extra:
+            flags.extra = dict(version.extra)
+        state.game_flags = flags
+        state.inventory = _item_set(version.inventory)
+        state.completed_quests = _item_set(version.quests)
+        engine.typeahead = None
+        self.current = version
+        self._restoring = True
+        try:
+            engine.go_to_location(version.location)
+        finally:
+            self._restoring = False
+
+    def rewind(self, engine: GameEngine, turns: int = 1) -> bool:
+        """Go back ``turns`` turns; returns False if there are not that many"""
+        current = self.current
+        if current is None or not 0 < turns <= current.turn:
+            return False
+        self.restore(engine, current.parent if turns == 1 else current.ancestor(current.turn - turns))
+        return True
+
+    def undo(self, engine: GameEngine) -> bool:
+        """Go back one turn; returns False at the first one"""
+        return self.rewind(engine, 1)
+
+    def command(self, engine: GameEngine, text: str) -> bool:
+        """Handle ``undo`` or ``rewind N`` typed at a menu; returns whether the game moved"""
+        texts = engine.texts
+        word, _, argument = text.partition(" ")
+        available = self.current.turn if self.current is not None else 0
+        if word == "undo" and not argument:
+            turns = 1
+        elif word == "rewind" and argument.strip().isdigit():
+            turns = int(argument)
+        else:
+            engine.echo(texts[MSG_UNDO_USAGE].format(turns=available))
+            return False
+        if not self.rewind(engine, turns):
+            if available == 0:
+                engine.echo(texts[MSG_UNDO_NOTHING])
+            else:
+                message = MSG_UNDO_LIMIT_ONE if available == 1 else MSG_UNDO_LIMIT
+                engine.echo(texts[message].format(turns=available))
+            return False
+        location = engine.state.current_location.replace("_", " ")
+        message = MSG_UNDO_BACK_ONE if turns == 1 else MSG_UNDO_BACK
+        engine.echo(texts[message].format(turns=turns, location=location))
+        return True
+
+    def attach(self, engine: GameEngine) -> "History":
+        """Record every location change and answer ``undo``/``rewind`` at the engine's menus"""
+        engine.history = self
+        engine.add_location_hook(self.record)
+        if engine.current_scene is not None:
+            self.record(engine)
+        return self
+
+def _item_set(order: tuple) -> ItemSet:
+    items = ItemSet()
+    items.order = order
+    bits = 0
+    for ident in order:
+        bits |= 1 << ident
+    items.bits = bits
+    return items
+
+def measure(turns: int = 20000, seed: int = 0) -> Dict:
+    """Memory per turn of versions against state copies, and undo and rewind times"""
+    import random
+    import tracemalloc
+
+    def play(history: bool, copies: bool):
+        engine = create_game(NullRenderer(), RandomInput(random.Random(seed)))
+        if history:
+            History().attach(engine)
+        engine.go_to_location("start")
+        kept = []
+        for _ in range(turns):
+            try:
+                engine.step()
+            except GameExit:
+                # Play on from the start without resetting, so the history keeps growing
+                engine.game_running = True
+                engine.go_to_location("start")
+            if copies:
+                kept.append(engine.state.copy())
+        return engine, kept
+
+    play(False, False)
+    tracemalloc.start()
+    used = []
+    for history, copies in ((False, False), (True, False), (False, True)):
+        before = tracemalloc.get_traced_memory()[0]
+        engine, kept = play(history, copies)
+        used.append(tracemalloc.get_traced_memory()[0] - before)
+        if history:
+            versioned = engine
+        del engine, kept
+    tracemalloc.stop()
+    history = versioned.history
+    versions = history.current.turn + 1
+
+    deepest = history.current
+    targets = range(0, versions, max(1, versions // 1000))
+    started = time.perf_counter()
+    for turn in targets:
+        deepest.ancestor(turn)
+    rewind_us = (time.perf_counter() - started) / len(targets) * 1e6
+    started = time.perf_counter()
+    undos = 0
+    while undos < 1000 and history.undo(versioned):
+        undos += 1
+    undo_us = (time.perf_counter() - started) / max(1, undos) * 1e6
+    return {
+        "versions": versions,
+        "bytes_per_version": round((used[1] - used[0]) / versions),
+        "bytes_per_copy": round((used[2] - used[0]) / turns),
+        "rewind_lookup_us": round(rewind_us, 2),
+        "undo_us": round(undo_us, 2),
+    }
+
+def main(argv=None):
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Eldria undo and rewind history")
+    parser.add_argument("--measure", action="store_true",
+                        help="compare memory per turn with state copies and time undo and rewind")
+    parser.add_argument("--turns", type=int, default=20000)
+    args = parser.parse_args(argv)
+
+    if not args.measure:
+        parser.error("nothing to do; try --measure, or type undo or rewind N in the game")
+    for key, value in measure(args.turns).items():
+        print(f"{key:>18}: {value}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
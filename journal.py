@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Deterministic choice journals for The Lost Realms of Eldria.
+
+A journal is an append-only text file recording everything needed to
+re-run a session: the seed for the ``random`` module, the player name
+given in ``show_intro`` and every validated answer returned by
+``get_user_input``, one per line as it happens. When the session ends a
+checksum of the final GameState is appended.
+
+Replaying feeds the recorded choices back through the real scenes with a
+NullRenderer, so there is no pacing, and compares the final state against
+the checksum. Batch verification reuses one engine per worker process and
+spreads journals across a process pool, which is what re-validating an
+archive after a content change needs.
+
+Journal format (values are JSON strings):
+    eldria-journal 1
+    seed 8216353207
+    name "Aria"
+    choice "1"
+    end 3f9c0e...
+
+Usage:
+    python journal.py play --dir journals
+    python journal.py replay journals/1700000000-1234.journal --show
+    python journal.py verify journals --workers 8
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+from typing import Iterable, Iterator, List, NamedTuple, Optional
+
+from adventure_game import (BufferedRenderer, GameEngine, GameExit, GameState, NullRenderer,
+                            Renderer, ScriptedInput, create_game)
+from savegame import dump_state
+
+FORMAT = "eldria-journal 1"
+
+class JournalError(Exception):
+    """Raised when a journal is malformed"""
+
+class JournalRecord(NamedTuple):
+    """Parsed contents of a journal"""
+    seed: int
+    player_name: Optional[str]
+    choices: List[str]
+    checksum: Optional[str]
+
+class ReplayResult(NamedTuple):
+    """Outcome of replaying one journal"""
+    path: str
+    ok: bool
+    expected: Optional[str]
+    actual: Optional[str]
+    error: Optional[str]
+
+def state_checksum(state: GameState) -> str:
+    """Stable digest of a GameState's saved fields"""
+    return hashlib.blake2b(dump_state(state), digest_size=16).hexdigest()
+
+class Journal:
+    """Append-only recorder for one session"""
+
+    def __init__(self, path: str, seed: Optional[int] = None):
+        self.path = path
+        self.seed = seed if seed is not None else random.SystemRandom().getrandbits(48)
+        # Line buffered so a crash loses at most the choice being made
+        self.fh = open(path, "w", encoding="utf-8", buffering=1)
+        self.fh.write(f"{FORMAT}\nseed {self.seed}\n")
+        self.named = False
+
+    def attach(self, engine: GameEngine) -> "Journal":
+        """Seed the session and record the engine's choices from now on"""
+        random.seed(self.seed)
+        engine.add_input_hook(self._record_choice)
+        return self
+
+    def _record_name(self, engine: GameEngine):
+        if not self.named and engine.player_name is not None:
+            self.fh.write(f"name {json.dumps(engine.player_name)}\n")
+            self.named = True
+
+    def _record_choice(self, engine: GameEngine, choice: str):
+        self._record_name(engine)
+        self.fh.write(f"choice {json.dumps(choice)}\n")
+
+    def finish(self, engine: GameEngine):
+        """Append the final state checksum and close the journal"""
+        if self.fh.closed:
+            return
+        self._record_name(engine)
+        self.fh.write(f"end {state_checksum(engine.state)}\n")
+        self.fh.close()
+
+def parse_journal(text: str) -> JournalRecord:
+    """Parse journal text; a missing ``end`` line means the session was cut short"""
+    lines = text.splitlines()
+    if not lines or lines[0] != FORMAT:
+        raise JournalError("not an Eldria journal")
+    seed = None
+    name = None
+    checksum = None
+    choices = []
+    for number, line in enumerate(lines[1:], 2):
+        kind, _, value = line.partition(" ")
+        try:
+            if kind == "choice":
+                choices.append(json.loads(value))
+            elif kind == "seed":
+                seed = int(value)
+            elif kind == "name":
+                name = json.loads(value)
+            elif kind == "end":
+                checksum = value
+            elif line:
+                raise JournalError(f"line {number}: unknown record {kind!r}")
+        except ValueError as exc:
+            raise JournalError(f"line {number}: {exc}")
+    if seed is None:
+        raise JournalError("journal has no seed")
+    return JournalRecord(seed, name, choices, checksum)
+
+def read_journal(path: str) -> JournalRecord:
+    """Load and parse a journal file"""
+    with open(path, "r", encoding="utf-8") as fh:
+        return parse_journal(fh.read())
+
+def replay(record: JournalRecord, engine: Optional[GameEngine] = None,
+           renderer: Optional[Renderer] = None) -> GameState:
+    """Re-run a journal through the real scenes and return the final state
+
+    Passing an engine reuses it (its renderer and scenes are kept).
+    """
+    if engine is None:
+        engine = create_game(renderer if renderer is not None else NullRenderer())
+    inputs = record.choices
+    if record.player_name is not None:
+        # show_intro also waits for Enter before the first scene
+        inputs = itertools.chain([record.player_name, ""], inputs)
+    engine.input_provider = ScriptedInput(inputs)
+    engine.player_name = None
+    random.seed(record.seed)
+    engine.reset()
+    try:
+        if record.player_name is not None:
+            engine.show_intro()
+        while engine.game_running:
+            engine.step()
+    except GameExit:
+        pass
+    return engine.state
+
+# One engine per worker process, reused for every journal it replays
+_engine = None
+
+def _init_worker():
+    """Create this worker's GameEngine"""
+    global _engine
+    _engine = create_game(NullRenderer())
+
+def verify_journal(path: str) -> ReplayResult:
+    """Replay one journal file and compare against its checksum"""
+    if _engine is None:
+        _init_worker()
+    try:
+        record = read_journal(path)
+        actual = state_checksum(replay(record, _engine))
+    except (OSError, JournalError) as exc:
+        return ReplayResult(path, False, None, None, str(exc))
+    if record.checksum is None:
+        return ReplayResult(path, False, None, actual, "journal has no end record")
+    return ReplayResult(path, actual == record.checksum, record.checksum, actual, None)
+
+def iter_journal_paths(paths: Iterable[str]) -> Iterator[str]:
+    """Expand directories into the ``.journal`` files they contain"""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for name in sorted(files):
+                    if name.endswith(".journal"):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+def verify_many(paths: Iterable[str], workers: Optional[int] = None,
+                chunk_size: int = 256) -> Iterator[ReplayResult]:
+    """Verify many journals, in-process for ``workers == 1`` or across a pool"""
+    if workers == 1:
+        for path in paths:
+            yield verify_journal(path)
+        return
+    with multiprocessing.Pool(workers, initializer=_init_worker) as pool:
+        yield from pool.imap_unordered(verify_journal, paths, chunk_size)
+
+def main(argv=None):
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Record and replay Eldria choice journals")
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    play = commands.add_parser("play", help="play a game, journaling every choice")
+    play.add_argument("--dir", default="journals", help="directory for journal files")
+    play.add_argument("--seed", type=int, default=None)
+
+    show = commands.add_parser("replay", help="replay one journal")
+    show.add_argument("path")
+    show.add_argument("--show", action="store_true", help="print the replayed transcript")
+
+    check = commands.add_parser("verify", help="replay journals and check their checksums")
+    check.add_argument("paths", nargs="+", help="journal files or directories")
+    check.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args(argv)
+
+    if args.command == "play":
+        os.makedirs(args.dir, exist_ok=True)
+        path = os.path.join(args.dir, f"{int(time.time())}-{os.getpid()}.journal")
+        game = create_game()
+        journal = Journal(path, args.seed).attach(game)
+        try:
+            game.run()
+        finally:
+            journal.finish(game)
+        print(f"📜 Journal saved to {path}")
+        return 0
+
+    if args.command == "replay":
+        record = read_journal(args.path)
+        renderer = BufferedRenderer()
+        actual = state_checksum(replay(record, renderer=renderer))
+        if args.show:
+            print(renderer.getvalue())
+        print(f"Choices: {len(record.choices)}  seed: {record.seed}  player: {record.player_name}")
+        if record.checksum is None:
+            print(f"⚠️  No recorded checksum; final state {actual}")
+            return 1
+        if actual != record.checksum:
+            print(f"❌ Final state {actual} does not match recorded {record.checksum}")
+            return 1
+        print(f"✅ Final state matches {actual}")
+        return 0
+
+    started = time.perf_counter()
+    total = failed = 0
+    for result in verify_many(iter_journal_paths(args.paths), args.workers):
+        total += 1
+        if not result.ok:
+            failed += 1
+            reason = result.error or f"expected {result.expected}, got {result.actual}"
+            print(f"❌ {result.path}: {reason}")
+    elapsed = time.perf_counter() - started
+    rate = round(total / elapsed) if elapsed else total
+    print(f"📜 {total} journals verified, {failed} failed in {elapsed:.2f}s ({rate} journals/s)")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Run-loop metrics for The Lost Realms of Eldria.
+
+Attaching a GameMetrics to a GameEngine (``engine.metrics``) wraps every
+scene invocation and every player input. It records, per location, the
+time spent rendering a scene (scene time minus time waiting for input),
+the time spent waiting for the player, the turn count and the number of
+transitions between each pair of locations. Counters are plain integers
+and histograms are fixed-bucket arrays, so recording a turn costs about
+a microsecond (see ``--overhead``); with ``engine.metrics`` left as None
+the engine pays only an attribute check per turn and per input.
+
+A MetricsExporter periodically writes a snapshot either as a Prometheus
+text file (suitable for the node_exporter textfile collector) or as JSON
+lines.
+
+Usage:
+    python metrics.py --textfile eldria.prom --interval 15
+    python metrics.py --jsonl metrics.jsonl
+    python metrics.py --overhead
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Sequence
+
+from adventure_game import GameEngine, GameExit, NullRenderer, RandomInput, create_game
+
+# Upper bounds in seconds, from sub-millisecond renders to minutes-long waits
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+class Histogram:
+    """Fixed-bucket histogram with Prometheus ``le`` semantics"""
+
+    __slots__ = ("bounds", "counts", "total")
+
+    def __init__(self, bounds: Sequence[float] = DEFAULT_BUCKETS):
+        self.bounds = bounds
+        # One slot per bound plus the +Inf overflow bucket
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+
+    def observe(self, value: float):
+        """Record one observation"""
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += value
+
+    def snapshot(self) -> Dict:
+        """Copy of the histogram as plain data"""
+        counts = list(self.counts)
+        return {"bounds": list(self.bounds), "counts": counts,
+                "sum": self.total, "count": sum(counts)}
+
+class GameMetrics:
+    """Per-engine counters and histograms fed by the engine's run loop"""
+
+    def __init__(self, bounds: Sequence[float] = DEFAULT_BUCKETS):
+        self.bounds = bounds
+        self.turns = 0
+        self.inputs = 0
+        self.render_seconds = {}
+        self.input_seconds = Histogram(bounds)
+        self.transitions = Counter()
+        self.started = time.time()
+        self._waited = 0.0
+
+    def attach(self, engine: GameEngine) -> "GameMetrics":
+        """Start recording the given engine's turns"""
+        engine.metrics = self
+        return self
+
+    def run_scene(self, engine: GameEngine, scene: Callable):
+        """Run one scene, recording its render time and the transition it makes"""
+        origin = engine.state.current_location
+        self._waited = 0.0
+        started = time.perf_counter()
+        try:
+            scene(engine)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.turns += 1
+            histogram = self.render_seconds.get(origin)
+            if histogram is None:
+                histogram = self.render_seconds[origin] = Histogram(self.bounds)
+            histogram.observe(max(0.0, elapsed - self._waited))
+            if engine.game_running:
+                self.transitions[origin, engine.state.current_location] += 1
+
+    def timed_read(self, provider, prompt: str, valid_options: Optional[List[str]] = None) -> str:
+        """Read from ``provider``, recording how long the player took"""
+        started = time.perf_counter()
+        try:
+            return provider.read(prompt, valid_options)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.inputs += 1
+            self._waited += elapsed
+            self.input_seconds.observe(elapsed)
+
+    def snapshot(self) -> Dict:
+        """Consistent-enough copy of every metric as plain data
+
+        Safe to call from an exporter thread: each container is copied by a
+        single C-level call, so a concurrent turn never breaks iteration.
+        """
+        render = dict(self.render_seconds)
+        return {
+            "timestamp": time.time(),
+            "uptime": time.time() - self.started,
+            "turns": self.turns,
+            "inputs": self.inputs,
+            "render_seconds": {location: h.snapshot() for location, h in render.items()},
+            "input_seconds": self.input_seconds.snapshot(),
+            "transitions": [[a, b, n] for (a, b), n in dict(self.transitions).items()],
+        }
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _histogram_lines(name: str, data: Dict, labels: str = "") -> List[str]:
+    lines = []
+    cumulative = 0
+    prefix = labels + "," if labels else ""
+    for bound, count in zip(data["bounds"] + ["+Inf"], data["counts"]):
+        cumulative += count
+        lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+    suffix = f"{{{labels}}}" if labels else ""
+    lines.append(f"{name}_sum{suffix} {data['sum']}")
+    lines.append(f"{name}_count{suffix} {data['count']}")
+    return lines
+
+def to_prometheus(snapshot: Dict) -> str:
+    """Render a snapshot in the Prometheus text exposition format"""
+    lines = [
+        "# HELP eldria_turns_total Scenes run.",
+        "# TYPE eldria_turns_total counter",
+        f"eldria_turns_total {snapshot['turns']}",
+        "# HELP eldria_inputs_total Player inputs read.",
+        "# TYPE eldria_inputs_total counter",
+        f"eldria_inputs_total {snapshot['inputs']}",
+        "# HELP eldria_render_seconds Scene time excluding input waits, by location.",
+        "# TYPE eldria_render_seconds histogram",
+    ]
+    for location, data in sorted(snapshot["render_seconds"].items()):
+        lines.extend(_histogram_lines("eldria_render_seconds", data, f'location="{_label(location)}"'))
+    lines.append("# HELP eldria_input_wait_seconds Time spent waiting for the player.")
+    lines.append("# TYPE eldria_input_wait_seconds histogram")
+    lines.extend(_histogram_lines("eldria_input_wait_seconds", snapshot["input_seconds"]))
+    lines.append("# HELP eldria_transitions_total Moves between locations.")
+    lines.append("# TYPE eldria_transitions_total counter")
+    for origin, target, count in sorted(snapshot["transitions"]):
+        lines.append(f'eldria_transitions_total{{from="{_label(origin)}",to="{_label(target)}"}} {count}')
+    return "\n".join(lines) + "\n"
+
+class MetricsExporter:
+    """Background thread writing metric snapshots every ``interval`` seconds
+
+    ``fmt`` is "prometheus" (the file is atomically replaced) or "jsonl"
+    (one snapshot appended per line).
+    """
+
+    def __init__(self, metrics: GameMetrics, path: str, fmt: str = "prometheus",
+                 interval: float = 15.0):
+        if fmt not in ("prometheus", "jsonl"):
+            raise ValueError(f"Unknown metrics format: {fmt}")
+        self.metrics = metrics
+        self.path = path
+        self.fmt = fmt
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def export(self):
+        """Write one snapshot now"""
+        snapshot = self.metrics.snapshot()
+        if self.fmt == "jsonl":
+            with open(self.path, "a", encoding="utf-8") as fh:
+                fh.write(json.dumps(snapshot, separators=(",", ":")) + "\n")
+            return
+        temp = self.path + ".tmp"
+        with open(temp, "w", encoding="utf-8") as fh:
+            fh.write(to_prometheus(snapshot))
+        os.replace(temp, self.path)
+
+    def start(self) -> "MetricsExporter":
+        """Begin exporting in a daemon thread"""
+        self._thread = threading.Thread(target=self._loop, name="metrics-exporter", daemon=True)
+        self._thread.start()
+        return self
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.export()
+
+    def stop(self):
+        """Stop the thread and write a final snapshot"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.export()
+
+def measure_overhead(turns: int = 20000, seed: int = 0) -> Dict:
+    """Time random turns with metrics disabled and enabled"""
+    def run(instrumented: bool) -> float:
+        engine = create_game(NullRenderer(), RandomInput(random.Random(seed)))
+        if instrumented:
+            GameMetrics().attach(engine)
+        started = time.perf_counter()
+        for turn in range(turns):
+            if turn % 50 == 0:
+                engine.reset()
+            try:
+                engine.step()
+            except GameExit:
+                engine.reset()
+        return time.perf_counter() - started
+
+    run(False)
+    plain = min(run(False) for _ in range(3))
+    instrumented = min(run(True) for _ in range(3))
+    return {
+        "turns": turns,
+        "plain_us_per_turn": round(plain / turns * 1e6, 3),
+        "instrumented_us_per_turn": round(instrumented / turns * 1e6, 3),
+        "overhead_us_per_turn": round((instrumented - plain) / turns * 1e6, 3),
+    }
+
+def main(argv=None):
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Play Eldria with run-loop metrics")
+    output = parser.add_mutually_exclusive_group(required=True)
+    output.add_argument("--textfile", help="Prometheus text file to keep updated")
+    output.add_argument("--jsonl", help="append JSON-lines snapshots to this file")
+    output.add_argument("--overhead", action="store_true",
+                        help="measure the per-turn cost of recording metrics")
+    parser.add_argument("--interval", type=float, default=15.0, help="seconds between exports")
+    args = parser.parse_args(argv)
+
+    if args.overhead:
+        for key, value in measure_overhead().items():
+            print(f"{key:>26}: {value}")
+        return 0
+
+    game = create_game()
+    metrics = GameMetrics().attach(game)
+    exporter = MetricsExporter(metrics, args.textfile or args.jsonl,
+                               "prometheus" if args.textfile else "jsonl", args.interval).start()
+    try:
+        game.run()
+    finally:
+        exporter.stop()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""
+Save and load support for The Lost Realms of Eldria.
+
+A saved game is a compact, versioned binary snapshot of a GameState
+(location, stats, inventory, story flags and completed quests). For
+autosaving, a SaveLog keeps one file per session holding a full snapshot
+followed by append-only delta records, one per ``go_to_location``, each
+containing only the fields that changed that turn. Loading replays the
+deltas onto the snapshot; every ``compact_every`` deltas the file is
+rewritten as a single snapshot.
+
+Usage:
+    python savegame.py --bench
+"""
+
+import argparse
+import os
+import struct
+import sys
+import tempfile
+import time
+import zlib
+from typing import Optional, Sequence
+
+from adventure_game import GameState, ItemSet, NullRenderer, Renderer
+
+MAGIC = b"ELDS"
+VERSION = 1
+
+HEADER = struct.Struct("<4sB")
+STATS = struct.Struct("<BIiQ")
+RECORD = struct.Struct("<cI")
+CRC = struct.Struct("<I")
+U16 = struct.Struct("<H")
+U32 = struct.Struct("<I")
+I32 = struct.Struct("<i")
+U64 = struct.Struct("<Q")
+
+SNAPSHOT = b"S"
+DELTA = b"D"
+
+# Delta field mask
+F_LOCATION = 1
+F_HEALTH = 2
+F_GOLD = 4
+F_REPUTATION = 8
+F_FLAGS = 16
+F_INVENTORY = 32
+F_INVENTORY_FULL = 64
+F_QUESTS = 128
+
+class SaveError(Exception):
+    """Raised when save data is corrupt or from an unsupported version"""
+
+def _pack_str(text: str) -> bytes:
+    data = text.encode("utf-8")
+    return U16.pack(len(data)) + data
+
+def _pack_names(names) -> bytes:
+    names = list(names)
+    return U16.pack(len(names)) + b"".join(_pack_str(name) for name in names)
+
+def _pack_extra_flags(extra) -> bytes:
+    items = list(extra.items()) if extra else []
+    return U16.pack(len(items)) + b"".join(_pack_str(k) + (b"\x01" if v else b"\x00")
+                                           for k, v in items)
+
+class _Reader:
+    """Cursor over a bytes payload"""
+
+    __slots__ = ("data", "pos")
+
+    def __init__(self, data: bytes, pos: int = 0):
+        self.data = data
+        self.pos = pos
+
+    def unpack(self, fmt: struct.Struct) -> tuple:
+        values = fmt.unpack_from(self.data, self.pos)
+        self.pos += fmt.size
+        return values
+
+    def byte(self) -> int:
+        value = self.data[self.pos]
+        self.pos += 1
+        return value
+
+    def string(self) -> str:
+        (length,) = self.unpack(U16)
+        start = self.pos
+        self.pos += length
+        return self.data[start:self.pos].decode("utf-8")
+
+    def names(self) -> list:
+        (count,) = self.unpack(U16)
+        return [self.string() for _ in range(count)]
+
+    def extra_flags(self) -> dict:
+        (count,) = self.unpack(U16)
+        return {self.string(): bool(self.byte()) for _ in range(count)}
+
+def state_fields(state: GameState) -> tuple:
+    """Return the saved fields of a state as a hashable tuple"""
+    flags = state.game_flags
+    return (state.current_location, state.health, state.gold, state.reputation,
+            flags.bits, tuple(flags.extra.items()) if flags.extra else (),
+            tuple(state.inventory), tuple(state.completed_quests))
+
+def dump_state(state: GameState) -> bytes:
+    """Serialize a full snapshot of a GameState"""
+    return (HEADER.pack(MAGIC, VERSION)
+            + _pack_str(state.current_location)
+            + STATS.pack(state.health, state.gold, state.reputation, state.game_flags.bits)
+            + _pack_extra_flags(state.game_flags.extra)
+            + _pack_names(state.inventory)
+            + _pack_names(state.completed_quests))
+
+def load_state(data: bytes, renderer: Optional[Renderer] = None,
+               texts: Optional[Sequence[str]] = None) -> GameState:
+    """Rebuild a GameState from a snapshot produced by dump_state"""
+    reader = _Reader(data)
+    try:
+        magic, version = reader.unpack(HEADER)
+        if magic != MAGIC:
+            raise SaveError("not an Eldria save")
+        if version != VERSION:
+            raise SaveError(f"unsupported save version {version}")
+        state = GameState(renderer if renderer is not None else NullRenderer(), texts)
+        _read_snapshot(reader, state)
+    except (struct.error, IndexError, UnicodeDecodeError) as error:
+        raise SaveError(f"corrupt save data: {error}") from None
+    return state
+
+def _read_snapshot(reader: _Reader, state: GameState):
+    state.current_location = reader.string()
+    state.health, state.gold, state.reputation, bits = reader.unpack(STATS)
+    state.game_flags.bits = bits
+    for name, value in reader.extra_flags().items():
+        state.game_flags[name] = value
+    for name in reader.names():
+        state.inventory.add(name)
+    for name in reader.names():
+        state.completed_quests.add(name)
+
+def encode_delta(old: tuple, new: tuple) -> bytes:
+    """Encode the difference between two ``state_fields`` tuples"""
+    mask = 0
+    parts = []
+    if new[0] != old[0]:
+        mask |= F_LOCATION
+        parts.append(_pack_str(new[0]))
+    if new[1] != old[1]:
+        mask |= F_HEALTH
+        parts.append(bytes((new[1],)))
+    if new[2] != old[2]:
+        mask |= F_GOLD
+        parts.append(U32.pack(new[2]))
+    if new[3] != old[3]:
+        mask |= F_REPUTATION
+        parts.append(I32.pack(new[3]))
+    if new[4] != old[4] or new[5] != old[5]:
+        mask |= F_FLAGS
+        parts.append(U64.pack(new[4]) + _pack_extra_flags(dict(new[5])))
+    if new[6] != old[6]:
+        current = set(new[6])
+        kept = [item for item in old[6] if item in current]
+        if list(new[6][:len(kept)]) == kept:
+            # Items only removed and/or appended: store just the changes
+            mask |= F_INVENTORY
+            parts.append(_pack_names(item for item in old[6] if item not in current))
+            parts.append(_pack_names(new[6][len(kept):]))
+        else:
+            mask |= F_INVENTORY_FULL
+            parts.append(_pack_names(new[6]))
+    if new[7] != old[7]:
+        mask |= F_QUESTS
+        parts.append(_pack_names(new[7]))
+    return bytes((mask,)) + b"".join(parts)
+
+def apply_delta(state: GameState, payload: bytes):
+    """Apply a delta produced by encode_delta to a GameState in place"""
+    reader = _Reader(payload)
+    mask = reader.byte()
+    if mask & F_LOCATION:
+        state.current_location = reader.string()
+    if mask & F_HEALTH:
+        state.health = reader.byte()
+    if mask & F_GOLD:
+        (state.gold,) = reader.unpack(U32)
+    if mask & F_REPUTATION:
+        (state.reputation,) = reader.unpack(I32)
+    if mask & F_FLAGS:
+        (state.game_flags.bits,) = reader.unpack(U64)
+        state.game_flags.extra = reader.extra_flags() or None
+    if mask & F_INVENTORY:
+        for name in reader.names():
+            state.inventory.discard(name)
+        for name in reader.names():
+            state.inventory.add(name)
+    if mask & F_INVENTORY_FULL:
+        state.inventory = ItemSet(reader.names())
+    if mask & F_QUESTS:
+        state.completed_quests = ItemSet(reader.names())
+
+def _frame(kind: bytes, payload: bytes) -> bytes:
+    return RECORD.pack(kind, len(payload)) + payload + CRC.pack(zlib.crc32(payload))
+
+def snapshot_record(state: GameState) -> bytes:
+    """A complete save file holding one snapshot, readable by ``SaveLog.load``"""
+    return _frame(SNAPSHOT, dump_state(state))
+
+def read_records(data: bytes):
+    """Yield ``(kind, payload)`` records, stopping at a torn or corrupt tail"""
+    pos = 0
+    while pos + RECORD.size <= len(data):
+        kind, length = RECORD.unpack_from(data, pos)
+        start = pos + RECORD.size
+        end = start + length
+        if end + CRC.size > len(data):
+            return
+        payload = data[start:end]
+        (crc,) = CRC.unpack_from(data, end)
+        if crc != zlib.crc32(payload):
+            return
+        yield kind, payload
+        pos = end + CRC.size
+
+class SaveLog:
+    """Append-only save file: a full snapshot followed by per-turn deltas"""
+
+    def __init__(self, path: str, compact_every: int = 64):
+        self.path = path
+        self.compact_every = compact_every
+        self.deltas = 0
+        self.bytes_written = 0
+        self._last = None
+        self._file = None
+
+    def record(self, state: GameState):
+        """Save the state, writing only what changed since the last record"""
+        fields = state_fields(state)
+        if fields == self._last:
+            return
+        if self._last is None or self.deltas >= self.compact_every:
+            self.compact(state, fields)
+            return
+        self._append(_frame(DELTA, encode_delta(self._last, fields)))
+        self.deltas += 1
+        self._last = fields
+
+    def compact(self, state: GameState, fields: Optional[tuple] = None):
+        """Rewrite the file as a single full snapshot"""
+        self.close()
+        record = snapshot_record(state)
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=".save-")
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(record)
+        os.replace(tmp, self.path)
+        self.bytes_written += len(record)
+        self.deltas = 0
+        self._last = fields if fields is not None else state_fields(state)
+
+    def _append(self, record: bytes):
+        if self._file is None:
+            self._file = open(self.path, "ab")
+        self._file.write(record)
+        self._file.flush()
+        self.bytes_written += len(record)
+
+    def close(self):
+        """Close the underlying file"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def attach(self, engine):
+        """Record the engine's state after every go_to_location"""
+        engine.add_location_hook(lambda game: self.record(game.state))
+        self.record(engine.state)
+
+    @staticmethod
+    def load(path: str, renderer: Optional[Renderer] = None) -> GameState:
+        """Load the newest state: the last snapshot plus the deltas after it"""
+        with open(path, "rb") as fh:
+            data = fh.read()
+        state = None
+        for kind, payload in read_records(data):
+            if kind == SNAPSHOT:
+                state = load_state(payload, renderer)
+            elif kind == DELTA and state is not None:
+                apply_delta(state, payload)
+            else:
+                raise SaveError(f"unexpected record {kind!r}")
+        if state is None:
+            raise SaveError(f"no snapshot in {path}")
+        return state
+
+def benchmark(sessions: int = 50000, turns: int = 10) -> dict:
+    """Time snapshot encode/decode and delta autosaves for many sessions"""
+    from adventure_game import RandomInput, create_game, GameExit
+    import random
+
+    game = create_game(NullRenderer(), RandomInput(random.Random(1)))
+    states = []
+    for _ in range(min(sessions, 1000)):
+        game.reset()
+        try:
+            for _ in range(20):
+                game.step()
+        except GameExit:
+            pass
+        states.append(game.state)
+    states = (states * (sessions // len(states) + 1))[:sessions]
+
+    started = time.perf_counter()
+    blobs = [dump_state(state) for state in states]
+    save_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    for blob in blobs:
+        load_state(blob)
+    load_seconds = time.perf_counter() - started
+
+    # Delta autosave to disk for a smaller set of live sessions
+    live = min(sessions, 200)
+    with tempfile.TemporaryDirectory() as tmp:
+        logs = []
+        games = []
+        for i in range(live):
+            g = create_game(NullRenderer(), RandomInput(random.Random(i)))
+            log = SaveLog(os.path.join(tmp, f"{i}.sav"))
+            log.attach(g)
+            logs.append(log)
+            games.append(g)
+        started = time.perf_counter()
+        for g in games:
+            for _ in range(turns):
+                g.step()
+        autosave_seconds = time.perf_counter() - started
+        delta_bytes = sum(log.bytes_written for log in logs)
+        for log in logs:
+            log.close()
+        started = time.perf_counter()
+        for i in range(live):
+            SaveLog.load(os.path.join(tmp, f"{i}.sav"))
+        restore_seconds = time.perf_counter() - started
+
+    return {
+        "snapshot_bytes_mean": round(sum(map(len, blobs)) / len(blobs), 1),
+        "saves_per_second": round(sessions / save_seconds),
+        "loads_per_second": round(sessions / load_seconds),
+        "autosave_turns_per_second": round(live * turns / autosave_seconds),
+        "autosave_bytes_per_turn": round(delta_bytes / (live * turns), 1),
+        "log_restores_per_second": round(live / restore_seconds),
+    }
+
+def main(argv=None):
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Eldria save-game tools")
+    parser.add_argument("--bench", action="store_true", help="run the save/load benchmark")
+    parser.add_argument("--sessions", type=int, default=50000)
+    parser.add_argument("path", nargs="?", help="save file to inspect")
+    args = parser.parse_args(argv)
+    if args.bench:
+        for key, value in benchmark(args.sessions).items():
+            print(f"{key:>26}: {value}")
+        return 0
+    if not args.path:
+        parser.error("give a save file or --bench")
+    state = SaveLog.load(args.path)
+    print(f"📍 {state.current_location}  🏥 {state.health}  💰 {state.gold}  🌟 {state.reputation}")
+    print(f"🎒 {', '.join(state.inventory) or 'Empty'}")
+    print(f"🚩 {', '.join(state.game_flags) or 'None'}")
+    print(f"✅ {', '.join(state.completed_quests) or 'None'}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
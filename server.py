@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Multi-player session server for The Lost Realms of Eldria.
+
+Hosts many concurrent games from a single asyncio process. Each TCP
+connection owns its own GameEngine (and so its own GameState) driven by a
+SceneCursor, which runs the regular scene functions one choice at a time
+instead of blocking on ``input()``. Narration is paced with ``asyncio.sleep``
+so typing effects never block the event loop.
+
+Every prompt is terminated with the telnet "go ahead" sequence (IAC GA),
+which telnet and MUD clients hide and which automated clients can use to
+detect the end of a turn.
+
+Usage:
+    python server.py serve --port 4000
+    python server.py loadtest --clients 200 --turns 20 --spawn
+"""
+
+import argparse
+import asyncio
+import random
+import re
+import sys
+import time
+from typing import List, Optional
+
+from adventure_game import FRAME_CACHE, SceneCursor, World, create_game, typing_chunks
+
+GO_AHEAD = b"\xff\xf9"
+OPTION_PATTERN = re.compile(r"^\s*(\w+)\.\s", re.M)
+
+class SessionServer:
+    """asyncio TCP server running one game session per connection"""
+
+    def __init__(self, pace: float = 1.0, frame_interval: float = 0.05, intro: bool = True,
+                 world: Optional[World] = None):
+        self.pace = pace
+        self.world = world
+        self.frame_interval = frame_interval
+        self.intro = intro
+        self.sessions = 0
+        self.active = 0
+        self.server = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 4000):
+        """Start listening; returns the bound port"""
+        self.server = await asyncio.start_server(self.handle, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        """Stop accepting connections"""
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+    async def send(self, writer: asyncio.StreamWriter, segments: List[tuple]):
+        """Write output segments, pacing typed text without blocking the loop"""
+        for text, delay in segments:
+            delay *= self.pace
+            if delay <= 0 or len(text) <= 1:
+                writer.write(encode(text + "\n"))
+                continue
+            start = time.monotonic()
+            for piece, due in typing_chunks(text, delay, self.frame_interval):
+                writer.write(encode(piece))
+                await writer.drain()
+                remaining = start + due - time.monotonic()
+                if remaining > 0:
+                    await asyncio.sleep(remaining)
+            writer.write(b"\r\n")
+        await writer.drain()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Run one player's session until they disconnect"""
+        self.sessions += 1
+        self.active += 1
+        cursor = SceneCursor(create_game(world=self.world), intro=self.intro)
+        try:
+            output = cursor.advance()
+            while cursor.request is not None:
+                await self.send(writer, output)
+                writer.write(encode(cursor.request.prompt) + GO_AHEAD)
+                await writer.drain()
+                line = await reader.readline()
+                if not line:
+                    return
+                output = cursor.advance(line.decode("utf-8", "replace").strip())
+            await self.send(writer, output)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.active -= 1
+            writer.close()
+
+def encode(text: str) -> bytes:
+    """Encode text for the wire with telnet-style line endings"""
+    return text.replace("\n", "\r\n").encode("utf-8")
+
+def parse_options(prompt: str) -> List[str]:
+    """Extract the choices offered by a prompt ("1. ...", "(y/n)")"""
+    options = OPTION_PATTERN.findall(prompt)
+    if not options and "(y/n)" in prompt:
+        options = ["y", "n"]
+    return options or [""]
+
+async def play_client(host: str, port: int, turns: int, rng: random.Random,
+                      latencies: List[float]) -> int:
+    """Play ``turns`` random choices over one connection, recording latency
+    
+    Returns how many of the turns answered a menu that offered options.
+    """
+    menus = 0
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        # Intro: player name, then "Press Enter to begin"
+        for reply in (b"Load Tester\r\n", b"\r\n"):
+            await reader.readuntil(GO_AHEAD)
+            writer.write(reply)
+        block = await reader.readuntil(GO_AHEAD)
+        for _ in range(turns):
+            prompt = block[:-len(GO_AHEAD)].decode("utf-8", "replace").rsplit("\r\n\r\n", 1)[-1]
+            options = parse_options(prompt)
+            menus += options != [""]
+            choice = rng.choice(options)
+            sent = time.perf_counter()
+            writer.write(choice.encode("utf-8") + b"\r\n")
+            block = await reader.readuntil(GO_AHEAD)
+            latencies.append(time.perf_counter() - sent)
+    finally:
+        writer.close()
+    return menus
+
+async def load_test(host: str, port: Optional[int], clients: int, turns: int,
+                    seed: int = 0, spawn: bool = False, pace: float = 0.0) -> dict:
+    """Open ``clients`` concurrent connections and report turn latency"""
+    server = None
+    if spawn:
+        server = SessionServer(pace=pace)
+        port = await server.start(host, port or 0)
+    latencies = []
+    started = time.perf_counter()
+    try:
+        menus = await asyncio.gather(*(
+            play_client(host, port, turns, random.Random(seed + i), latencies)
+            for i in range(clients)
+        ))
+    finally:
+        if server is not None:
+            # Let the sessions notice their clients hanging up before closing
+            while server.active:
+                await asyncio.sleep(0.01)
+            await server.close()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+
+    def percentile(fraction: float) -> float:
+        index = min(len(latencies) - 1, int(fraction * len(latencies)))
+        return round(latencies[index] * 1000, 3)
+
+    return {
+        "clients": clients,
+        "turns": len(latencies),
+        "menu_turns": sum(menus),
+        "seconds": round(elapsed, 3),
+        "turns_per_second": round(len(latencies) / elapsed) if elapsed else None,
+        "p50_ms": percentile(0.50),
+        "p90_ms": percentile(0.90),
+        "p99_ms": percentile(0.99),
+        "max_ms": round(latencies[-1] * 1000, 3),
+        # Static narration served from pre-rendered frames (spawned servers only)
+        "frame_hit_rate": round(FRAME_CACHE.stats()["hit_rate"], 4) if spawn else None,
+    }
+
+def main(argv=None):
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Eldria multi-player session server")
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    serve = commands.add_parser("serve", help="host game sessions over TCP")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=4000)
+    serve.add_argument("--pace", type=float, default=1.0,
+                       help="typing-effect speed multiplier (0 disables pacing)")
+
+    load = commands.add_parser("loadtest", help="measure turn latency with N clients")
+    load.add_argument("--host", default="127.0.0.1")
+    load.add_argument("--port", type=int, default=None)
+    load.add_argument("--clients", type=int, default=100)
+    load.add_argument("--turns", type=int, default=20)
+    load.add_argument("--seed", type=int, default=0)
+    load.add_argument("--spawn", action="store_true",
+                      help="run an in-process server on a free port")
+    load.add_argument("--pace", type=float, default=0.0,
+                      help="pacing multiplier for the spawned server")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        async def serve_forever():
+            from texts import default_world
+            server = SessionServer(pace=args.pace, world=default_world())
+            port = await server.start(args.host, args.port)
+            print(f"🎮 Eldria server listening on {args.host}:{port}")
+            async with server.server:
+                await server.server.serve_forever()
+        try:
+            asyncio.run(serve_forever())
+        except KeyboardInterrupt:
+            print("\n👋 Server stopped")
+        return 0
+
+    if args.port is None and not args.spawn:
+        parser.error("loadtest needs --port or --spawn")
+    report = asyncio.run(load_test(args.host, args.port, args.clients, args.turns,
+                                   args.seed, args.spawn, args.pace))
+    for key, value in report.items():
+        print(f"{key:>18}: {value}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
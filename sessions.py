@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Bounded session store for The Lost Realms of Eldria.
+
+A host that keeps every registered player's game resident grows without
+bound. A SessionStore keeps at most ``max_sessions`` SceneCursor sessions
+(and optionally at most ``max_bytes`` of estimated session memory) in an
+LRU ordered dict. When the budget is exceeded the least recently used
+sessions are spilled to a local SQLite database, several per transaction,
+until the store is back under its low-water mark. ``get`` restores a
+spilled session transparently by rebuilding its engine and replaying the
+paused scene up to its pending prompt.
+
+Each spilled row holds the ``savegame`` snapshot of the state at the start
+of the session's current scene plus the choices that scene has received,
+so a restored session continues exactly where it stopped.
+
+The store reports its hit rate, eviction rate and a histogram of restore
+latency. It is not thread-safe; use one store per thread or event loop.
+
+Usage:
+    python sessions.py --players 50000 --capacity 5000 --requests 200000
+"""
+
+import argparse
+import collections
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, Iterator, Optional
+
+from adventure_game import (GameEngine, QueuedInput, RecordingRenderer, SceneCursor, World, WORLD,
+                            create_game)
+from metrics import Histogram
+from savegame import dump_state, load_state
+
+# Restores are disk reads plus a scene replay: tens of microseconds to milliseconds
+RESTORE_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.1)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    state BLOB NOT NULL,
+    paused TEXT NOT NULL,
+    updated REAL NOT NULL
+)
+"""
+
+def session_bytes(cursor: SceneCursor) -> int:
+    """Rough resident size of one session's own objects
+
+    Counts the cursor, engine, the GameState (twice, for the cursor's
+    checkpoint copy) and the strings they hold; the shared world and
+    interned names are excluded.
+    """
+    engine = cursor.engine
+    state = engine.state
+    size = sys.getsizeof(cursor) + sys.getsizeof(cursor.__dict__) + sys.getsizeof(engine)
+    size += sys.getsizeof(engine.renderer) + sys.getsizeof(engine.input_provider)
+    state_size = sys.getsizeof(state) + sys.getsizeof(state.gold) + sys.getsizeof(state.game_flags)
+    for items in (state.inventory, state.completed_quests):
+        state_size += sys.getsizeof(items) + sys.getsizeof(items.order) + sys.getsizeof(items.bits)
+    return size + 2 * state_size + sum(map(sys.getsizeof, cursor.inputs))
+
+class SessionStore:
+    """LRU-bounded map of session id to SceneCursor, spilling to SQLite"""
+
+    def __init__(self, path: str, max_sessions: int = 10000, max_bytes: Optional[int] = None,
+                 low_water: float = 0.9, world: World = WORLD,
+                 factory: Optional[Callable[[], GameEngine]] = None):
+        self.path = path
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.low_water = low_water
+        self.factory = factory or (lambda: create_game(RecordingRenderer(), QueuedInput(), world))
+        self.resident = collections.OrderedDict()
+        self.sizes = {}
+        self.resident_bytes = 0
+        self.hits = 0
+        self.restores = 0
+        self.misses = 0
+        self.evictions = 0
+        self.restore_seconds = Histogram(RESTORE_BUCKETS)
+        self.db = sqlite3.connect(path)
+        # Losing the last few evictions on power failure is acceptable; a fsync per batch is not
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(SCHEMA)
+        self.db.commit()
+
+    def __len__(self) -> int:
+        return len(self.resident)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self.resident or self._load_row(session_id) is not None
+
+    def get(self, session_id: str) -> Optional[SceneCursor]:
+        """Return a session, restoring it from disk if it was spilled"""
+        cursor = self.resident.get(session_id)
+        if cursor is not None:
+            self.resident.move_to_end(session_id)
+            self.hits += 1
+            return cursor
+        started = time.perf_counter()
+        row = self._load_row(session_id)
+        if row is None:
+            self.misses += 1
+            return None
+        cursor = self._restore(*row)
+        self.restore_seconds.observe(time.perf_counter() - started)
+        self.restores += 1
+        self._admit(session_id, cursor)
+        return cursor
+
+    def put(self, session_id: str, cursor: SceneCursor):
+        """Add or update a session after a turn, evicting others if over budget"""
+        # Output already delivered is only needed until the next advance
+        cursor.engine.renderer.segments = []
+        if session_id in self.resident:
+            self.resident.move_to_end(session_id)
+            self.resident_bytes -= self.sizes[session_id]
+        self._admit(session_id, cursor)
+
+    def create(self, session_id: str) -> SceneCursor:
+        """Start a new game under ``session_id``; returns its cursor"""
+        cursor = SceneCursor(self.factory())
+        self.put(session_id, cursor)
+        return cursor
+
+    def remove(self, session_id: str):
+        """Forget a session, resident or spilled"""
+        if self.resident.pop(session_id, None) is not None:
+            self.resident_bytes -= self.sizes.pop(session_id)
+        self.db.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+        self.db.commit()
+
+    def _admit(self, session_id: str, cursor: SceneCursor):
+        size = session_bytes(cursor) if self.max_bytes is not None else 0
+        self.resident[session_id] = cursor
+        self.sizes[session_id] = size
+        self.resident_bytes += size
+        if len(self.resident) > self.max_sessions or (
+                self.max_bytes is not None and self.resident_bytes > self.max_bytes):
+            self._evict()
+
+    def _evict(self):
+        """Spill least recently used sessions until under the low-water mark"""
+        sessions = int(self.max_sessions * self.low_water)
+        budget = self.max_bytes * self.low_water if self.max_bytes is not None else None
+        rows = []
+        finished = []
+        # The most recent session is never evicted, even if it alone is over budget
+        while len(self.resident) > 1 and (len(self.resident) > sessions or (
+                budget is not None and self.resident_bytes > budget)):
+            session_id, cursor = self.resident.popitem(last=False)
+            self.resident_bytes -= self.sizes.pop(session_id)
+            if cursor.engine.game_running:
+                rows.append((session_id, *self._pack(cursor)))
+            else:
+                finished.append((session_id,))
+        self.db.executemany("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?)", rows)
+        self.db.executemany("DELETE FROM sessions WHERE id = ?", finished)
+        self.db.commit()
+        self.evictions += len(rows) + len(finished)
+
+    def _pack(self, cursor: SceneCursor) -> tuple:
+        # Between turns the engine is rolled back to the start of its scene
+        engine = cursor.engine
+        paused = {"inputs": cursor.inputs, "sent": cursor.sent, "intro": cursor.intro,
+                  "name": engine.player_name, "pending": cursor.request is not None,
+                  "typeahead": list(engine.typeahead) if engine.typeahead else None}
+        return dump_state(engine.state), json.dumps(paused, separators=(",", ":")), time.time()
+
+    def _load_row(self, session_id: str) -> Optional[tuple]:
+        return self.db.execute("SELECT state, paused FROM sessions WHERE id = ?",
+                               (session_id,)).fetchone()
+
+    def _restore(self, data: bytes, paused: str) -> SceneCursor:
+        paused = json.loads(paused)
+        engine = self.factory()
+        engine.state = load_state(data, engine.renderer, engine.texts)
+        engine.go_to_location(engine.state.current_location)
+        engine.player_name = paused["name"]
+        if paused["typeahead"]:
+            engine.typeahead = collections.deque(paused["typeahead"])
+        cursor = SceneCursor(engine, intro=paused["intro"])
+        cursor.inputs = paused["inputs"]
+        cursor.sent = paused["sent"]
+        if paused["pending"]:
+            # Replaying without a new choice re-raises the prompt; its output was already sent
+            cursor.advance()
+        return cursor
+
+    def spilled(self) -> int:
+        """Number of sessions stored on disk"""
+        return self.db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def flush(self):
+        """Spill every resident session, e.g. before shutdown"""
+        rows = [(session_id, *self._pack(cursor)) for session_id, cursor in self.resident.items()
+                if cursor.engine.game_running]
+        finished = [(session_id,) for session_id, cursor in self.resident.items()
+                    if not cursor.engine.game_running]
+        self.db.executemany("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?)", rows)
+        self.db.executemany("DELETE FROM sessions WHERE id = ?", finished)
+        self.db.commit()
+        self.resident.clear()
+        self.sizes.clear()
+        self.resident_bytes = 0
+
+    def close(self, flush: bool = True):
+        """Optionally spill resident sessions, then close the database"""
+        if flush:
+            self.flush()
+        self.db.close()
+
+    def stats(self) -> Dict:
+        """Hit rate, eviction rate and restore latency so far"""
+        requests = self.hits + self.restores + self.misses
+        restore = self.restore_seconds.snapshot()
+        return {
+            "resident": len(self.resident),
+            "resident_bytes": self.resident_bytes if self.max_bytes is not None else None,
+            "requests": requests,
+            "hits": self.hits,
+            "restores": self.restores,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / requests if requests else 0.0,
+            "eviction_rate": self.evictions / requests if requests else 0.0,
+            "restore_mean_seconds": restore["sum"] / restore["count"] if restore["count"] else 0.0,
+            "restore_seconds": restore,
+        }
+
+def _zipf_players(players: int, skew: float, rng: random.Random) -> Iterator[str]:
+    """Endless stream of player ids where a few players are far more active"""
+    weights = [1 / (rank + 1) ** skew for rank in range(players)]
+    while True:
+        for index in rng.choices(range(players), weights, k=1024):
+            yield f"player-{index}"
+
+def simulate(store: SessionStore, players: int, requests: int, skew: float = 1.1,
+             seed: int = 0) -> Dict:
+    """Drive ``requests`` turns from ``players`` players with skewed activity"""
+    rng = random.Random(seed)
+    ids = _zipf_players(players, skew, rng)
+    started = time.perf_counter()
+    for _ in range(requests):
+        session_id = next(ids)
+        cursor = store.get(session_id)
+        if cursor is None or cursor.request is None:
+            cursor = store.create(session_id)
+            cursor.advance()
+        cursor.advance(rng.choice(cursor.request.valid_options or [""]))
+        store.put(session_id, cursor)
+    elapsed = time.perf_counter() - started
+    report = store.stats()
+    report["requests_per_second"] = round(requests / elapsed)
+    return report
+
+def main(argv=None):
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Exercise the bounded Eldria session store")
+    parser.add_argument("--players", type=int, default=50000, help="registered players")
+    parser.add_argument("--requests", type=int, default=200000, help="turns to play")
+    parser.add_argument("--capacity", type=int, default=5000, help="resident session limit")
+    parser.add_argument("--max-bytes", type=int, default=None, help="resident memory budget")
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent of player activity")
+    parser.add_argument("--db", default=None, help="SQLite file (default: a temporary file)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SessionStore(args.db or os.path.join(tmp, "sessions.db"), args.capacity, args.max_bytes)
+        report = simulate(store, args.players, args.requests, args.skew, args.seed)
+        report["spilled"] = store.spilled()
+        store.close(flush=False)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return 0
+    for key, value in report.items():
+        if key != "restore_seconds":
+            print(f"{key:>22}: {round(value, 6) if isinstance(value, float) else value}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
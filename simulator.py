@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Monte-Carlo playthrough simulator for The Lost Realms of Eldria.
+
+Runs large numbers of randomized playthroughs of the ``create_game`` world
+across a process pool and reports the distribution of final outcomes.
+Every worker process owns a single GameEngine; each chunk of playthroughs
+is driven by its own seeded RNG, so results are reproducible regardless of
+how chunks are scheduled. Workers return small mergeable histograms that
+are folded into the running total as they arrive, keeping memory bounded
+no matter how many playthroughs are requested.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+from collections import Counter
+from typing import Dict, Iterator, Optional, Tuple
+
+from adventure_game import GameExit, NullRenderer, RandomInput, create_game
+
+class OutcomeStats:
+    """Mergeable histograms of final playthrough outcomes"""
+
+    def __init__(self, gold_bucket: int = 10):
+        self.gold_bucket = gold_bucket
+        self.runs = 0
+        self.turns = 0
+        self.gold = Counter()
+        self.health = Counter()
+        self.reputation = Counter()
+        self.inventory_size = Counter()
+        self.items = Counter()
+        self.quests = Counter()
+        self.quest_count = Counter()
+
+    def add(self, state, turns: int):
+        """Record the final state of one playthrough"""
+        self.runs += 1
+        self.turns += turns
+        self.gold[state.gold // self.gold_bucket * self.gold_bucket] += 1
+        self.health[state.health] += 1
+        self.reputation[state.reputation] += 1
+        self.inventory_size[len(state.inventory)] += 1
+        self.items.update(state.inventory)
+        self.quests.update(set(state.completed_quests))
+        self.quest_count[len(state.completed_quests)] += 1
+
+    def merge(self, other: "OutcomeStats"):
+        """Fold another set of statistics into this one"""
+        self.runs += other.runs
+        self.turns += other.turns
+        for name in ("gold", "health", "reputation", "inventory_size",
+                     "items", "quests", "quest_count"):
+            getattr(self, name).update(getattr(other, name))
+
+    def summary(self) -> Dict:
+        """Return a JSON-friendly summary of the distributions"""
+        def describe(histogram: Counter) -> Dict:
+            values = sorted(histogram)
+            if not values:
+                return {}
+            total = sum(histogram.values())
+            mean = sum(v * n for v, n in histogram.items()) / total
+            return {
+                "min": values[0],
+                "p10": percentile(histogram, 0.10),
+                "p50": percentile(histogram, 0.50),
+                "p90": percentile(histogram, 0.90),
+                "max": values[-1],
+                "mean": round(mean, 3),
+            }
+
+        def rates(counter: Counter) -> Dict:
+            return {key: round(n / self.runs, 6) for key, n in counter.most_common()}
+
+        return {
+            "runs": self.runs,
+            "mean_turns": round(self.turns / self.runs, 3) if self.runs else 0,
+            "gold": describe(self.gold),
+            "health": describe(self.health),
+            "reputation": describe(self.reputation),
+            "inventory_size": describe(self.inventory_size),
+            "completed_quest_count": describe(self.quest_count),
+            "item_rates": rates(self.items) if self.runs else {},
+            "quest_rates": rates(self.quests) if self.runs else {},
+        }
+
+def percentile(histogram: Counter, fraction: float):
+    """Return the value at the given fraction of a value->count histogram"""
+    target = fraction * sum(histogram.values())
+    seen = 0
+    for value in sorted(histogram):
+        seen += histogram[value]
+        if seen >= target:
+            return value
+    return None
+
+# One engine per worker process, created by the pool initializer
+_engine = None
+
+def _init_worker():
+    """Create this worker's GameEngine"""
+    global _engine
+    _engine = create_game(NullRenderer(), RandomInput())
+
+def simulate_chunk(task: Tuple[int, int, int]) -> OutcomeStats:
+    """Run ``runs`` playthroughs seeded with ``seed`` and return their statistics"""
+    seed, runs, max_turns = task
+    if _engine is None:
+        _init_worker()
+    engine = _engine
+    engine.input_provider.rng.seed(seed)
+    stats = OutcomeStats()
+    for _ in range(runs):
+        engine.reset()
+        turns = 0
+        try:
+            while engine.game_running and turns < max_turns:
+                engine.step()
+                turns += 1
+        except GameExit:
+            pass
+        stats.add(engine.state, turns)
+    return stats
+
+def iter_tasks(runs: int, chunk_size: int, max_turns: int, seed: int) -> Iterator[Tuple[int, int, int]]:
+    """Split ``runs`` into chunks, each with its own derived seed"""
+    seeder = random.Random(seed)
+    while runs > 0:
+        size = min(chunk_size, runs)
+        runs -= size
+        yield seeder.getrandbits(64), size, max_turns
+
+def simulate(runs: int, workers: Optional[int] = None, max_turns: int = 50,
+             seed: int = 0, chunk_size: int = 2000, progress=None) -> OutcomeStats:
+    """Run ``runs`` random playthroughs across a process pool"""
+    total = OutcomeStats()
+    tasks = iter_tasks(runs, chunk_size, max_turns, seed)
+    if workers == 1:
+        for task in tasks:
+            total.merge(simulate_chunk(task))
+            if progress:
+                progress(total)
+        return total
+    with multiprocessing.Pool(workers, initializer=_init_worker) as pool:
+        for stats in pool.imap_unordered(simulate_chunk, tasks):
+            total.merge(stats)
+            if progress:
+                progress(total)
+    return total
+
+def format_report(summary: Dict) -> str:
+    """Render a summary as a human-readable report"""
+    lines = [f"🎲 {summary['runs']} playthroughs, {summary['mean_turns']} turns on average", ""]
+    for name in ("gold", "health", "reputation", "inventory_size", "completed_quest_count"):
+        dist = summary[name]
+        lines.append(f"{name:>22}: " + "  ".join(f"{k}={v}" for k, v in dist.items()))
+    lines.append("")
+    lines.append("Items held at the end:")
+    for item, rate in summary["item_rates"].items():
+        lines.append(f"  {rate:7.2%}  {item}")
+    lines.append("Quests completed:")
+    for quest, rate in summary["quest_rates"].items():
+        lines.append(f"  {rate:7.2%}  {quest}")
+    return "\n".join(lines)
+
+def main(argv=None):
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Simulate random playthroughs of Eldria")
+    parser.add_argument("--runs", type=int, default=100000, help="number of playthroughs")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--max-turns", type=int, default=50, help="scenes per playthrough")
+    parser.add_argument("--seed", type=int, default=0, help="base RNG seed")
+    parser.add_argument("--chunk-size", type=int, default=2000, help="playthroughs per task")
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    stats = simulate(args.runs, args.workers, args.max_turns, args.seed, args.chunk_size)
+    elapsed = time.perf_counter() - started
+    summary = stats.summary()
+    summary["seconds"] = round(elapsed, 3)
+    summary["runs_per_second"] = round(stats.runs / elapsed) if elapsed else None
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print(format_report(summary))
+        print(f"\n⏱️  {elapsed:.2f}s ({summary['runs_per_second']} playthroughs/s)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,9 +4,15 @@ Test script for The Lost Realms of Eldria text-based adventure game.
 This script tests the core game components and demonstrates functionality.
 """
 
+import io
+import os
 import sys
+import tempfile
 import time
+import unittest
 from adventure_game import GameState, GameEngine
+from adventure_game import TerminalRenderer, BufferedRenderer, ScreenRenderer, NullRenderer, GameExit
+from adventure_game import ScriptedInput, SceneCursor, create_game, run_headless
 
 def test_game_state():
     """Test the GameState class functionality"""
@@ -41,6 +47,43 @@ def test_game_state():
     
     print("✅ GameState tests passed!")
 
+def test_compact_state():
+    """Test the slot-based state containers"""
+    print("🧪 Testing compact game state...")
+    
+    state = GameState()
+    assert not hasattr(state, "__dict__"), "GameState should use __slots__"
+    
+    # Inventory keeps insertion order and ignores duplicates
+    for item in ["Lantern", "Rope", "Lantern", "Compass"]:
+        state.add_item(item)
+    assert state.inventory == ["Lantern", "Rope", "Compass"], f"Unexpected inventory: {state.inventory}"
+    assert state.remove_item("Rope") and not state.remove_item("Rope"), "remove_item should report removal"
+    assert list(state.inventory) == ["Lantern", "Compass"]
+    
+    # Quest completion is idempotent, including via list-style append
+    assert state.complete_quest("Herb Quest")
+    assert not state.complete_quest("Herb Quest")
+    state.completed_quests.append("Herb Quest")
+    assert len(state.completed_quests) == 1, "Duplicate quest recorded"
+    
+    # Flags behave like a dict of booleans
+    state.game_flags["herb_quest"] = True
+    state.game_flags["met_bard"] = True
+    assert state.game_flags.get("herb_quest") and "met_bard" in state.game_flags
+    assert state.game_flags.get("wolf_quest") is None
+    assert state.game_flags == {"herb_quest": True, "met_bard": True}
+    state.game_flags["herb_quest"] = False
+    assert "herb_quest" not in state.game_flags, "Cleared flag still reported"
+    
+    # Copies are independent
+    clone = state.copy()
+    clone.add_item("Rope")
+    clone.game_flags["wolf_quest"] = True
+    assert not state.has_item("Rope") and "wolf_quest" not in state.game_flags
+    
+    print("✅ Compact state tests passed!")
+
 def test_game_engine():
     """Test the GameEngine class functionality"""
     print("🧪 Testing GameEngine class...")
@@ -67,6 +110,68 @@ def test_game_engine():
     
     print("✅ GameEngine tests passed!")
 
+def test_renderers():
+    """Test the output backends used by GameEngine and GameState"""
+    print("🧪 Testing renderers...")
+    
+    # Terminal backend: chunked writes, total pacing driven by deadlines
+    class CountingStream(io.StringIO):
+        writes = 0
+        def write(self, text):
+            CountingStream.writes += 1
+            return super().write(text)
+    
+    stream = CountingStream()
+    now = [0.0]
+    sleeps = []
+    def fake_sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+    terminal = TerminalRenderer(stream, frame_interval=0.15, sleep=fake_sleep, clock=lambda: now[0])
+    text = "The forest path winds through ancient trees."
+    terminal.type_text(text, delay=0.03)
+    assert stream.getvalue() == text + "\n", "Terminal output mismatch"
+    assert CountingStream.writes <= len(text) // 4, f"Too many writes: {CountingStream.writes}"
+    assert abs(sum(sleeps) - len(text) * 0.03) < 1e-9, f"Unexpected pacing: {sum(sleeps)}"
+    
+    # Buffered backend: one write per turn
+    stream = CountingStream()
+    CountingStream.writes = 0
+    engine = GameEngine(BufferedRenderer(stream))
+    engine.type_text("Hello")
+    engine.state.modify_gold(5)
+    engine.display_status()
+    assert CountingStream.writes == 0, "Buffered renderer wrote before flush"
+    engine.renderer.flush()
+    assert CountingStream.writes == 1, f"Expected one write, got {CountingStream.writes}"
+    assert "💰 Gained 5 gold" in stream.getvalue(), "State message not routed to renderer"
+    
+    # Screen backend: a self-loop only rewrites the rows that changed
+    stream = CountingStream()
+    screen = ScreenRenderer(stream, size=(100, 40))
+    game = create_game(screen, ScriptedInput(["3", "1", "1"]))
+    game.go_to_location("start")
+    game.step()
+    game.step()
+    first = stream.getvalue()
+    CountingStream.writes = 0
+    game.step()
+    redraw = stream.getvalue()[len(first):]
+    assert CountingStream.writes == 1, f"Expected one write per turn, got {CountingStream.writes}"
+    assert "ELDER'S COTTAGE" not in redraw, "Unchanged rows were redrawn"
+    assert "Moonweaver family" in redraw, "Narration before the clear was dropped"
+    assert "\n" * 50 not in first and first.startswith(ScreenRenderer.ENTER)
+    screen.close()
+    assert ScreenRenderer.LEAVE in stream.getvalue(), "Alternate screen not restored"
+    
+    # Null backend: nothing is emitted, state still changes
+    engine = GameEngine(NullRenderer())
+    engine.type_text("Silence")
+    engine.state.add_item("Lantern")
+    assert engine.state.has_item("Lantern"), "Null renderer affected state"
+    
+    print("✅ Renderer tests passed!")
+
 def test_game_creation():
     """Test the complete game creation"""
     print("🧪 Testing game creation...")
@@ -98,6 +203,1010 @@ def test_game_creation():
     
     return True
 
+def test_headless_playthrough():
+    """Test scripted playthroughs through the real scenes"""
+    print("🧪 Testing headless playthroughs...")
+    
+    # Tavern deal, then the waterfall chest with the map in hand
+    result = run_headless(["1", "1", "4", "3", "1"])
+    assert result.trace == ["start", "tavern", "start", "forest_path", "waterfall_cave", "forest_path"], \
+        f"Unexpected trace: {result.trace}"
+    assert result.state.gold == 130, f"Expected gold 130, got {result.state.gold}"
+    assert result.state.has_item("Ancient Artifact"), "Chest was not opened"
+    
+    # Invalid choices are rejected and generators are accepted
+    result = run_headless(c for c in ["9", "3", "4"])
+    assert result.trace == ["start", "elder", "start"], f"Unexpected trace: {result.trace}"
+    
+    # The intro consumes the player name, and max_turns bounds the session
+    result = run_headless(iter(lambda: "2", None), player_name="Aria", max_turns=5)
+    assert len(result.trace) == 5, f"Expected 5 turns, got {len(result.trace)}"
+    
+    # Choices can come from a file
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "choices.txt")
+        with open(path, "w", encoding="utf-8") as fh:
+            fh.write("1\n2\n")
+        scripted = ScriptedInput.from_file(path)
+    assert scripted.read("?") == "1" and scripted.read("?") == "2"
+    try:
+        scripted.read("?")
+        assert False, "Exhausted script should raise EOFError"
+    except EOFError:
+        pass
+    
+    print("✅ Headless playthrough tests passed!")
+
+def test_simulator():
+    """Test the Monte-Carlo playthrough simulator"""
+    print("🧪 Testing simulator...")
+    
+    from simulator import simulate, iter_tasks, simulate_chunk, OutcomeStats
+    
+    stats = simulate(300, workers=1, max_turns=20, seed=7, chunk_size=100)
+    assert stats.runs == 300, f"Expected 300 runs, got {stats.runs}"
+    assert sum(stats.gold.values()) == 300, "Gold histogram does not cover every run"
+    summary = stats.summary()
+    assert 0 <= summary["health"]["min"] <= summary["health"]["max"] <= 100, "Health out of range"
+    
+    # Chunks are seeded independently, so merging order does not matter
+    merged = OutcomeStats()
+    for task in reversed(list(iter_tasks(300, 100, 20, 7))):
+        merged.merge(simulate_chunk(task))
+    assert merged.summary() == summary, "Merged statistics depend on chunk order"
+    
+    print("✅ Simulator tests passed!")
+
+def test_scene_cursor():
+    """Test driving scenes one choice at a time without blocking on input"""
+    print("🧪 Testing scene cursor...")
+    
+    cursor = SceneCursor(create_game())
+    output = cursor.advance()
+    assert cursor.request.valid_options == ["1", "2", "3", "4", "5"], "Expected the village menu"
+    assert any("MOONHAVEN" in text for text, _ in output), "Scene narration missing"
+    
+    # Invalid input only produces the error, not a replay of the scene
+    output = cursor.advance("9")
+    assert [text for text, _ in output] == ["❌ Please choose from: 1, 2, 3, 4, 5"], f"Unexpected output: {output}"
+    
+    # Nested prompts within one scene: Stonebridge market asks to buy a potion
+    for choice in ["4", "1"]:
+        cursor.advance(choice)
+    assert cursor.engine.state.current_location == "stonebridge"
+    cursor.advance("1")
+    assert cursor.request.valid_options == ["y", "n"], "Expected the potion prompt"
+    output = cursor.advance("y")
+    assert cursor.engine.state.gold == 40, f"Expected gold 40, got {cursor.engine.state.gold}"
+    assert sum("Lost 10 gold" in text for text, _ in output) == 1, "Purchase message repeated or missing"
+    
+    # The intro's name and Enter are kept, and lead on to the village menu
+    cursor = SceneCursor(create_game(), intro=True)
+    cursor.advance()
+    cursor.advance("Aria")
+    assert cursor.inputs == ["Aria"], "The player's name was dropped"
+    output = cursor.advance("")
+    assert cursor.engine.player_name == "Aria"
+    assert cursor.request.valid_options == ["1", "2", "3", "4", "5"], "The intro never finished"
+    assert any("MOONHAVEN" in text for text, _ in output)
+    
+    # The asyncio server drives the same cursor over TCP, through the intro to real menus
+    import asyncio
+    from server import load_test
+    report = asyncio.run(load_test("127.0.0.1", None, clients=3, turns=5, spawn=True))
+    assert report["turns"] == 15, f"Expected 15 turns, got {report['turns']}"
+    assert report["menu_turns"] == 15, f"Clients did not reach the menus: {report}"
+    
+    print("✅ Scene cursor tests passed!")
+
+def test_save_and_load():
+    """Test binary snapshots and delta autosave logs"""
+    print("🧪 Testing save and load...")
+    
+    from savegame import SaveLog, SaveError, dump_state, load_state, state_fields
+    
+    game = create_game(NullRenderer(), ScriptedInput(["2", "2", "4", "2", "2", "3", "1", "1"]))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "session.sav")
+        log = SaveLog(path, compact_every=3)
+        log.attach(game)
+        try:
+            while True:
+                game.step()
+        except GameExit:
+            pass
+        log.close()
+        
+        restored = SaveLog.load(path)
+        assert state_fields(restored) == state_fields(game.state), "Replayed log does not match state"
+        assert restored.game_flags.get("herb_quest"), "Flag lost in save"
+        assert list(restored.completed_quests) == ["Herb Quest"], "Quest lost in save"
+        
+        # A torn final record is ignored rather than corrupting the load
+        with open(path, "ab") as fh:
+            fh.write(b"D\x40\x00\x00\x00partial")
+        assert state_fields(SaveLog.load(path)) == state_fields(game.state)
+    
+    # Snapshots round-trip and reject foreign data
+    blob = dump_state(game.state)
+    assert state_fields(load_state(blob)) == state_fields(game.state), "Snapshot round-trip failed"
+    try:
+        load_state(b"not a save")
+        assert False, "Foreign data should be rejected"
+    except SaveError:
+        pass
+    
+    print("✅ Save and load tests passed!")
+
+def test_world_graph():
+    """Test the declarative scene data and its compiled transition table"""
+    print("🧪 Testing world graph...")
+    
+    from adventure_game import WORLD, WORLD_SPEC, compile_world
+    
+    assert WORLD.locations[0] == "start", "Start must be the first location"
+    assert WORLD.transitions["forest_path"]["3"] == ("waterfall_cave",)
+    assert WORLD.transitions["stonebridge"]["1"] == ("stonebridge",)
+    assert "Ancient Artifact" in WORLD.items() and "Herb Quest" in WORLD.quests()
+    assert WORLD.flags() == ["accepted_quest", "wolf_quest", "herb_quest", "delivery_quest"]
+    
+    # Sessions share the compiled scenes instead of rebuilding them
+    assert create_game().locations["tavern"] is create_game().locations["tavern"]
+    
+    # The shared location table is copied on write, never modified in place
+    game, other = create_game(NullRenderer()), create_game(NullRenderer())
+    game.add_location("secret_grove", lambda engine: None)
+    assert "secret_grove" in game.locations and "secret_grove" not in other.locations
+    assert "secret_grove" not in WORLD.scenes
+    
+    # Per-session memory does not grow with the size of the world
+    from benchmark import scaled_world, session_footprint
+    small = session_footprint(500)
+    large = session_footprint(500, scaled_world(5))
+    assert large["scenes"] == 5 * small["scenes"]
+    assert large["bytes_per_session"] <= small["bytes_per_session"] * 1.1, f"{small} vs {large}"
+    
+    # Broken content is rejected when the world is compiled
+    broken = [dict(WORLD_SPEC[0], steps=[("goto", "atlantis")])]
+    try:
+        compile_world(broken)
+        assert False, "Unknown location should be rejected"
+    except ValueError:
+        pass
+    
+    print("✅ World graph tests passed!")
+
+def test_explorer():
+    """Test the exhaustive state-space explorer"""
+    print("🧪 Testing explorer...")
+    
+    from explorer import TranspositionTable, explore
+    
+    report = explore().report()
+    assert report["states"] > 0 and not report["truncated"], "Exploration should finish"
+    assert not report["unvisited_locations"], "Every location should be reachable"
+    assert not report["unreachable_items"], "Every item should be obtainable"
+    assert not report["unreachable_branches"], "Every branch should be taken"
+    assert "Ancient Artifact" in report["reachable_items"]
+    
+    # Other worlds are explored with their own scenes, in process and in worker pools
+    import pickle
+    from adventure_game import compile_world
+    spec = [
+        {"id": "start", "steps": [("menu", "Where?", {"1": [("add_item", "Lamp"), ("goto", "cellar")],
+                                                      "2": [("goto", "cellar")]})]},
+        {"id": "cellar", "steps": [("if", ("has_item", "Lamp"), [("quest", "Light")], []),
+                                   ("menu", "Back?", {"1": [("goto", "start")]})]},
+    ]
+    world = pickle.loads(pickle.dumps(compile_world(spec)))
+    small = explore(world).report()
+    assert set(small["states_per_location"]) == {"start", "cellar"}, small["states_per_location"]
+    assert small["reachable_items"] == ["Lamp"] and small["reachable_quests"] == ["Light"]
+    assert not small["unreachable_branches"], small["unreachable_branches"]
+    assert explore(world, workers=2).report()["states"] == small["states"]
+    
+    # The transposition table spills to disk once over its memory budget
+    with tempfile.TemporaryDirectory() as tmp:
+        table = TranspositionTable(memory_limit=2, spill_dir=tmp)
+        for digest in (1, 2, 3, 1 << 63):
+            assert table.add(digest), "New digests should be accepted"
+        assert not table.add(1) and not table.add(1 << 63), "Duplicates should be rejected"
+        assert table.size == 4 and table.spilled, "Table should have spilled"
+        table.close()
+    
+    print("✅ Explorer tests passed!")
+
+def test_benchmark():
+    """Test the benchmark suite and its baseline comparison"""
+    print("🧪 Testing benchmark suite...")
+    
+    from benchmark import compare, run_benchmarks
+    
+    results = run_benchmarks(["state_mutations", "location_dispatch"], repeat=2, min_time=0.001)
+    timings = results["benchmarks"]
+    assert list(timings) == ["state_mutations", "location_dispatch"]
+    assert all(t["median"] > 0 and t["loops"] >= 1 for t in timings.values())
+    
+    # A baseline twice as fast flags a regression; one twice as slow an improvement
+    def scaled(factor):
+        return {"benchmarks": {name: {"median": t["median"] * factor}
+                               for name, t in timings.items()}}
+    assert {row["status"] for row in compare(results, scaled(0.5))} == {"regression"}
+    assert {row["status"] for row in compare(results, scaled(2.0))} == {"improvement"}
+    assert {row["status"] for row in compare(results, scaled(1.0))} == {"ok"}
+    rows = compare(results, {"benchmarks": {"retired": {"median": 1.0}}})
+    assert [row["status"] for row in rows] == ["new", "new", "missing"]
+    
+    print("✅ Benchmark suite tests passed!")
+
+def test_metrics():
+    """Test run-loop instrumentation and metric export"""
+    print("🧪 Testing metrics...")
+    
+    from metrics import GameMetrics, MetricsExporter, to_prometheus
+    
+    game = create_game(NullRenderer(), ScriptedInput(["1", "1", "4", "3", "1"]))
+    metrics = GameMetrics().attach(game)
+    game.go_to_location("start")
+    try:
+        while game.game_running:
+            game.step()
+    except GameExit:
+        pass
+    assert metrics.turns == 6 and metrics.inputs == 6, f"Got {metrics.turns} turns, {metrics.inputs} inputs"
+    assert metrics.transitions["forest_path", "waterfall_cave"] == 1
+    assert metrics.render_seconds["start"].snapshot()["count"] == 2
+    
+    text = to_prometheus(metrics.snapshot())
+    assert "eldria_turns_total 6" in text
+    assert 'eldria_transitions_total{from="start",to="tavern"} 1' in text
+    assert 'eldria_input_wait_seconds_bucket{le="+Inf"} 6' in text
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "metrics.jsonl")
+        exporter = MetricsExporter(metrics, path, "jsonl", interval=60).start()
+        exporter.stop()
+        with open(path, encoding="utf-8") as fh:
+            assert len(fh.readlines()) == 1, "Stopping should write a final snapshot"
+    
+    print("✅ Metrics tests passed!")
+
+def test_journal():
+    """Test choice journals and their replay"""
+    print("🧪 Testing journals...")
+    
+    from journal import Journal, JournalError, parse_journal, read_journal, verify_journal
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "session.journal")
+        game = create_game(NullRenderer(), ScriptedInput(["Aria", "", "1", "1", "4", "3", "1"]))
+        journal = Journal(path, seed=42).attach(game)
+        game.run()
+        journal.finish(game)
+        
+        record = read_journal(path)
+        assert record.seed == 42 and record.player_name == "Aria"
+        assert record.choices == ["1", "1", "4", "3", "1"], f"Unexpected choices: {record.choices}"
+        result = verify_journal(path)
+        assert result.ok, f"Replay diverged: {result}"
+        
+        # A changed choice no longer reproduces the recorded final state
+        with open(path, encoding="utf-8") as fh:
+            text = fh.read()
+        with open(path, "w", encoding="utf-8") as fh:
+            fh.write(text.replace('choice "4"', 'choice "2"'))
+        assert not verify_journal(path).ok, "Tampered journal should fail verification"
+    
+    try:
+        parse_journal("not a journal")
+        assert False, "Foreign data should be rejected"
+    except JournalError:
+        pass
+    
+    print("✅ Journal tests passed!")
+
+def test_batch_simulator():
+    """Test the vectorized simulator against the scalar engine"""
+    print("🧪 Testing batch simulator...")
+    
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        # pytest reports this as a skip; main() prints it
+        raise unittest.SkipTest("NumPy is not installed (pip install numpy)")
+    from adventure_game import compile_world
+    from batch_sim import BatchState, simulate_batch, verify
+    
+    # Sampled players replay to identical states through the real scenes
+    assert verify(2000, 100, turns=30, seed=7) == [], "Batch and scalar engines diverged"
+    
+    # Scenes that can end without a goto fall back to scanning locations
+    spec = [
+        {"id": "start", "steps": [("menu", "?", {
+            "1": [("gold", -30), ("if", ("gold_at_least", 30), [("add_item", "Rope")], [("goto", "well")])],
+            "2": [("gold", 15), ("reputation", 1)],
+        })]},
+        {"id": "well", "steps": [("if", ("has_item", "Rope"),
+                                  [("remove_item", "Rope"), ("flag", "wet")],
+                                  [("health", -40), ("goto", "start")]), ("pause", "...")]},
+    ]
+    world = compile_world(spec)
+    assert not BatchState(world, 1).single_exit
+    assert verify(2000, 100, turns=20, seed=3, world=world) == [], "Fallback path diverged"
+    
+    stats = simulate_batch(5000, turns=20, seed=1, chunk_size=2000)
+    assert stats.runs == 5000 and stats.turns == 5000 * 20
+    assert sum(stats.health.values()) == 5000
+    
+    print("✅ Batch simulator tests passed!")
+
+def test_typeahead():
+    """Test answering several menus from one input line"""
+    print("🧪 Testing type-ahead input...")
+    
+    # "4 3 2": forest path -> waterfall cave -> deeper passage in one line
+    stream = io.StringIO()
+    result = run_headless(["4 3 2"], renderer=BufferedRenderer(stream))
+    assert result.trace == ["start", "forest_path", "waterfall_cave", "forest_path"], \
+        f"Unexpected trace: {result.trace}"
+    assert result.state.has_item("Ancient Tome"), "Queued answers were not applied"
+    output = stream.getvalue()
+    assert "WATERFALL CAVE" not in output, "Intermediate scene was rendered"
+    assert "✨ You acquired: Ancient Tome" in output, "State change messages must still show"
+    
+    # Queued answers are still validated; an invalid one drops the rest
+    stream = io.StringIO()
+    result = run_headless(["4 9 2", "2"], renderer=BufferedRenderer(stream))
+    output = stream.getvalue()
+    assert "❌ Please choose from: 1, 2, 3" in output
+    # ...after the narration it skipped, so the player sees what the menu is
+    assert -1 < output.find("FOREST PATH") < output.find("❌ Please choose from"), output
+    assert output.count("FOREST PATH") == 1
+    assert result.trace == ["start", "forest_path", "hidden_clearing"], f"Unexpected trace: {result.trace}"
+    
+    # Network sessions keep queued answers across scene replays
+    cursor = SceneCursor(create_game())
+    cursor.advance()
+    cursor.advance("4 3 2")
+    assert cursor.engine.state.current_location == "forest_path"
+    assert cursor.engine.state.has_item("Ancient Tome")
+    
+    print("✅ Type-ahead tests passed!")
+
+def test_turn_api():
+    """Test the stateless token-based turn API"""
+    print("🧪 Testing turn API...")
+    
+    import json
+    from savegame import dump_state
+    from turn_api import TokenError, TurnAPI
+    
+    # Two workers sharing a key serve alternate turns of one game
+    workers = [TurnAPI(b"test-key-0123456789"), TurnAPI(b"test-key-0123456789")]
+    result = workers[0].start()
+    assert result.options == ["1", "2", "3", "4", "5"], f"Unexpected options: {result.options}"
+    assert "Health: 100/100" in result.text
+    choices = ["1", "3", "1", "4", "4", "3", "2"]
+    for turn, choice in enumerate(choices):
+        result = workers[turn % 2].turn(result.token, choice)
+        assert result.token and len(result.token) < 200, f"Token too large: {result.token}"
+    
+    # The replayed scenes end in the same state as an uninterrupted playthrough
+    expected = run_headless(choices).state
+    paused = workers[0].codec.decode(result.token)
+    assert dump_state(paused.state) == dump_state(expected), "Turn API diverged from the engine"
+    
+    # Rejected and over-long answers leave the token as it was
+    start = workers[0].start().token
+    token = workers[0].turn(start, "1").token
+    for bad in ["9"] * 30 + ["x" * 300, "hint"]:
+        rejected = workers[0].turn(token, bad)
+        assert rejected.token == token, f"Token changed after {bad[:10]!r}"
+    assert "Please choose from" in workers[0].turn(token, "zz").text
+    # An accepted answer with an over-long type-ahead tail keeps the game going
+    tail = workers[0].turn(token, "1 " + "x" * 300)
+    assert tail.token and workers[0].turn(tail.token, "1").token
+    typed = workers[0].turn(start, " ".join(["1", "4", "1"] + ["9"] * 120))
+    assert len(typed.token) < 200, f"Typed-ahead token too large: {typed.token}"
+    
+    # Forged, truncated and foreign tokens are rejected
+    token = result.token
+    forged = token[:20] + ("A" if token[20] != "A" else "B") + token[21:]
+    for bad in (forged, token[:-4], "!!!"):
+        try:
+            workers[0].turn(bad, "1")
+            assert False, f"Token should be rejected: {bad}"
+        except TokenError:
+            pass
+    try:
+        TurnAPI(b"another-key-0123456789").turn(token, "1")
+        assert False, "Token signed with another key should be rejected"
+    except TokenError:
+        pass
+    
+    # The WSGI app maps requests and errors to JSON responses
+    def call(path, body=b""):
+        statuses = []
+        environ = {"REQUEST_METHOD": "POST", "PATH_INFO": path, "CONTENT_LENGTH": str(len(body)),
+                   "wsgi.input": io.BytesIO(body)}
+        data = b"".join(workers[1].wsgi(environ, lambda status, headers: statuses.append(status)))
+        return statuses[0], json.loads(data)
+    status, body = call("/start")
+    assert status == "200 OK" and body["token"]
+    status, body = call("/turn", json.dumps({"token": body["token"], "choice": "1"}).encode())
+    assert status == "200 OK" and "TAVERN" in body["text"]
+    assert call("/turn", json.dumps({"token": forged, "choice": "1"}).encode())[0] == "403 Forbidden"
+    assert call("/turn", b"{}")[0] == "400 Bad Request"
+    
+    print("✅ Turn API tests passed!")
+
+def test_session_store():
+    """Test LRU eviction of sessions to disk and transparent restore"""
+    print("🧪 Testing session store...")
+    
+    from savegame import dump_state
+    from sessions import SessionStore
+    
+    choices = ["1", "3", "1", "4", "4", "3", "2"]
+    reference = SceneCursor(create_game())
+    expected = [reference.advance()] + [reference.advance(choice) for choice in choices]
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SessionStore(os.path.join(tmp, "sessions.db"), max_sessions=2, low_water=0.5)
+        outputs = [store.create("aria").advance()]
+        store.put("aria", store.get("aria"))
+        for choice in choices:
+            # Two other players push aria out of memory before each of her turns
+            for other in ("bram", "cora"):
+                (store.get(other) or store.create(other)).advance()
+                store.put(other, store.get(other))
+            assert "aria" not in store.resident, "Least recently used session was not evicted"
+            cursor = store.get("aria")
+            outputs.append(cursor.advance(choice))
+            store.put("aria", cursor)
+        assert outputs == expected, "Restored session output differs from an uninterrupted one"
+        assert dump_state(store.get("aria").engine.state) == dump_state(reference.engine.state)
+        
+        stats = store.stats()
+        assert stats["restores"] >= len(choices) and stats["evictions"] >= len(choices)
+        assert 0 < stats["hit_rate"] < 1 and stats["restore_seconds"]["count"] == stats["restores"]
+        assert store.get("nobody") is None and store.stats()["misses"] == stats["misses"] + 1
+        
+        # Sessions survive a restart once flushed
+        store.close()
+        store = SessionStore(os.path.join(tmp, "sessions.db"), max_bytes=1)
+        assert store.spilled() == 3
+        cursor = store.get("aria")
+        assert cursor.request is not None
+        assert dump_state(cursor.engine.state) == dump_state(reference.engine.state)
+        store.create("bram")
+        assert len(store) == 1, "Memory budget should keep only the newest session"
+        store.close(flush=False)
+    
+    print("✅ Session store tests passed!")
+
+def test_hints():
+    """Test the precomputed route index and the in-game hint command"""
+    print("🧪 Testing hints...")
+    
+    from adventure_game import WORLD_SPEC, compile_world
+    from hints import HintIndex, load_or_build
+    
+    index = HintIndex().build()
+    start = GameState(NullRenderer())
+    # Every route, typed ahead from a fresh game, really earns its goal
+    for goal in index.goals:
+        turns = index.route(start, goal)
+        assert turns, f"No route to {goal}"
+        typed = " ".join(choice for inputs in turns for choice in inputs if choice)
+        assert HintIndex._has(run_headless([typed]).state, goal), f"Route to {goal} fails: {typed}"
+    
+    # Routes are answered from the state the player is in
+    state = run_headless(["1 1"]).state
+    assert "already have Ancient Map" in index.answer(state, "ancient map")
+    assert index.answer(state, "artifact").endswith("Type: 4 3 1"), index.answer(state, "artifact")
+    
+    # "hint" at a menu answers and asks again without using up the turn
+    stream = io.StringIO()
+    game = create_game(BufferedRenderer(stream), ScriptedInput(["hint herb quest", "hint", "2"]))
+    index.attach(game)
+    game.go_to_location("start")
+    game.step()
+    output = stream.getvalue()
+    assert "💡 Herb Quest is 4 turns away. Type: 2 2 4 2" in output
+    assert "Ask for a hint about: Ancient Map" in output
+    assert game.state.current_location == "notice_board"
+    
+    # Answers come from the state's text table, so they can be translated
+    from adventure_game import MSG_HINT_HAVE, WORLD
+    texts = list(WORLD.compile_all().texts)
+    texts[MSG_HINT_HAVE] = "💡 Ye've already got {goal}, matey."
+    state.texts = texts
+    assert index.answer(state, "ancient map") == "💡 Ye've already got Ancient Map, matey."
+    
+    # Changing one scene only re-expands the states in that scene
+    spec = [dict(scene) for scene in WORLD_SPEC]
+    for scene in spec:
+        if scene["id"] == "elder":
+            scene["steps"] = [("type", "The elder looks up from a new book.")] + list(scene["steps"])
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "eldria.hints")
+        index.save(path)
+        assert load_or_build(path).expanded == 0, "Current index should be loaded as is"
+        changed = load_or_build(path, compile_world(spec))
+        assert 0 < changed.expanded < changed.reused, (changed.expanded, changed.reused)
+        assert changed.route(start, "Ancient Artifact") == index.route(start, "Ancient Artifact")
+    
+    print("✅ Hint tests passed!")
+
+def test_autosave():
+    """Test the write-behind autosave writer"""
+    print("🧪 Testing autosave...")
+    
+    from autosave import Autosave, AutosaveWriter
+    from savegame import SaveLog, dump_state
+    
+    class SlowWriter(AutosaveWriter):
+        def _write_batch(self, batch):
+            time.sleep(0.01)
+            return super()._write_batch(batch)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        # Running out of input saves the final state and flushes before exiting
+        writer = AutosaveWriter(tmp)
+        game = create_game(NullRenderer(), ScriptedInput(["Aria", "", "4", "3"]))
+        Autosave(writer, "aria").attach(game)
+        game.run()
+        saved = SaveLog.load(writer.path("aria"))
+        assert dump_state(saved) == dump_state(game.state), "Final state was not flushed on exit"
+        assert saved.current_location == "waterfall_cave"
+        writer.close()
+        assert not os.path.exists(writer.path("aria") + ".tmp")
+        
+        # Saves for a session coalesce while the disk is busy; a full queue applies backpressure
+        writer = SlowWriter(tmp, max_pending=2, fsync=False)
+        game = create_game(NullRenderer())
+        for gold in range(50):
+            game.state.gold = gold
+            writer.submit("busy", game.state.copy())
+        for name in ("a", "b", "c", "d"):
+            writer.submit(name, game.state.copy())
+        writer.flush()
+        stats = writer.stats()
+        assert stats["coalesced"] > 0 and stats["written"] < stats["submitted"], stats
+        assert stats["stalls"] > 0 and stats["max_depth"] <= 2, stats
+        assert SaveLog.load(writer.path("busy")).gold == 49, "Newest save must win"
+        writer.close()
+        try:
+            writer.submit("late", game.state)
+            assert False, "A closed writer should refuse saves"
+        except RuntimeError:
+            pass
+        
+        # A failing rename is counted and cleaned up; the writer keeps going
+        import errno
+        from unittest import mock
+        full = OSError(errno.ENOSPC, "No space left on device")
+        writer = AutosaveWriter(os.path.join(tmp, "full"), fsync=False)
+        with mock.patch("autosave.os.replace", side_effect=full):
+            writer.submit("full", game.state.copy())
+            assert writer.flush(timeout=5) is False, "A failed save must not flush as durable"
+        stats = writer.stats()
+        assert stats["errors"] == 1 and stats["failed_sessions"] == 1 and not stats["stopped"], stats
+        assert os.listdir(writer.directory) == [], "Temporary file left behind"
+        writer.submit("full", game.state.copy())
+        assert writer.flush(timeout=5) is True and os.path.exists(writer.path("full"))
+        writer.close()
+        
+        # A writer thread that dies drops saves instead of blocking the turn thread
+        class Crash(BaseException):
+            pass
+        
+        class DyingWriter(AutosaveWriter):
+            def _write_batch(self, batch):
+                raise Crash()
+            
+            def _run(self):
+                try:
+                    super()._run()
+                except Crash:
+                    pass
+        writer = DyingWriter(os.path.join(tmp, "dead"), max_pending=1, fsync=False)
+        writer.submit("a", game.state.copy())
+        writer.thread.join(5)
+        assert writer.flush(timeout=5) is False
+        for name in ("b", "c", "d"):
+            writer.submit(name, game.state.copy())
+        assert writer.stats()["dropped"] == 3
+        
+        # A hung disk delays quitting by at most the exit timeout, and the player is told
+        import threading
+        release = threading.Event()
+        
+        class HungWriter(AutosaveWriter):
+            def _write_batch(self, batch):
+                release.wait()
+                return super()._write_batch(batch)
+        writer = HungWriter(os.path.join(tmp, "hung"), fsync=False)
+        stream = io.StringIO()
+        game = create_game(BufferedRenderer(stream), ScriptedInput(["Aria", ""]))
+        Autosave(writer, "hung", exit_timeout=0.1).attach(game)
+        started = time.perf_counter()
+        game.run()
+        assert time.perf_counter() - started < 2, "Exit waited for the hung writer"
+        assert "may not have been saved" in stream.getvalue()
+        release.set()
+        writer.close(5)
+    
+    print("✅ Autosave tests passed!")
+
+def test_fuzzer():
+    """Test the coverage-guided fuzzer on the real world and a buggy one"""
+    print("🧪 Testing fuzzer...")
+    
+    from adventure_game import compile_world
+    from fuzzer import Executor, check_invariants, fuzz
+    
+    # An item set's order must list exactly its set bits, once each
+    game = create_game(NullRenderer())
+    assert check_invariants(game) is None
+    game.state.inventory.add("Rope")
+    game.state.inventory.order += game.state.inventory.order
+    assert check_invariants(game) == "inventory order ['Rope', 'Rope'] does not match its set bits"
+    game.state.inventory.order = ()
+    assert "does not match" in check_invariants(game)
+    
+    report = fuzz(3000, seed=1)
+    assert report.findings == [], f"Unexpected findings: {report.findings}"
+    assert report.covered and len(report.corpus) > 1, "No coverage was recorded"
+    
+    # A scene that loops on itself, one that breaks an invariant and one that crashes
+    spec = [
+        {"id": "start", "steps": [("menu", "?", {"1": [("goto", "pit")], "2": [("goto", "spin")],
+                                                 "3": [("gold", 5)]})]},
+        {"id": "pit", "steps": [("menu", "?", {"1": [("goto", "start")]})]},
+        {"id": "spin", "steps": [("goto", "spin")]},
+    ]
+    world = compile_world(spec)
+    
+    def pit(game):
+        choice = game.get_user_input("?", ["1", "2", "3"])
+        if choice == "2":
+            game.state.gold = -5
+        elif choice == "3":
+            raise KeyError("treasure")
+        game.go_to_location("start")
+    
+    def factory():
+        engine = create_game(NullRenderer(), world=world)
+        engine.add_location("pit", pit)
+        return engine
+    
+    report = fuzz(3000, executor=Executor(world, factory=factory))
+    found = {finding.kind: finding for finding in report.findings}
+    assert set(found) == {"loop", "invariant", "crash"}, f"Unexpected findings: {report.findings}"
+    assert found["loop"].location == "spin" and found["loop"].inputs == ["2"]
+    # Minimized to the two answers that matter (possibly typed ahead on one line)
+    assert found["invariant"].message == "negative gold -5" and len(found["invariant"].inputs) <= 2
+    assert found["crash"].message == "KeyError: 'treasure'" and len(found["crash"].inputs) <= 2
+    
+    # Answering again and again to no effect is a loop too: herbs are only gathered once
+    executor = Executor()
+    _, finding = executor.run(["4", "2"] + ["2"] * 60)
+    assert finding is not None and finding.kind == "loop", finding
+    assert finding.location == "hidden_clearing" and "without changing the state" in finding.message
+    assert executor.minimize(finding).inputs == ["4", "2", "2"] + ["2"] * 50
+    _, finding = executor.run(["4", "2"] + ["2", "1"] * 30)
+    assert finding is None, "Choices that change the state are progress"
+    
+    print("✅ Fuzzer tests passed!")
+
+def test_analytics():
+    """Test per-turn events and the streaming funnel aggregator"""
+    print("🧪 Testing analytics...")
+    
+    import json
+    from analytics import Aggregator, EventLog, HyperLogLog, decision_points, follow
+    
+    # Each move is one event carrying the choices and what they changed
+    buffer = io.StringIO()
+    game = create_game(NullRenderer(), ScriptedInput(["Aria", "", "1", "1", "2", "2", "4", "3"]))
+    EventLog(buffer, "aria").attach(game)
+    game.run()
+    events = [json.loads(line) for line in buffer.getvalue().splitlines()]
+    assert events[0] == {"p": "aria", "n": 0, "start": 1, "to": "start"}, events[0]
+    assert events[2] == {"p": "aria", "n": 2, "at": "tavern", "c": ["1"], "to": "start", "gold": -20,
+                         "+": ["Ancient Map"], "f": ["accepted_quest"]}, events[2]
+    assert events[-1]["end"] == 1 and events[-1]["at"] == "waterfall_cave", events[-1]
+    
+    assert [point[0] for point in decision_points().values()] == [1, 2, 3]
+    assert list(decision_points()) == ["tavern", "forest_path", "waterfall_cave"]
+    
+    aggregator = Aggregator()
+    aggregator.consume(buffer.getvalue().splitlines())
+    aggregator.feed('{"p":"mallory","n":1,"at":"nowhere","c":["1"],"to":"start"}')
+    aggregator.feed("not json")
+    report = aggregator.report()
+    assert report["turns"] == 6 and report["games"] == 1 and report["players"] == 1, report
+    assert report["malformed"] == 2 and "nowhere" not in aggregator.choices
+    assert report["decisions"]["#1 tavern"]["options"]["1"]["count"] == 1
+    assert report["funnels"]["Herb Quest"] == [["players", 1], ["flag:herb_quest", 1],
+                                              ["quest:Herb Quest", 0]], report["funnels"]
+    assert report["ends"] == {"waterfall_cave": 1}
+    assert report["transitions"]["start -> tavern"] == 1
+    
+    # The sketch stays within a few percent at a fixed size
+    sketch = HyperLogLog()
+    for player in range(20000):
+        sketch.add(f"player-{player}")
+    assert abs(len(sketch) - 20000) < 1000, len(sketch)
+    assert len(sketch.registers) == 4096
+    
+    # Tailing holds back a partial last line and restarts after truncation
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "events.jsonl")
+        with open(path, "w") as fh:
+            fh.write('{"a":1}\n{"b":2}\n{"c":')
+        assert list(follow(path, interval=0.01, idle=0.05)) == ['{"a":1}', '{"b":2}']
+        with open(path, "w") as fh:
+            fh.write('{"d":4}\n')
+        assert list(follow(path, interval=0.01, idle=0.05, start=100)) == ['{"d":4}']
+    
+    print("✅ Analytics tests passed!")
+
+def test_texts():
+    """Test memory-mapped text tables and locale switching"""
+    print("🧪 Testing text tables...")
+    
+    import json
+    from adventure_game import WORLD, WORLD_SPEC, RecordingRenderer, compile_world
+    from texts import StringTable, build, default_world, export, is_current, write_table
+    
+    def play(world):
+        renderer = RecordingRenderer()
+        game = create_game(renderer, ScriptedInput(["Aria", "", "1", "1", "5", "", "9"]), world)
+        game.run()
+        return "".join(text for text, _ in renderer.segments)
+    
+    english = play(WORLD)
+    with tempfile.TemporaryDirectory() as tmp:
+        # The compiled English table shows exactly the built-in text, decoding only what is used
+        path = os.path.join(tmp, "eldria.en.strings")
+        build(path)
+        table = StringTable(path)
+        assert table.locale == "en" and len(table) == len(WORLD.text_keys)
+        assert play(WORLD.localized(table)) == english
+        assert 0 < table.decoded() < len(table) // 2, table.decoded()
+        table.close()
+        
+        # A locale is a translated table; untranslated keys keep their English text
+        source = os.path.join(tmp, "pirate.json")
+        export(source)
+        with open(source, encoding="utf-8") as fh:
+            texts = json.load(fh)
+        texts["message.gold_lost"] = "💸 Ye parted with {amount} doubloons"
+        texts["message.goodbye"] = "\n\n🏴‍☠️ Fair winds!"
+        del texts["message.title"]
+        with open(source, "w", encoding="utf-8") as fh:
+            json.dump(texts, fh, ensure_ascii=False)
+        pirate = os.path.join(tmp, "eldria.pirate.strings")
+        report = build(pirate, source, "pirate")
+        assert report["missing"] == ["message.title"], report
+        output = play(WORLD.localized(StringTable(pirate)))
+        assert "Ye parted with 20 doubloons" in output and "Fair winds!" in output
+        assert "THE LOST REALMS OF ELDRIA" in output and "Goodbye" not in output
+        assert "Goodbye" in play(WORLD), "Other sessions keep their own table"
+        
+        # Translations must keep placeholders, and tables only fit their own world
+        texts["message.acquired"] = "✨ Found something!"
+        with open(source, "w", encoding="utf-8") as fh:
+            json.dump(texts, fh, ensure_ascii=False)
+        try:
+            build(pirate, source, "pirate")
+            assert False, "A translation dropping {item} should be rejected"
+        except ValueError:
+            pass
+        other = compile_world([dict(WORLD_SPEC[0], steps=[("type", "Hello"), ("goto", "start")])])
+        foreign = os.path.join(tmp, "other.strings")
+        write_table(foreign, other.texts, other)
+        try:
+            WORLD.localized(StringTable(foreign))
+            assert False, "A table built for another world should be refused"
+        except ValueError:
+            pass
+        
+        # By default the English is mapped from a table built with the release, if current
+        default = os.path.join(tmp, "default.strings")
+        assert default_world(default) is WORLD and not os.path.exists(default), "Nothing is written at run time"
+        build(default)
+        lazy = compile_world(lazy=True)
+        world = default_world(default, lazy)
+        assert isinstance(world.texts, StringTable) and is_current(world.texts, lazy)
+        assert not any(scene.compiled for scene in lazy.scenes.values()), "Mapping compiled scenes"
+        assert play(world) == english
+        
+        # A table built from an earlier spec, or for another locale, is stale
+        steps = list(WORLD_SPEC[0]["steps"])
+        first = next(i for i, step in enumerate(steps) if step[0] == "type")
+        steps[first] = ("type", "🌙 AN OLDER DRAFT")
+        older = compile_world([dict(WORLD_SPEC[0], steps=steps), *WORLD_SPEC[1:]])
+        assert older.text_keys == WORLD.text_keys and older.source_digest != WORLD.source_digest
+        for stale in ((older.texts, older, "en"), (WORLD.texts, WORLD, "pirate")):
+            write_table(default, *stale)
+            assert default_world(default) is WORLD
+        assert not [name for name in os.listdir(tmp) if name.endswith(".tmp")]
+    
+    print("✅ Text table tests passed!")
+
+def test_cold_start():
+    """Test lazy world construction, fast start and the startup budget"""
+    print("🧪 Testing cold start...")
+    
+    from adventure_game import WORLD_SPEC, RecordingRenderer, compile_world
+    from benchmark import STARTUP_BUDGET, over_budget, startup_report
+    
+    # Scenes compile on first visit, with the same text IDs as an eager build
+    world = compile_world(lazy=True)
+    assert not any(scene.compiled for scene in world.scenes.values())
+    game = create_game(NullRenderer(), ScriptedInput(["Aria", "", "1"]), world)
+    game.run()
+    assert [scene.id for scene in world.scenes.values() if scene.compiled] == ["start", "tavern"]
+    eager = compile_world()
+    assert world.text_keys == eager.text_keys and list(world.texts) == list(eager.texts)
+    assert world.transitions["forest_path"]["3"] == ("waterfall_cave",)
+    
+    # Broken content in a lazy world is reported when the scene is first needed
+    broken = compile_world([WORLD_SPEC[0], dict(WORLD_SPEC[1], steps=[("goto", "atlantis")])], lazy=True)
+    game = create_game(NullRenderer(), ScriptedInput([]), broken)
+    game.go_to_location("tavern")
+    try:
+        game.step()
+        assert False, "Unknown location should be rejected on first visit"
+    except ValueError:
+        pass
+    
+    # Fast start shows the intro without the typing effect
+    renderer = RecordingRenderer()
+    create_game(renderer, ScriptedInput(["Aria"])).run(fast_start=True)
+    assert renderer.segments and all(delay == 0 for _, delay in renderer.segments), renderer.segments
+    
+    report = startup_report(repeat=1)
+    assert set(STARTUP_BUDGET) <= set(report), report
+    assert not over_budget(report), over_budget(report)
+    assert report["scenes_compiled"] == 0, "main() compiled scenes before the first prompt"
+    
+    print("✅ Cold start tests passed!")
+
+def test_history():
+    """Test structurally shared state history with undo and rewind"""
+    print("🧪 Testing history...")
+    
+    import random
+    from adventure_game import RandomInput
+    from history import History
+    from savegame import state_fields
+    
+    # Every version restores exactly the state recorded at its location change
+    game = create_game(NullRenderer(), RandomInput(random.Random(7)))
+    history = History().attach(game)
+    recorded = []
+    game.add_location_hook(lambda engine: recorded.append(state_fields(engine.state)))
+    game.go_to_location("start")
+    for _ in range(300):
+        try:
+            game.step()
+        except GameExit:
+            game.game_running = True
+            game.go_to_location("start")
+    latest = history.current
+    assert latest.turn == len(recorded) - 1
+    for turn in (0, 1, 2, 57, 128, len(recorded) - 2):
+        assert latest.ancestor(turn).turn == turn
+        assert history.rewind(game, history.current.turn - turn)
+        assert state_fields(game.state) == recorded[turn], turn
+        history.current = latest
+    # Turns that leave the inventory alone share the parent's tuple
+    assert any(version.inventory is version.parent.inventory and version.inventory
+               for version in latest if version.parent is not None)
+    
+    # Rewinding walks jump pointers: logarithmic, not one step per turn
+    for turn in range(latest.turn + 1):
+        steps = 0
+        version = latest
+        while version.turn > turn:
+            version = version.jump if version.jump.turn >= turn else version.parent
+            steps += 1
+        assert steps <= 3 * latest.turn.bit_length(), (turn, steps)
+    
+    # "undo" and "rewind N" at a menu restart the restored scene
+    stream = io.StringIO()
+    game = create_game(BufferedRenderer(stream), ScriptedInput(["1", "1", "", "undo", "rewind 7", "1", "", "2"]))
+    history = History().attach(game)
+    game.go_to_location("start")
+    game.step()
+    game.step()
+    assert game.state.current_location == "start" and "Ancient Map" in game.state.inventory
+    game.step()
+    assert game.state.current_location == "tavern" and "Ancient Map" not in game.state.inventory
+    assert history.current.turn == 1
+    game.step()
+    game.step()
+    output = stream.getvalue()
+    assert "⏪ Back 1 turn, to the tavern." in output
+    assert "⏪ You can go back at most 1 turn." in output
+    assert game.state.current_location == "notice_board" and history.current.turn == 3
+    
+    # A new game starts a new history
+    game.reset()
+    assert history.current.turn == 0 and not history.undo(game)
+    
+    # Its messages come from the world's text table, so they can be translated
+    from adventure_game import MSG_UNDO_NOTHING, MSG_UNDO_USAGE, WORLD
+    texts = list(WORLD.compile_all().texts)
+    texts[MSG_UNDO_NOTHING] = "⏪ Naught to undo, matey."
+    texts[MSG_UNDO_USAGE] = "⏪ Say undo, or rewind and up to {turns} turns."
+    stream = io.StringIO()
+    game = create_game(BufferedRenderer(stream), ScriptedInput(["undo", "rewind x", "5"]), WORLD.localized(texts))
+    History().attach(game)
+    game.go_to_location("start")
+    game.step()
+    output = stream.getvalue()
+    assert "Naught to undo" in output and "up to 0 turns" in output, output
+    
+    print("✅ History tests passed!")
+
+def test_frame_cache():
+    """Test pre-rendered static narration and its LRU cache"""
+    print("🧪 Testing frame cache...")
+    
+    import random
+    from adventure_game import FRAME_CACHE, OP_NARRATE, WORLD, FrameCache, RandomInput, RecordingRenderer
+    
+    def play(renderer, seed):
+        game = create_game(renderer, RandomInput(random.Random(seed)))
+        game.go_to_location("start")
+        try:
+            for _ in range(40):
+                game.step()
+                renderer.flush()
+        except GameExit:
+            pass
+        renderer.close()
+        return renderer.segments if isinstance(renderer, RecordingRenderer) else renderer.stream.getvalue()
+    
+    # Cached frames produce exactly the output of rendering line by line
+    backends = (lambda: BufferedRenderer(io.StringIO()), RecordingRenderer,
+                lambda: ScreenRenderer(io.StringIO(), size=(40, 300)))
+    for make in backends:
+        for seed in range(20):
+            uncached = make()
+            uncached.frames = None
+            assert play(make(), seed) == play(uncached, seed), (make, seed)
+    assert FRAME_CACHE.hits > FRAME_CACHE.misses > 0
+    
+    # The least recently used frame is evicted; each width has its own frames
+    cache = FrameCache(capacity=2)
+    renderer = ScreenRenderer(io.StringIO(), size=(40, 24))
+    renderer.frames = cache
+    game = create_game(renderer, ScriptedInput([]))
+    narration = [step[1] for step in WORLD.scenes["start"].steps if step[0] is OP_NARRATE]
+    narration += [step[1] for step in WORLD.scenes["tavern"].steps if step[0] is OP_NARRATE]
+    assert len(narration) >= 3
+    narrow = cache.get(renderer, narration[0], game.texts)
+    assert cache.get(renderer, narration[0], game.texts) is narrow
+    cache.get(renderer, narration[1], game.texts)
+    cache.get(renderer, narration[0], game.texts)
+    cache.get(renderer, narration[2], game.texts)
+    assert cache.stats()["evictions"] == 1 and cache.misses == 3 and cache.hits == 2
+    assert cache.get(renderer, narration[0], game.texts) is narrow
+    renderer.size = (100, 24)
+    renderer.flush()
+    assert renderer.frame_key == ("screen", 96)
+    wide = cache.get(renderer, narration[0], game.texts)
+    assert wide is not narrow and max(len(row) for part in wide if part for row in part[1]) >= 36
+    
+    print("✅ Frame cache tests passed!")
+
 def demonstrate_game_features():
     """Demonstrate key game features"""
     print("\n🎮 Demonstrating Game Features...")
@@ -172,8 +1281,34 @@ def main():
     try:
         # Run tests
         test_game_state()
+        test_compact_state()
         test_game_engine()
+        test_renderers()
         test_game_creation()
+        test_headless_playthrough()
+        test_typeahead()
+        test_simulator()
+        test_scene_cursor()
+        test_save_and_load()
+        test_world_graph()
+        test_explorer()
+        test_benchmark()
+        test_metrics()
+        test_journal()
+        try:
+            test_batch_simulator()
+        except unittest.SkipTest as skipped:
+            print(f"⏭️  Skipping batch simulator tests: {skipped}")
+        test_turn_api()
+        test_session_store()
+        test_hints()
+        test_autosave()
+        test_fuzzer()
+        test_analytics()
+        test_texts()
+        test_cold_start()
+        test_history()
+        test_frame_cache()
         
         # Demonstrate features
         demonstrate_game_features()
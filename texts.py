@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Memory-mapped text tables for The Lost Realms of Eldria.
+
+Compiled scenes refer to their narration, menu prompts and messages by
+ID, and look the text up in their world's table (``World.texts``). The
+English text is authored in ``WORLD_SPEC`` and ``MESSAGES``; this tool
+compiles it, or a translation of it, into a table file:
+
+    header   magic, version, key digest, source digest, locale, string count
+    offsets  count + 1 little-endian uint32 offsets into the data
+    data     the UTF-8 text of every string, back to back
+
+A StringTable maps the file read-only and decodes a string the first time
+its ID is asked for, so every process hosting sessions shares one copy of
+the table in the page cache and only keeps the strings it has shown.
+The key digest ties a table to the structure of the world it was built
+for; ``World.localized`` refuses a table built for another one. The
+source digest is the world's ``source_digest``, a hash of the
+``WORLD_SPEC`` and ``MESSAGES`` it was built from: a table left over from
+an earlier edit is stale, and a current one is mapped without compiling
+any scene.
+
+The game and the servers show English from ``eldria.en.strings`` next to
+this file when it is there and current (``default_world``), and the
+strings in ``WORLD_SPEC`` otherwise. Nothing writes it at run time; build
+it along with the release, and again after editing the text:
+
+    python texts.py --build eldria.en.strings
+
+Switching locale is mapping a different table:
+
+    world = WORLD.localized(StringTable("eldria.de.strings"))
+
+Translations are JSON objects of key to text, as written by ``--export``;
+keys left out keep their English text. A translated message must use the
+same ``{placeholders}`` as the English one.
+
+Usage:
+    python texts.py --build eldria.en.strings
+    python texts.py --export eldria.de.json
+    python texts.py --build eldria.de.strings --source eldria.de.json --locale de
+    python texts.py --show eldria.de.strings
+    python adventure_game.py --texts eldria.de.strings
+"""
+
+import argparse
+import json
+import mmap
+import os
+import string
+import struct
+import sys
+from array import array
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from adventure_game import World, WORLD
+
+MAGIC = b"ELDT"
+VERSION = 2
+# magic, version, key digest, source digest, locale (NUL-padded ASCII), number of strings
+HEADER = struct.Struct("<4sH16s16s8sI")
+# The English table the game maps by default
+DEFAULT_TABLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "eldria.en.strings")
+
+class StringTable:
+    """Read-only, lazily decoded view of a text table file"""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as fh:
+            self._map = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, self.digest, self.source, locale, count = HEADER.unpack_from(self._map)
+        except struct.error:
+            self._map.close()
+            raise ValueError(f"{path}: not an Eldria text table") from None
+        base = HEADER.size + 4 * (count + 1)
+        if magic != MAGIC or version != VERSION or len(self._map) < base:
+            self._map.close()
+            raise ValueError(f"{path}: not an Eldria text table (version {VERSION})")
+        self.locale = locale.rstrip(b"\0").decode("ascii")
+        self._view = memoryview(self._map)
+        offsets = self._view[HEADER.size:base]
+        if sys.byteorder == "little":
+            self._offsets = offsets.cast("I")
+        else:
+            self._offsets = array("I", offsets)
+            self._offsets.byteswap()
+        self._base = base
+        if self._offsets[count] > len(self._map) - base:
+            self.close()
+            raise ValueError(f"{path}: text table is truncated")
+        self._strings = [None] * count
+
+    def __len__(self) -> int:
+        return len(self._strings)
+
+    def __getitem__(self, index: int) -> str:
+        text = self._strings[index]
+        if text is None:
+            start = self._base + self._offsets[index]
+            end = self._base + self._offsets[index + 1]
+            text = self._strings[index] = str(self._view[start:end], "utf-8")
+        return text
+
+    def decoded(self) -> int:
+        """Number of strings decoded so far"""
+        return len(self._strings) - self._strings.count(None)
+
+    def close(self):
+        """Unmap the file; strings already decoded stay usable"""
+        if isinstance(self._offsets, memoryview):
+            self._offsets.release()
+        self._view.release()
+        self._map.close()
+
+def placeholders(text: str) -> set:
+    """Names of the ``{fields}`` a message template uses"""
+    return {field for _, field, _, _ in string.Formatter().parse(text) if field is not None}
+
+def translate(world: World, source: Dict[str, str]) -> Tuple[List[str], List[str], List[str]]:
+    """The world's texts with translations applied; also the missing and unknown keys"""
+    texts = []
+    missing = []
+    for key, english in zip(world.text_keys, world.texts):
+        text = source.get(key)
+        if text is None:
+            missing.append(key)
+            text = english
+        elif not isinstance(text, str):
+            raise ValueError(f"{key}: translation must be a string")
+        elif key.startswith("message.") and placeholders(text) != placeholders(english):
+            raise ValueError(f"{key}: translation must use the placeholders of {english!r}")
+        texts.append(text)
+    known = set(world.text_keys)
+    unknown = [key for key in source if key not in known]
+    return texts, missing, unknown
+
+def write_table(path: str, texts: Sequence[str], world: World = WORLD, locale: str = "en"):
+    """Write a table for ``world`` atomically"""
+    if len(texts) != len(world.text_keys):
+        raise ValueError(f"expected {len(world.text_keys)} strings, got {len(texts)}")
+    encoded = [text.encode("utf-8") for text in texts]
+    offsets = array("I", [0])
+    for data in encoded:
+        offsets.append(offsets[-1] + len(data))
+    if sys.byteorder != "little":
+        offsets.byteswap()
+    # Per process, so servers starting together can each build the default table
+    temp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp, "wb") as fh:
+            fh.write(HEADER.pack(MAGIC, VERSION, world.text_digest, world.source_digest,
+                                 locale.encode("ascii")[:8], len(texts)))
+            fh.write(offsets.tobytes())
+            fh.write(b"".join(encoded))
+        os.replace(temp, path)
+    except OSError:
+        if os.path.exists(temp):
+            os.remove(temp)
+        raise
+
+def export(path: str, world: World = WORLD):
+    """Write the world's texts as a JSON object of key to text, for translators"""
+    world.compile_all()
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump(dict(zip(world.text_keys, world.texts)), fh, ensure_ascii=False, indent=1)
+        fh.write("\n")
+
+def build(path: str, source: Optional[str] = None, locale: str = "en", world: World = WORLD) -> Dict:
+    """Compile the world's texts, or a translation of them, into a table"""
+    world.compile_all()
+    texts, missing, unknown = list(world.texts), [], []
+    if source is not None:
+        with open(source, encoding="utf-8") as fh:
+            texts, missing, unknown = translate(world, json.load(fh))
+    write_table(path, texts, world, locale)
+    return {"strings": len(texts), "bytes": os.path.getsize(path), "missing": missing,
+            "unknown": unknown}
+
+def is_current(table: StringTable, world: World = WORLD, locale: str = "en") -> bool:
+    """Whether ``table`` is a ``locale`` table built from the world's current source"""
+    return table.locale == locale and table.source == world.source_digest
+
+def default_world(path: str = DEFAULT_TABLE, world: World = WORLD) -> World:
+    """The world showing its English from the table at ``path``
+    
+    Returns ``world`` itself, showing the strings in ``WORLD_SPEC``, when
+    the table is missing, unreadable or stale. Only the digests are
+    compared, so no scene is compiled.
+    """
+    try:
+        table = StringTable(path)
+    except (OSError, ValueError):
+        return world
+    if not is_current(table, world):
+        table.close()
+        return world
+    return world.localized(table)
+
+def main(argv=None):
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Build and inspect Eldria text tables")
+    parser.add_argument("--build", metavar="PATH", help="write a text table")
+    parser.add_argument("--source", metavar="JSON", help="with --build, translations to apply")
+    parser.add_argument("--locale", default="en", help="with --build, locale name stored in the table")
+    parser.add_argument("--export", metavar="JSON", help="write the English texts for translation")
+    parser.add_argument("--show", metavar="PATH", help="describe a table and check it fits the world")
+    args = parser.parse_args(argv)
+
+    if args.export:
+        export(args.export)
+        print(f"📝 {len(WORLD.text_keys)} texts written to {args.export}")
+    if args.build:
+        report = build(args.build, args.source, args.locale)
+        print(f"📦 {report['strings']} strings, {report['bytes']} bytes → {args.build}")
+        if report["missing"]:
+            print(f"⚠️  {len(report['missing'])} untranslated (kept in English)")
+        if report["unknown"]:
+            print(f"⚠️  {len(report['unknown'])} unknown keys ignored: {', '.join(report['unknown'][:5])}")
+    if args.show:
+        table = StringTable(args.show)
+        fits = table.digest == WORLD.text_digest and len(table) == len(WORLD.text_keys)
+        print(f"📖 {args.show}: locale {table.locale or '?'}, {len(table)} strings, "
+              f"{'matches' if fits else 'does not match'} this world")
+        if fits and table.source != WORLD.source_digest:
+            print("⚠️  built from an earlier WORLD_SPEC; rebuild it (translations: re-export and check)")
+        table.close()
+        return 0 if fits else 1
+    if not (args.export or args.build):
+        parser.error("nothing to do; try --build, --export or --show")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+Stateless turn API for The Lost Realms of Eldria.
+
+Each request carries a signed state token and one choice; the response is
+the rendered text, the next prompt and its options, and a new token. No
+session lives on the server, so any worker holding the key can serve any
+turn and workers can be added or removed behind a plain load balancer.
+
+A token is the state at the start of the current scene plus the choices
+the scene has received so far, which is exactly what a SceneCursor needs
+to replay the regular scene functions up to the next prompt. The payload
+is a fixed binary header followed by short name lists, where locations,
+items and quests the world knows are written as one-byte indices. It is
+signed with keyed BLAKE2b and base64url encoded, giving tokens of about
+60-120 characters, small enough for a cookie. Tokens carry a version
+byte and a fingerprint of the world's names, so a deploy that renames
+content rejects old tokens instead of misreading them.
+
+Only answers a scene accepted are carried (SceneCursor drops rejected
+ones), answers are cut to MAX_CHOICE bytes and at most MAX_TYPEAHEAD
+typed-ahead answers are kept, so bad or oversized input cannot grow a
+token. Counts and string lengths are LEB128 varints.
+
+Usage:
+    ELDRIA_TURN_KEY=... python turn_api.py serve --port 8080
+    python turn_api.py bench
+"""
+
+import argparse
+import base64
+import binascii
+import collections
+import hashlib
+import hmac
+import json
+import os
+import random
+import re
+import struct
+import sys
+import time
+import zlib
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+from adventure_game import (KNOWN_FLAGS, GameFlags, GameState, ItemSet, QueuedInput, RecordingRenderer,
+                            SceneCursor, World, WORLD, create_game)
+
+TOKEN_VERSION = 2
+MAC_SIZE = 16
+MAX_CHOICE = 255
+MAX_TYPEAHEAD = 16
+KEY_ENV = "ELDRIA_TURN_KEY"
+
+# version, world fingerprint, health, gold, reputation, known flag bits, output already sent
+FIXED = struct.Struct("<BIBIiHH")
+INLINE = 255
+
+class TokenError(Exception):
+    """Raised when a state token is malformed, forged or from another world"""
+
+class TurnResult(NamedTuple):
+    """Response to one turn; ``token`` is None once the game has ended"""
+    text: str
+    prompt: Optional[str]
+    options: Optional[List[str]]
+    token: Optional[str]
+
+class PausedTurn(NamedTuple):
+    """Decoded contents of a token"""
+    state: GameState
+    inputs: List[str]
+    sent: int
+    typeahead: List[str]
+
+def _pack_varint(value: int) -> bytes:
+    out = bytearray()
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+def _read_varint(data: bytes, pos: int) -> tuple:
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+        if shift > 28:
+            raise ValueError("varint is too long")
+
+def _pack_str(text: str) -> bytes:
+    data = text.encode("utf-8")
+    return _pack_varint(len(data)) + data
+
+def _read_str(data: bytes, pos: int) -> tuple:
+    length, pos = _read_varint(data, pos)
+    end = pos + length
+    if end > len(data):
+        raise ValueError("string runs past the end of the token")
+    return data[pos:end].decode("utf-8"), end
+
+class TokenCodec:
+    """Packs a paused turn into a signed, URL-safe token and back"""
+
+    def __init__(self, key: bytes, world: World = WORLD):
+        if len(key) < 16:
+            raise ValueError("token key must be at least 16 bytes")
+        # BLAKE2b keys are at most 64 bytes
+        self.key = key if len(key) <= 64 else hashlib.blake2b(key).digest()
+        flags = [name for name in world.flags() if name not in KNOWN_FLAGS]
+        names = list(dict.fromkeys([*world.locations, *world.items(), *world.quests(), *flags]))
+        # Only the first 255 names get an index; byte 255 introduces an inline name
+        self.names = names[:INLINE]
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.fingerprint = zlib.crc32("\0".join(names).encode("utf-8"))
+        self.texts = world.texts
+
+    def _sign(self, payload: bytes) -> bytes:
+        return hashlib.blake2b(payload, digest_size=MAC_SIZE, key=self.key).digest()
+
+    def _pack_names(self, names: Sequence[str]) -> bytes:
+        try:
+            return bytes((len(names), *map(self.index.__getitem__, names)))
+        except KeyError:
+            pass
+        out = bytearray((len(names),))
+        for name in names:
+            i = self.index.get(name)
+            if i is None:
+                out.append(INLINE)
+                out += _pack_str(name)
+            else:
+                out.append(i)
+        return bytes(out)
+
+    def encode(self, state: GameState, inputs: Sequence[str] = (), sent: int = 0,
+               typeahead: Optional[Sequence[str]] = None) -> str:
+        """Sign the state at the start of a scene plus the choices it has had"""
+        flags = state.game_flags
+        extra = list(flags.extra.items()) if flags.extra else []
+        typeahead = list(typeahead)[:MAX_TYPEAHEAD] if typeahead else []
+        payload = b"".join((
+            FIXED.pack(TOKEN_VERSION, self.fingerprint, state.health, state.gold,
+                       state.reputation, flags.bits, sent),
+            self._pack_names((state.current_location,)),
+            self._pack_names(list(state.inventory)),
+            self._pack_names(list(state.completed_quests)),
+            self._pack_names([name for name, _ in extra]),
+            bytes(1 if value else 0 for _, value in extra),
+            _pack_strs(inputs),
+            _pack_strs(typeahead),
+        ))
+        return base64.urlsafe_b64encode(payload + self._sign(payload)).rstrip(b"=").decode("ascii")
+
+    def decode(self, token: str, renderer=None) -> PausedTurn:
+        """Verify a token and rebuild the paused turn it describes"""
+        try:
+            raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        except (binascii.Error, ValueError, TypeError):
+            raise TokenError("token is not base64url") from None
+        payload, mac = raw[:-MAC_SIZE], raw[-MAC_SIZE:]
+        if len(raw) <= FIXED.size + MAC_SIZE or not hmac.compare_digest(mac, self._sign(payload)):
+            raise TokenError("token signature does not match")
+        try:
+            version, fingerprint, health, gold, reputation, bits, sent = FIXED.unpack_from(payload)
+            if version != TOKEN_VERSION:
+                raise TokenError(f"unsupported token version {version}")
+            if fingerprint != self.fingerprint:
+                raise TokenError("token was issued for a different world")
+            # Filled in field by field, skipping the defaults GameState() would build
+            state = GameState.__new__(GameState)
+            state.renderer = renderer if renderer is not None else RecordingRenderer()
+            state.texts = self.texts
+            state.health, state.gold, state.reputation = health, gold, reputation
+            state.game_flags = GameFlags()
+            state.game_flags.bits = bits
+            pos = FIXED.size
+            (location,), pos = self._read_names(payload, pos)
+            state.current_location = location
+            inventory, pos = self._read_names(payload, pos)
+            state.inventory = ItemSet(inventory)
+            quests, pos = self._read_names(payload, pos)
+            state.completed_quests = ItemSet(quests)
+            extra, pos = self._read_names(payload, pos)
+            for name in extra:
+                state.game_flags[name] = bool(payload[pos])
+                pos += 1
+            inputs, pos = _read_strings(payload, pos)
+            typeahead, pos = _read_strings(payload, pos)
+        except (struct.error, IndexError, ValueError, UnicodeDecodeError):
+            # A valid signature over a bad layout means the key leaked or the code is buggy
+            raise TokenError("token payload is malformed") from None
+        return PausedTurn(state, inputs, sent, typeahead)
+
+    def _read_names(self, data: bytes, pos: int) -> tuple:
+        count = data[pos]
+        pos += 1
+        indices = data[pos:pos + count]
+        if len(indices) == count and INLINE not in indices:
+            return list(map(self.names.__getitem__, indices)), pos + count
+        names = []
+        for _ in range(count):
+            i = data[pos]
+            pos += 1
+            if i == INLINE:
+                name, pos = _read_str(data, pos)
+                names.append(name)
+            else:
+                names.append(self.names[i])
+        return names, pos
+
+def _pack_strs(values: Sequence[str]) -> bytes:
+    if not values:
+        return b"\x00"
+    return _pack_varint(len(values)) + b"".join(map(_pack_str, values))
+
+def _read_strings(data: bytes, pos: int) -> tuple:
+    count, pos = _read_varint(data, pos)
+    values = []
+    for _ in range(count):
+        value, pos = _read_str(data, pos)
+        values.append(value)
+    return values, pos
+
+_BLANK_RUNS = re.compile(r"\n{3,}")
+
+class TurnAPI:
+    """Plays one turn per call from a token and a choice"""
+
+    def __init__(self, key: bytes, world: World = WORLD):
+        self.world = world
+        self.codec = TokenCodec(key, world)
+
+    def _respond(self, cursor: SceneCursor, segments: List[tuple]) -> TurnResult:
+        text = _BLANK_RUNS.sub("\n\n", "\n".join(text for text, _ in segments)).strip("\n")
+        request = cursor.request
+        if request is None:
+            return TurnResult(text, None, None, None)
+        engine = cursor.engine
+        # After InputRequired the engine is back at the start of the scene
+        token = self.codec.encode(engine.state, cursor.inputs, cursor.sent, engine.typeahead)
+        return TurnResult(text, request.prompt.strip(), request.valid_options, token)
+
+    def start(self) -> TurnResult:
+        """Begin a new game and run up to its first prompt"""
+        engine = create_game(RecordingRenderer(), QueuedInput(), self.world)
+        engine.go_to_location("start")
+        cursor = SceneCursor(engine)
+        return self._respond(cursor, cursor.advance())
+
+    def turn(self, token: str, choice: str) -> TurnResult:
+        """Apply one choice to the game described by ``token``
+        
+        Choices longer than MAX_CHOICE bytes are cut to that length.
+        """
+        data = choice.encode("utf-8")
+        if len(data) > MAX_CHOICE:
+            choice = data[:MAX_CHOICE].decode("utf-8", "ignore")
+        engine = create_game(RecordingRenderer(), QueuedInput(), self.world)
+        paused = self.codec.decode(token, engine.renderer)
+        engine.state = paused.state
+        if not engine.go_to_location(paused.state.current_location):
+            raise TokenError(f"unknown location {paused.state.current_location!r}")
+        engine.typeahead = collections.deque(paused.typeahead) if paused.typeahead else None
+        cursor = SceneCursor(engine)
+        cursor.inputs = paused.inputs
+        cursor.sent = paused.sent
+        return self._respond(cursor, cursor.advance(choice))
+
+    def wsgi(self, environ: Dict, start_response):
+        """WSGI application: ``POST /start`` and ``POST /turn`` with JSON bodies"""
+        status = "200 OK"
+        try:
+            if environ.get("REQUEST_METHOD") != "POST":
+                raise LookupError("use POST")
+            path = environ.get("PATH_INFO", "")
+            if path == "/start":
+                body = self.start()._asdict()
+            elif path == "/turn":
+                length = int(environ.get("CONTENT_LENGTH") or 0)
+                request = json.loads(environ["wsgi.input"].read(length) or b"{}")
+                body = self.turn(str(request["token"]), str(request["choice"]))._asdict()
+            else:
+                raise LookupError(f"no route for {path}")
+        except TokenError as exc:
+            status, body = "403 Forbidden", {"error": str(exc)}
+        except (KeyError, TypeError, ValueError) as exc:
+            status, body = "400 Bad Request", {"error": f"bad request: {exc}"}
+        except LookupError as exc:
+            status, body = "404 Not Found", {"error": str(exc)}
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        start_response(status, [("Content-Type", "application/json; charset=utf-8"),
+                                ("Content-Length", str(len(data)))])
+        return [data]
+
+def measure(turns: int = 2000, seed: int = 0, key: bytes = b"benchmark-key-0123456789") -> Dict:
+    """Time token encoding, decoding and whole turns over random play"""
+    api = TurnAPI(key)
+    rng = random.Random(seed)
+    samples = []
+    result = api.start()
+    started = time.perf_counter()
+    for _ in range(turns):
+        if result.token is None:
+            result = api.start()
+        samples.append(result.token)
+        result = api.turn(result.token, rng.choice(result.options or [""]))
+    turn_seconds = time.perf_counter() - started
+
+    codec = api.codec
+    started = time.perf_counter()
+    decoded = [codec.decode(token) for token in samples]
+    decode_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    for paused in decoded:
+        codec.encode(paused.state, paused.inputs, paused.sent, paused.typeahead)
+    encode_seconds = time.perf_counter() - started
+    sizes = sorted(map(len, samples))
+    return {
+        "turns": turns,
+        "us_per_turn": round(turn_seconds / turns * 1e6, 2),
+        "us_per_encode": round(encode_seconds / turns * 1e6, 2),
+        "us_per_decode": round(decode_seconds / turns * 1e6, 2),
+        "token_chars_median": sizes[len(sizes) // 2],
+        "token_chars_max": sizes[-1],
+    }
+
+def main(argv=None):
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Serve Eldria turns from signed state tokens")
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    serve = commands.add_parser("serve", help="serve the JSON turn API over HTTP")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8080)
+
+    bench = commands.add_parser("bench", help="measure token and turn costs")
+    bench.add_argument("--turns", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    if args.command == "bench":
+        for key, value in measure(args.turns).items():
+            print(f"{key:>20}: {value}")
+        return 0
+
+    key = os.environ.get(KEY_ENV, "").encode("utf-8")
+    if not key:
+        # Tokens from this key only work against this process
+        key = os.urandom(32)
+        print(f"⚠️  {KEY_ENV} is not set; using a random key, so tokens die with this process")
+    from wsgiref.simple_server import make_server
+    from texts import default_world
+    with make_server(args.host, args.port, TurnAPI(key, default_world()).wsgi) as httpd:
+        print(f"🎮 Eldria turn API listening on http://{args.host}:{httpd.server_port}")
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            print("\n👋 Server stopped")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())